@@ -11,6 +11,9 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 import traceback
 import requests
+import urllib3
+import re
+from collections import OrderedDict
 from services import ServiceFactory
 
 # Voice processing imports
@@ -34,6 +37,27 @@ logger = logging.getLogger("voice-call-center-agent")
 # API Configuration
 MOCK_API_BASE = "http://localhost:8000"
 API_CLIENT_TIMEOUT = 300
+# Araç adı -> API işlemi (tekil uç nokta yolu ve /batch işlem adı)
+TOOL_BATCH_OPERATIONS = {
+    "get_user_info": "getUserInfo",
+    "get_available_packages": "getAvailablePackages",
+    "change_package": "initiatePackageChange",
+    "get_billing_info": "getBillingInfo",
+    "get_usage_stats": "getUsageStats",
+    "pay_bill": "payBill",
+}
+# Veri değiştiren araçlar: sonucu bilinmeyen bir istekten sonra yeniden çalıştırılmaz
+WRITE_TOOLS = ("change_package", "pay_bill")
+# Müşteri bağlamından (/customer/{id}/context) yanıtlanabilen araçlar -> (bağlam alanı, tekil uç nokta)
+CONTEXT_TOOL_FIELDS = {
+    "get_user_info": ("info", "getUserInfo"),
+    "get_billing_info": ("bills", "getBillingInfo"),
+    "get_usage_stats": ("usage", "getUsageStats"),
+}
+# Sunucudaki MAX_BATCH_OPERATIONS ile aynı
+MAX_BATCH_OPERATIONS = 20
+# ETag/Last-Modified ile saklanan en fazla GET yanıtı
+VALIDATOR_CACHE_SIZE = 64
 
 # --- YENİ: LM Studio API Yapılandırması ---
 LM_STUDIO_API_URL = "http://127.0.0.1:1234/v1/chat/completions"
@@ -175,155 +199,295 @@ class APIToolExecutor:
         self.api_base = api_base_url
         self.session_service = session_service
         self.timeout = timeout
+        # Oturum boyunca tek seferde çekilen müşteri bağlamı (customer_id -> info/bills/usage/package)
+        self.customer_context: Dict[str, Dict] = {}
+        # url -> {etag, last_modified, expires, body}; koşullu GET ile yeniden doğrulanır
+        self.validator_cache: OrderedDict = OrderedDict()
+
+    def _get(self, url: str) -> tuple[int, Dict]:
+        """GET isteği; saklanan kopya varsa If-None-Match/If-Modified-Since ile doğrular.
+
+        max-age süresi dolmamış kopyalar istek atılmadan, 304 alınan kopyalar
+        gövde yeniden indirilmeden kullanılır.
+        """
+        entry = self.validator_cache.get(url)
+        if entry and entry['expires'] > time.time():
+            self.validator_cache.move_to_end(url)
+            return 200, entry['body']
+        
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = requests.get(url, headers=headers, timeout=self.timeout)
+        
+        cache_control = response.headers.get('Cache-Control', '')
+        max_age = re.search(r'max-age=(\d+)', cache_control)
+        expires = time.time() + int(max_age.group(1)) if max_age and 'no-cache' not in cache_control else 0
+        if response.status_code == 304 and entry:
+            entry['expires'] = expires
+            self.validator_cache.move_to_end(url)
+            return 200, entry['body']
+        
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if response.status_code == 200 and (etag or last_modified):
+            self.validator_cache[url] = {'etag': etag, 'last_modified': last_modified, 'expires': expires, 'body': body}
+            self.validator_cache.move_to_end(url)
+            while len(self.validator_cache) > VALIDATOR_CACHE_SIZE:
+                self.validator_cache.popitem(last=False)
+        else:
+            self.validator_cache.pop(url, None)
+        return response.status_code, body
+
+    def prefetch_customer_context(self, customer_id: str) -> Optional[Dict]:
+        """Müşteri bilgisi, fatura, kullanım ve paketi tek istekte çekip saklar."""
+        customer_id = str(customer_id)
+        if customer_id in self.customer_context:
+            return self.customer_context[customer_id]
+        try:
+            response = requests.get(f"{self.api_base}/customer/{customer_id}/context", timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            self.customer_context[customer_id] = response.json()["data"]
+            logger.info(f"📦 Müşteri bağlamı önceden yüklendi: {customer_id}")
+            return self.customer_context[customer_id]
+        except Exception as e:
+            logger.warning(f"Customer context prefetch failed: {e}")
+            return None
+
+    def clear_customer_context(self, customer_id: Optional[str] = None):
+        """Saklanan bağlamı sil (yazma işlemi sonrası ya da oturum sonunda)."""
+        if customer_id is None:
+            self.customer_context.clear()
+        else:
+            self.customer_context.pop(str(customer_id), None)
+
+    def _read_customer_field(self, customer_id: str, field: str, path: str) -> Optional[Any]:
+        """Alanı önce bağlamdan, bağlam alınamazsa tekil uç noktadan oku."""
+        context = self.prefetch_customer_context(customer_id)
+        if context is not None:
+            return context.get(field)
+        status_code, body = self._get(f"{self.api_base}/{path}/{customer_id}")
+        return body["data"] if status_code == 200 else None
+
+    def _operation_params(self, tool_name: str, parameters: Dict) -> Dict:
+        """Araç parametrelerini API istek gövdesine/yol parametrelerine çevirir."""
+        if tool_name == "change_package":
+            return {
+                "customer_id": str(parameters.get("customer_id")),
+                "new_package": str(parameters.get("new_package"))
+            }
+        if tool_name == "pay_bill":
+            return {
+                "customer_id": parameters.get("customer_id"),
+                "month": parameters.get("month"),
+                "amount": parameters.get("amount")
+            }
+        if tool_name == "get_available_packages":
+            return {"customer_id": parameters.get("customer_id", "1001")}
+        return {"customer_id": parameters.get("customer_id")}
+
+    def _validate_tool_call(self, tool_name: str, parameters: Dict) -> Optional[str]:
+        """İstek gönderilmeden yakalanan parametre hatası; sorun yoksa None."""
+        if tool_name not in TOOL_BATCH_OPERATIONS:
+            return f"Bilinmeyen araç: {tool_name}"
+        if tool_name == "change_package" and not parameters.get("customer_id"):
+            return "Müşteri ID'si belirtilmedi"
+        if tool_name == "change_package" and not parameters.get("new_package"):
+            return "Yeni paket adı belirtilmedi"
+        return None
+
+    def _request_tool(self, tool_name: str, parameters: Dict) -> tuple[int, Dict]:
+        """Aracın tekil uç noktasını çağırır; (HTTP durum kodu, yanıt gövdesi) döner."""
+        params = self._operation_params(tool_name, parameters)
+        operation = TOOL_BATCH_OPERATIONS[tool_name]
+        if tool_name in WRITE_TOOLS:
+            response = requests.post(
+                f"{self.api_base}/{operation}",
+                json=params,
+                timeout=self.timeout,
+                headers={'Content-Type': 'application/json'}
+            )
+        else:
+            return self._get(f"{self.api_base}/{operation}/{params['customer_id']}")
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return response.status_code, body
+
+    def _format_tool_result(self, tool_name: str, status_code: int, data: Any,
+                            message: Optional[str] = None, detail: Any = None) -> tuple[str, bool]:
+        """API sonucunu LLM'e verilecek metne çevirir (tekil ve toplu çağrılar için ortak)."""
+        if tool_name == "get_user_info":
+            if status_code == 200:
+                return f"Müşteri: {data['name']}, Paket: {data['package']}, Bakiye: {data['balance']} TL", True
+            return "Müşteri bulunamadı", False
+        
+        if tool_name == "get_available_packages":
+            if status_code == 200:
+                package_list = []
+                for name, info in data.items():
+                    features = ", ".join(info['features'])
+                    package_list.append(f"{name}: {info['price']} TL - {features}")
+                return "Mevcut paketler:\n" + "\n".join(package_list), True
+            return "Paket listesi alınamadı", False
+        
+        if tool_name == "change_package":
+            if status_code == 200:
+                return message or "Paket değişikliği tamamlandı", True
+            if status_code == 422:
+                logger.error(f"🚨 Validation error: {detail}")
+                return f"Parametre hatası: {detail}", False
+            if status_code == 404:
+                return "Müşteri bulunamadı", False
+            if status_code == 400:
+                return "Geçersiz paket adı", False
+            return f"API hatası: {status_code}", False
+        
+        if tool_name == "get_billing_info":
+            if status_code == 200:
+                # Bağlamdan gelen liste, uç noktadan gelen {"bills": [...]}
+                bills = data["bills"] if isinstance(data, dict) else data
+                bill_info = []
+                for bill in bills:
+                    status = "Ödendi" if bill["paid"] else "Ödenmedi"
+                    bill_info.append(f"{bill['month']}: {bill['amount']} TL - {status}")
+                return "Fatura bilgileri:\n" + "\n".join(bill_info), True
+            return "Fatura bilgisi alınamadı", False
+        
+        if tool_name == "get_usage_stats":
+            if status_code == 200:
+                data_gb = data["data_mb"] / 1024
+                return f"Kullanım: {data['calls']} dakika arama, {data_gb:.1f} GB internet, {data['sms']} SMS", True
+            return "Kullanım bilgisi alınamadı", False
+        
+        if tool_name == "pay_bill":
+            if status_code == 200:
+                return "Fatura başarıyla ödendi", True
+            return "Ödeme başarısız", False
+        
+        return f"Bilinmeyen araç: {tool_name}", False
+
+    def _log_tool_usage(self, tool_name: str, parameters: Dict, result: str, execution_time_ms: int, success: bool):
+        try:
+            self.session_service.log_tool_usage(
+                tool_name, parameters, result, execution_time_ms, success
+            )
+        except Exception as e:
+            logger.error(f"Failed to log tool usage: {e}")
 
     def execute_tool(self, tool_name: str, parameters: Dict) -> tuple[str, bool]:
         """Araçları API üzerinden çalıştırır."""
         start_time = time.time()
-        success = True
-        error_message = None
         
         try:
-            if tool_name == "get_user_info":
-                customer_id = parameters.get("customer_id")
-                response = requests.get(f"{self.api_base}/getUserInfo/{customer_id}", timeout=self.timeout)
-                
-                if response.status_code == 200:
-                    data = response.json()["data"]
-                    result = f"Müşteri: {data['name']}, Paket: {data['package']}, Bakiye: {data['balance']} TL"
-                else:
-                    result = "Müşteri bulunamadı"
-                    success = False
-            
-            elif tool_name == "get_available_packages":
-                customer_id = parameters.get("customer_id", "1001") 
-                response = requests.get(f"{self.api_base}/getAvailablePackages/{customer_id}", timeout=self.timeout)
-                
-                if response.status_code == 200:
-                    packages = response.json()["data"]
-                    package_list = []
-                    for name, info in packages.items():
-                        features = ", ".join(info['features'])
-                        package_list.append(f"{name}: {info['price']} TL - {features}")
-                    result = "Mevcut paketler:\n" + "\n".join(package_list)
-                else:
-                    result = "Paket listesi alınamadı"
-                    success = False
-            
-            elif tool_name == "change_package":
-                
-                customer_id = parameters.get("customer_id")
-                new_package = parameters.get("new_package")
-                
-                if not customer_id:
-                    result = "Müşteri ID'si belirtilmedi"
-                    success = False
-                elif not new_package:
-                    result = "Yeni paket adı belirtilmedi"
-                    success = False
-                else:
-                    payload = {
-                        "customer_id": str(customer_id),
-                        "new_package": str(new_package)
-                    }
-                    
-                    response = requests.post(
-                        f"{self.api_base}/initiatePackageChange", 
-                        json=payload, 
-                        timeout=self.timeout,
-                        headers={'Content-Type': 'application/json'}
-                    )
-                    
-                    if response.status_code == 200:
-                        response_data = response.json()
-                        result = response_data.get("message", "Paket değişikliği tamamlandı")
-                    elif response.status_code == 422:
-                        try:
-                            error_detail = response.json()
-                            logger.error(f"🚨 Validation error: {error_detail}")
-                            result = f"Parametre hatası: {error_detail}"
-                        except:
-                            result = "Parametre formatı hatalı"
-                        success = False
-                    elif response.status_code == 404:
-                        result = "Müşteri bulunamadı"
-                        success = False
-                    elif response.status_code == 400:
-                        result = "Geçersiz paket adı"
-                        success = False
-                    else:
-                        result = f"API hatası: {response.status_code}"
-                        success = False
-            
-            elif tool_name == "get_billing_info":
-                customer_id = parameters.get("customer_id")
-                response = requests.get(f"{self.api_base}/getBillingInfo/{customer_id}", timeout=self.timeout)
-                
-                if response.status_code == 200:
-                    bills = response.json()["data"]["bills"]
-                    bill_info = []
-                    for bill in bills:
-                        status = "Ödendi" if bill["paid"] else "Ödenmedi"
-                        bill_info.append(f"{bill['month']}: {bill['amount']} TL - {status}")
-                    result = "Fatura bilgileri:\n" + "\n".join(bill_info)
-                else:
-                    result = "Fatura bilgisi alınamadı"
-                    success = False
-            
-            elif tool_name == "get_usage_stats":
-                customer_id = parameters.get("customer_id")
-                response = requests.get(f"{self.api_base}/getUsageStats/{customer_id}", timeout=self.timeout)
-                
-                if response.status_code == 200:
-                    stats = response.json()["data"]
-                    data_gb = stats["data_mb"] / 1024
-                    result = f"Kullanım: {stats['calls']} dakika arama, {data_gb:.1f} GB internet, {stats['sms']} SMS"
-                else:
-                    result = "Kullanım bilgisi alınamadı"
-                    success = False
-            
-            elif tool_name == "pay_bill":
-                payload = {
-                    "customer_id": parameters.get("customer_id"),
-                    "month": parameters.get("month"),
-                    "amount": parameters.get("amount")
-                }
-                response = requests.post(f"{self.api_base}/payBill", json=payload, timeout=self.timeout)
-                
-                if response.status_code == 200:
-                    result = "Fatura başarıyla ödendi"
-                else:
-                    result = "Ödeme başarısız"
-                    success = False
-            
+            error = self._validate_tool_call(tool_name, parameters)
+            if error:
+                result, success = error, False
+            elif tool_name in CONTEXT_TOOL_FIELDS:
+                field, path = CONTEXT_TOOL_FIELDS[tool_name]
+                data = self._read_customer_field(parameters.get("customer_id"), field, path)
+                result, success = self._format_tool_result(tool_name, 200 if data is not None else 404, data)
             else:
-                result = f"Bilinmeyen araç: {tool_name}"
-                success = False
-                error_message = "Unknown tool"
+                status_code, body = self._request_tool(tool_name, parameters)
+                result, success = self._format_tool_result(
+                    tool_name, status_code, body.get("data"), body.get("message"), body.get("detail", body)
+                )
+                if success and tool_name in WRITE_TOOLS:
+                    self.clear_customer_context(parameters.get("customer_id"))
         
         except requests.exceptions.Timeout:
-            result = "API zaman aşımı"
-            success = False
-            error_message = "Timeout"
+            result, success = "API zaman aşımı", False
         except requests.exceptions.ConnectionError:
-            result = "API bağlantı hatası"
-            success = False
-            error_message = "Connection error"
+            result, success = "API bağlantı hatası", False
         except Exception as e:
-            result = f"Sistem hatası: {str(e)}"
-            success = False
-            error_message = str(e)
+            result, success = f"Sistem hatası: {str(e)}", False
             logger.error(f"Tool execution error: {e}")
         
-        execution_time_ms = int((time.time() - start_time) * 1000)
+        self._log_tool_usage(tool_name, parameters, result, int((time.time() - start_time) * 1000), success)
+        return result, success
+
+    def execute_batch(self, tool_calls: List[Dict]) -> List[tuple[str, bool]]:
+        """Birden çok aracı tek /batch isteğiyle çalıştırır (sonuçlar istek sırasıyla).
+
+        Parametre hatası olan çağrılar gönderilmeden execute_tool ile aynı
+        mesajla yanıtlanır. Tek araç ya da desteklenmeyen araç varsa araçlar
+        tek tek çalıştırılır. /batch isteği başarısız olursa yalnızca okuma
+        araçları tek tek yeniden denenir; payBill/initiatePackageChange sunucuda
+        çalışmış olabileceğinden tekrarlanmaz, ancak isteğin hiç gönderilmediği
+        kesin ise (bağlantı kurulamadı) hepsi tek tek çalıştırılır.
+        """
+        if (len(tool_calls) < 2 or len(tool_calls) > MAX_BATCH_OPERATIONS
+                or any(call.get("tool") not in TOOL_BATCH_OPERATIONS for call in tool_calls)):
+            return [self.execute_tool(call.get("tool"), call.get("parameters", {})) for call in tool_calls]
         
+        outputs: List[Optional[tuple[str, bool]]] = [None] * len(tool_calls)
+        operations = []
+        for i, call in enumerate(tool_calls):
+            tool_name, parameters = call["tool"], call.get("parameters", {})
+            if self._validate_tool_call(tool_name, parameters):
+                outputs[i] = self.execute_tool(tool_name, parameters)
+                continue
+            operations.append({
+                "id": str(i),
+                "op": TOOL_BATCH_OPERATIONS[tool_name],
+                "params": self._operation_params(tool_name, parameters)
+            })
+        if not operations:
+            return outputs
+
         try:
-            self.session_service.log_tool_usage(
-                tool_name, parameters, result, execution_time_ms, success
-            )
+            response = requests.post(f"{self.api_base}/batch", json={"operations": operations}, timeout=self.timeout)
+            if response.status_code != 200:
+                raise ValueError(f"/batch status {response.status_code}")
+            op_results = response.json()["data"]["results"]
         except Exception as e:
-            logger.error(f"Failed to log tool usage: {e}")
+            never_sent = self._request_never_sent(e)
+            logger.warning(f"Batch request failed, running {'all' if never_sent else 'read'} tools one by one: {e}")
+            for operation in operations:
+                i = int(operation["id"])
+                tool_name, parameters = tool_calls[i]["tool"], tool_calls[i].get("parameters", {})
+                if never_sent or tool_name not in WRITE_TOOLS:
+                    outputs[i] = self.execute_tool(tool_name, parameters)
+                else:
+                    result = "İşlem sonucu doğrulanamadı, tekrar denemeden önce müşteri bilgilerini kontrol edin"
+                    self._log_tool_usage(tool_name, parameters, result, 0, False)
+                    outputs[i] = (result, False)
+            return outputs
         
-        return result, success
+        for operation, op_result in zip(operations, op_results):
+            i = int(operation["id"])
+            tool_name, parameters = tool_calls[i]["tool"], tool_calls[i].get("parameters", {})
+            result, success = self._format_tool_result(
+                tool_name, op_result["status_code"], op_result["data"], op_result["message"], op_result["message"]
+            )
+            if success and tool_name in WRITE_TOOLS:
+                self.clear_customer_context(parameters.get("customer_id"))
+            self._log_tool_usage(tool_name, parameters, result, int(op_result["duration_ms"]), success)
+            outputs[i] = (result, success)
+        return outputs
+
+    @staticmethod
+    def _request_never_sent(error: Exception) -> bool:
+        """Bağlantı hiç kurulamadıysa True (istek sunucuya ulaşmamıştır).
+
+        Kopan bağlantı ve okuma zaman aşımı da ConnectionError/Timeout olarak
+        gelir; onlarda istek işlenmiş olabilir, bu yüzden yalnızca bağlantı
+        kurma hataları sayılır.
+        """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError):
+            reason = getattr(error.args[0], "reason", None) if error.args else None
+            return isinstance(reason, urllib3.exceptions.NewConnectionError)
+        return False
 
 # -------------------------------------------------------------------
 # --- YENİ: Yerel LLM (LM Studio) Entegrasyonu ---
@@ -396,10 +560,11 @@ def test_llm_connection() -> bool:
 
 # --- Kalan Yardımcı Fonksiyonlarda Değişiklik Yok ---
 
-def parse_tool_call(response: str) -> Optional[Dict]:
+def parse_tool_call(response: str) -> Optional[Any]:
     """
     LLM yanıtından araç çağrısını daha esnek bir şekilde parse eder.
     Hem 'TOOL_CALL:' formatını hem de markdown içindeki JSON'u arar.
+    Birden fazla araç için JSON listesi döner.
     """
     try:
         if "TOOL_CALL:" in response:
@@ -506,6 +671,10 @@ BİR ARAÇ KULLANMA FORMATI:
 TOOL_CALL: {{"tool": "araç_adı", "parameters": {{"param1": "değer1"}}}}
 END_TOOL
 
+BİRDEN FAZLA ARAÇ GEREKİYORSA (sırayla çalıştırılır):
+TOOL_CALL: [{{"tool": "araç_1", "parameters": {{}}}}, {{"tool": "araç_2", "parameters": {{}}}}]
+END_TOOL
+
 KATI KURALLAR:
 1. Müşteri ID'sini bilmiyorsan onu sor, konuşma bitene kadar müşteri ID'sini aklında tut.
 2. Eğer müşterinin talebi senin uzmanlık alanın dışındaysa, kesinlikle başka bir aracı kullanmaya veya tahmin etmeye çalışma.
@@ -591,6 +760,11 @@ YÖNLENDİREBİLECEĞİN UZMANLAR:{specialist_descriptions}
         self.active_specialist = None
         self.conversation_history = []
         
+        # Önceki oturumun bağlamı kullanılmaz; müşteri biliniyorsa bağlam tek istekte önceden yüklenir
+        self.tool_executor.clear_customer_context()
+        if customer_id:
+            self.tool_executor.prefetch_customer_context(customer_id)
+        
         self.services.session.add_call_message(session_id, "system", f"Görüşme başladı - Müşteri: {customer_id or 'Bilinmiyor'}")
         
         logger.info(f"🎬 Yeni görüşme oturumu başladı: {session_id} (Layer: {self.current_layer})")
@@ -601,6 +775,7 @@ YÖNLENDİREBİLECEĞİN UZMANLAR:{specialist_descriptions}
         if self.session_manager.get_session_id():
             self.session_manager.end_session(resolution_status, customer_satisfaction, notes)
             logger.info("🏁 Görüşme oturumu sonlandırıldı")
+        self.tool_executor.clear_customer_context()
         self.current_customer_id = None
 
     def process_message(self, user_message: str, voice_response: bool = False) -> str:
@@ -633,8 +808,12 @@ YÖNLENDİREBİLECEĞİN UZMANLAR:{specialist_descriptions}
             response = call_llm_api(messages, max_tokens=max_tokens_for_call)
             
             tool_call = parse_tool_call(response)
+            if isinstance(tool_call, list) and len(tool_call) == 1:
+                tool_call = tool_call[0]
             
-            if tool_call:
+            if isinstance(tool_call, list):
+                final_response = self._process_tool_batch(tool_call, start_time)
+            elif tool_call:
                 tool_name = tool_call.get("tool")
                 parameters = tool_call.get("parameters", {})
                 
@@ -666,10 +845,10 @@ YÖNLENDİREBİLECEĞİN UZMANLAR:{specialist_descriptions}
                     
                     final_response = call_llm_api(follow_up_messages)
                     
-                    self.session_manager.log_message("assistant", final_response, tool_name, tool_result, int((time.time() - start_time) * 1000))
+                    self.session_manager.log_message("assistant", final_response, tool_name, tool_result, int((time.time() - start_time) * 1000), specialist=self.active_specialist)
             else:
                 final_response = response
-                self.session_manager.log_message("assistant", final_response, processing_time_ms=int((time.time() - start_time) * 1000))
+                self.session_manager.log_message("assistant", final_response, processing_time_ms=int((time.time() - start_time) * 1000), specialist=self.active_specialist)
             
             final_response = final_response.split("TOOL_CALL:")[0].strip()
             final_response = final_response.split("END_TOOL")[0].strip()
@@ -686,6 +865,30 @@ YÖNLENDİREBİLECEĞİN UZMANLAR:{specialist_descriptions}
                 self.session_manager.db.log_error(self.session_manager.get_session_id(), "process_message_error", error_message, traceback.format_exc(), "high")
             return "Üzgünüm, şu anda bir teknik sorun yaşıyorum. Lütfen tekrar deneyin."
 
+    def _process_tool_batch(self, tool_calls: List[Dict], start_time: float) -> str:
+        """Aynı turda istenen birden çok aracı tek /batch isteğiyle çalıştırıp yanıt üretir."""
+        tool_calls = [c for c in tool_calls if isinstance(c, dict) and c.get("tool") != "route_to_specialist"]
+        for call in tool_calls:
+            parameters = call.setdefault("parameters", {})
+            if 'customer_id' in AVAILABLE_TOOLS.get(call.get("tool"), {}).get('parameters', {}) and 'customer_id' not in parameters:
+                if self.current_customer_id:
+                    parameters['customer_id'] = self.current_customer_id
+        
+        results = self.tool_executor.execute_batch(tool_calls)
+        for call, (_, tool_success) in zip(tool_calls, results):
+            if call.get("tool") == "get_user_info" and tool_success and call["parameters"].get("customer_id"):
+                self.current_customer_id = call["parameters"]["customer_id"]
+        
+        tool_names = ", ".join(c.get("tool", "") for c in tool_calls)
+        tool_results = "\n".join(f"Araç '{c.get('tool')}' sonucu: {r}" for c, (r, _) in zip(tool_calls, results))
+        follow_up_messages = [
+            {"role": "system", "content": self._get_current_prompt()},
+            {"role": "user", "content": f"{tool_results}\n\nBu sonuçları kullanarak müşteriye kısa ve net bir yanıt ver."}
+        ]
+        final_response = call_llm_api(follow_up_messages)
+        self.session_manager.log_message("assistant", final_response, tool_names, tool_results, int((time.time() - start_time) * 1000), specialist=self.active_specialist)
+        return final_response
+
     def reset_conversation(self):
         """Konuşma geçmişini sıfırlar ama session'ı sonlandırmaz."""
         self.conversation_history = []
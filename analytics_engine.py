@@ -0,0 +1,423 @@
+# analytics_engine.py
+import sqlite3
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from pathlib import Path
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional; reports fall back to SQLite without it
+    duckdb = None
+
+logger = logging.getLogger("analytics_engine")
+
+# ================================
+# Mirrored Tables
+# ================================
+# 'append' tables are synced incrementally above the key watermark,
+# 'snapshot' tables are small or mutable and are reloaded in full on every sync,
+# 'changes' tables are mutable but captured in the source's change_outbox: only the
+# rows whose keys appear after the outbox watermark are re-copied (full reload when
+# the outbox is missing or has been pruned past the watermark),
+# 'rolling' tables only change at the tail (the open time bucket), so rows at or
+# above the watermark are replaced on every sync.
+# Only the columns that reports need are mirrored; transcripts stay in SQLite.
+
+MIRROR_TABLES = {
+    'customers': {
+        'mode': 'changes',
+        'key': 'customer_id',
+        'columns': {
+            'customer_id': 'VARCHAR',
+            'name': 'VARCHAR',
+            'registration_date': 'TIMESTAMP',
+            'status': 'VARCHAR',
+        },
+    },
+    'packages': {
+        'mode': 'snapshot',
+        'key': 'package_id',
+        'columns': {
+            'package_id': 'BIGINT',
+            'package_name': 'VARCHAR',
+            'price': 'DOUBLE',
+            'is_active': 'BOOLEAN',
+        },
+    },
+    'customer_subscriptions': {
+        'mode': 'changes',
+        'key': 'subscription_id',
+        'columns': {
+            'subscription_id': 'BIGINT',
+            'customer_id': 'VARCHAR',
+            'package_id': 'BIGINT',
+            'start_date': 'DATE',
+            'end_date': 'DATE',
+            'status': 'VARCHAR',
+        },
+    },
+    'bills': {
+        'mode': 'changes',
+        'key': 'bill_id',
+        'columns': {
+            'bill_id': 'BIGINT',
+            'customer_id': 'VARCHAR',
+            'bill_month': 'VARCHAR',
+            'amount': 'DOUBLE',
+            'due_date': 'DATE',
+            'is_paid': 'BOOLEAN',
+            'paid_date': 'TIMESTAMP',
+        },
+    },
+    'call_sessions': {
+        'mode': 'changes',
+        'key': 'session_id',
+        'columns': {
+            'session_id': 'VARCHAR',
+            'customer_id': 'VARCHAR',
+            'start_time': 'TIMESTAMP',
+            'duration_seconds': 'BIGINT',
+            'status': 'VARCHAR',
+            'resolution_status': 'VARCHAR',
+            'customer_satisfaction': 'BIGINT',
+        },
+    },
+    'tool_usage_minutely': {
+        'mode': 'rolling',
+        'key': 'minute',
+        'columns': {
+            'tool_name': 'VARCHAR',
+            'minute': 'TIMESTAMP',
+            'call_count': 'BIGINT',
+            'success_count': 'BIGINT',
+            'total_execution_time_ms': 'BIGINT',
+        },
+    },
+    'call_messages': {
+        'mode': 'append',
+        'key': 'message_id',
+        'columns': {
+            'message_id': 'BIGINT',
+            'session_id': 'VARCHAR',
+            'role': 'VARCHAR',
+            'processing_time_ms': 'BIGINT',
+            'timestamp': 'TIMESTAMP',
+        },
+    },
+}
+
+SYNC_BATCH_SIZE = 10000
+# Keys per ``IN (...)`` when re-copying changed rows
+CHANGED_KEYS_BATCH_SIZE = 500
+
+
+class DuckDBAnalyticsEngine:
+    """Embedded columnar mirror of the operational tables for reporting.
+
+    The mirror lives in its own DuckDB file and is refreshed from the SQLite
+    database with ``sync()``. Append-only tables are copied incrementally above
+    a per-table watermark, tables covered by the source's change outbox are
+    patched with just the changed rows, and the rest are reloaded as snapshots.
+    Report methods return the same dict shapes as ``CallCenterDatabase``.
+    When the source keeps its telemetry in a separate log file, pass it as
+    ``log_db_path`` so the mirrored telemetry tables are read from there.
+    """
+
+    def __init__(self, sqlite_path: str, duckdb_path: str = "call_center_analytics.duckdb",
+                 sync_interval_seconds: Optional[int] = 300, log_db_path: Optional[str] = None):
+        if duckdb is None:
+            raise RuntimeError("duckdb paketi kurulu değil: pip install duckdb")
+
+        self.sqlite_path = sqlite_path
+        self.log_db_path = log_db_path
+        self.duckdb_path = duckdb_path
+        self.sync_interval_seconds = sync_interval_seconds
+        self._conn = duckdb.connect(duckdb_path)
+        self._lock = threading.RLock()
+        self._last_sync = 0.0
+        self._init_mirror()
+        logger.info(f"Analytics mirror initialized: {duckdb_path}")
+
+    def _init_mirror(self):
+        """Create mirror tables and the watermark table."""
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_watermarks (
+                    table_name VARCHAR PRIMARY KEY,
+                    watermark VARCHAR,
+                    row_count BIGINT,
+                    synced_at TIMESTAMP
+                )
+            ''')
+            for table, spec in MIRROR_TABLES.items():
+                columns = ", ".join(f"{name} {col_type}" for name, col_type in spec['columns'].items())
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+
+    # ================================
+    # Synchronization
+    # ================================
+
+    def _source_connection(self) -> sqlite3.Connection:
+        uri = f"{Path(self.sqlite_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True)
+        if self.log_db_path:
+            # Telemetry tables were moved out of the main file: unqualified names resolve here
+            conn.execute('ATTACH DATABASE ? AS logs', (f"{Path(self.log_db_path).resolve().as_uri()}?mode=ro",))
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def _get_watermark(self, table: str) -> Optional[str]:
+        row = self._conn.execute(
+            'SELECT watermark FROM sync_watermarks WHERE table_name = ?', (table,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_watermark(self, table: str, watermark: Any):
+        row_count = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        self._conn.execute('''
+            INSERT OR REPLACE INTO sync_watermarks (table_name, watermark, row_count, synced_at)
+            VALUES (?, ?, ?, ?)
+        ''', (table, None if watermark is None else str(watermark), row_count, datetime.utcnow()))
+
+    def _copy_rows(self, source: sqlite3.Connection, table: str, spec: Dict,
+                   where: str = '', params: tuple = ()) -> int:
+        """Stream rows from SQLite into the mirror in batches."""
+        names = list(spec['columns'])
+        select_sql = f"SELECT {', '.join(names)} FROM {table} {where} ORDER BY {spec['key']}"
+        insert_sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+        cursor = source.execute(select_sql, params)
+        copied = 0
+        while True:
+            batch = cursor.fetchmany(SYNC_BATCH_SIZE)
+            if not batch:
+                break
+            self._conn.executemany(insert_sql, batch)
+            copied += len(batch)
+        return copied
+
+    @staticmethod
+    def _outbox_bounds(source: sqlite3.Connection) -> Optional[tuple]:
+        """(oldest retained seq, highest seq ever assigned), or None without an outbox."""
+        try:
+            oldest = source.execute('SELECT MIN(seq) FROM change_outbox').fetchone()[0]
+        except sqlite3.OperationalError:
+            return None
+        row = source.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_outbox'").fetchone()
+        return oldest, row[0] if row else 0
+
+    def _sync_changes(self, source: sqlite3.Connection, table: str, spec: Dict) -> tuple:
+        """Apply outbox deltas to a 'changes' table. Returns (copied rows, new watermark)."""
+        bounds = self._outbox_bounds(source)
+        watermark = self._get_watermark(table)
+        if bounds is None:
+            self._conn.execute(f'DELETE FROM {table}')
+            return self._copy_rows(source, table, spec), None
+
+        oldest, latest = bounds
+        start = int(watermark) if watermark is not None else None
+        lost = (start is None or latest < start
+                or (oldest is None and latest > start) or (oldest is not None and oldest > start + 1))
+        if lost:
+            # Read the high-water mark first: changes racing the reload are replayed next time
+            self._conn.execute(f'DELETE FROM {table}')
+            return self._copy_rows(source, table, spec), latest
+
+        keys = [row[0] for row in source.execute(
+            'SELECT DISTINCT row_key FROM change_outbox WHERE table_name = ? AND seq > ? AND seq <= ?',
+            (table, start, latest)
+        )]
+        copied = 0
+        for i in range(0, len(keys), CHANGED_KEYS_BATCH_SIZE):
+            chunk = keys[i:i + CHANGED_KEYS_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            self._conn.execute(f"DELETE FROM {table} WHERE {spec['key']} IN ({placeholders})", chunk)
+            # Deleted rows are simply not found in the source
+            copied += self._copy_rows(source, table, spec, f"WHERE {spec['key']} IN ({placeholders})", tuple(chunk))
+        return copied, latest
+
+    def sync(self, tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """Bring the mirror up to date. Returns copied row counts per table."""
+        results = {}
+        source = self._source_connection()
+        try:
+            with self._lock:
+                for table in tables or MIRROR_TABLES:
+                    spec = MIRROR_TABLES[table]
+                    self._conn.execute('BEGIN TRANSACTION')
+                    try:
+                        if spec['mode'] == 'append':
+                            watermark = self._get_watermark(table)
+                            start_key = int(watermark) if watermark is not None else 0
+                            copied = self._copy_rows(
+                                source, table, spec, f"WHERE {spec['key']} > ?", (start_key,)
+                            )
+                            new_watermark = self._conn.execute(
+                                f"SELECT MAX({spec['key']}) FROM {table}"
+                            ).fetchone()[0]
+                        elif spec['mode'] == 'rolling':
+                            watermark = self._get_watermark(table)
+                            if watermark is not None:
+                                self._conn.execute(f"DELETE FROM {table} WHERE {spec['key']} >= ?", (watermark,))
+                                copied = self._copy_rows(
+                                    source, table, spec, f"WHERE {spec['key']} >= ?", (watermark,)
+                                )
+                            else:
+                                copied = self._copy_rows(source, table, spec)
+                            new_watermark = self._conn.execute(
+                                f"SELECT strftime(MAX({spec['key']}), '%Y-%m-%d %H:%M:%S') FROM {table}"
+                            ).fetchone()[0]
+                        elif spec['mode'] == 'changes':
+                            copied, new_watermark = self._sync_changes(source, table, spec)
+                        else:
+                            self._conn.execute(f'DELETE FROM {table}')
+                            copied = self._copy_rows(source, table, spec)
+                            new_watermark = datetime.utcnow().isoformat(timespec='seconds')
+
+                        self._set_watermark(table, new_watermark)
+                        self._conn.execute('COMMIT')
+                    except Exception:
+                        self._conn.execute('ROLLBACK')
+                        raise
+                    results[table] = copied
+                self._last_sync = time.time()
+        finally:
+            source.close()
+
+        logger.info(f"Analytics mirror synced: {results}")
+        return results
+
+    def get_sync_state(self) -> List[Dict]:
+        """Per-table watermark, row count and last sync time."""
+        with self._lock:
+            return self._fetch_dicts(
+                'SELECT table_name, watermark, row_count, synced_at FROM sync_watermarks ORDER BY table_name'
+            )
+
+    def _ensure_fresh(self):
+        if self.sync_interval_seconds is None:
+            return
+        if time.time() - self._last_sync >= self.sync_interval_seconds:
+            self.sync()
+
+    def _fetch_dicts(self, query: str, params: tuple = ()) -> List[Dict]:
+        cursor = self._conn.execute(query, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def _query(self, query: str, params: tuple = ()) -> List[Dict]:
+        self._ensure_fresh()
+        with self._lock:
+            return self._fetch_dicts(query, params)
+
+    # ================================
+    # Reports
+    # ================================
+
+    def get_monthly_revenue(self, year_month: str = None) -> Dict:
+        """Get monthly revenue statistics."""
+        if not year_month:
+            year_month = datetime.now().strftime('%Y-%m')
+
+        rows = self._query('''
+            SELECT
+                COUNT(*) as total_bills,
+                SUM(amount) as total_amount,
+                COUNT(CASE WHEN is_paid THEN 1 END) as paid_bills,
+                SUM(CASE WHEN is_paid THEN amount ELSE 0 END) as collected_amount,
+                COUNT(CASE WHEN NOT is_paid THEN 1 END) as unpaid_bills,
+                SUM(CASE WHEN NOT is_paid THEN amount ELSE 0 END) as outstanding_amount
+            FROM bills
+            WHERE bill_month = ?
+        ''', (year_month,))
+        return rows[0] if rows else {}
+
+    def get_package_statistics(self) -> List[Dict]:
+        """Get package subscription statistics."""
+        return self._query('''
+            SELECT
+                p.package_name,
+                p.price,
+                COUNT(cs.subscription_id) as active_subscriptions,
+                SUM(p.price) as monthly_revenue
+            FROM packages p
+            LEFT JOIN customer_subscriptions cs ON p.package_id = cs.package_id
+                AND cs.status = 'active'
+            WHERE p.is_active
+            GROUP BY p.package_id, p.package_name, p.price
+            ORDER BY monthly_revenue DESC
+        ''')
+
+    def get_tool_usage_stats(self, days: int = 30) -> List[Dict]:
+        """Get tool usage statistics."""
+        since = datetime.utcnow() - timedelta(days=days)
+        return self._query('''
+            SELECT
+                tool_name,
+                SUM(call_count) as usage_count,
+                SUM(total_execution_time_ms) * 1.0 / SUM(call_count) as avg_execution_time,
+                (SUM(success_count) * 100.0 / SUM(call_count)) as success_rate
+            FROM tool_usage_minutely
+            WHERE minute >= ?
+            GROUP BY tool_name
+            ORDER BY usage_count DESC
+        ''', (since,))
+
+    def get_customer_lifetime_value(self, customer_id: str) -> Dict:
+        """Calculate customer lifetime value."""
+        rows = self._query('''
+            SELECT
+                c.registration_date,
+                COUNT(b.bill_id) as total_bills,
+                SUM(CASE WHEN b.is_paid THEN b.amount ELSE 0 END) as total_paid,
+                AVG(CASE WHEN b.is_paid THEN b.amount ELSE NULL END) as avg_bill_amount,
+                date_diff('second', c.registration_date, ?) / 86400.0 as days_as_customer
+            FROM customers c
+            LEFT JOIN bills b ON c.customer_id = b.customer_id
+            WHERE c.customer_id = ?
+            GROUP BY c.customer_id, c.registration_date
+        ''', (datetime.utcnow(), customer_id))
+
+        if not rows:
+            return {}
+
+        data = rows[0]
+        data['registration_date'] = str(data['registration_date'])
+        months_as_customer = max(1, data['days_as_customer'] / 30)
+        data['monthly_value'] = data['total_paid'] / months_as_customer if data['total_paid'] else 0
+        return data
+
+    def get_daily_metrics(self, date_str: str = None) -> Dict:
+        """Get daily performance metrics."""
+        if not date_str:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+
+        rows = self._query('''
+            SELECT
+                COUNT(*) as total_calls,
+                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_calls,
+                COUNT(CASE WHEN resolution_status = 'resolved' THEN 1 END) as resolved_calls,
+                AVG(duration_seconds) as avg_duration,
+                AVG(customer_satisfaction) as avg_satisfaction
+            FROM call_sessions
+            WHERE CAST(start_time AS DATE) = CAST(? AS DATE)
+        ''', (date_str,))
+        return rows[0] if rows else {}
+
+    def close(self):
+        """Close the DuckDB connection."""
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    # Sync the mirror and print the reports
+    logging.basicConfig(level=logging.INFO)
+    engine = DuckDBAnalyticsEngine("call_center.db", sync_interval_seconds=None)
+    print(engine.sync())
+    print(engine.get_sync_state())
+    print(engine.get_package_statistics())
+    print(engine.get_monthly_revenue())
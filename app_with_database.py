@@ -1,14 +1,35 @@
 
+import os
+import re
+import json
 import time
-import random
+import asyncio
 import logging
-from typing import Dict, List, Optional
-from fastapi import FastAPI, HTTPException, status
+from decimal import Decimal
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from pydantic import BaseModel, Field, validator
 # Database import
-from database import CallCenterDatabase
+from database import CallCenterDatabase, ToolLoggingPolicy
+from storage_backend import (
+    create_storage_backend, RESULT_CUSTOMER_NOT_FOUND, RESULT_BILL_NOT_FOUND,
+    RESULT_ALREADY_PAID, RESULT_AMOUNT_MISMATCH
+)
 from services import ServiceFactory  
+from payload_codec import PayloadCodec
+from fault_injection import PRESETS, InjectedFault, load_fault_injector
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; responses fall back to the stdlib encoder
+    orjson = None
 
 # -------------------------------------------------------------------
 # Logging Configuration
@@ -23,12 +44,55 @@ logger = logging.getLogger("mock-api")
 # Database ve Services Initialization
 # -------------------------------------------------------------------
 DATABASE_PATH = "call_center.db"
+# postgresql://... verilirse SQLite yerine PostgreSQL backend'i kullanılır
+DATABASE_URL = os.getenv("DATABASE_URL") or None
+# Raporlama sorguları için opsiyonel snapshot kopyası (boşsa ana dosya read-only açılır)
+REPORTING_REPLICA_PATH = os.getenv("REPORTING_REPLICA_PATH") or None
+REPORTING_REPLICA_REFRESH_SECONDS = int(os.getenv("REPORTING_REPLICA_REFRESH_SECONDS", "300"))
+# Mesaj/araç/hata logları için ayrı (ATTACH edilen) veritabanı dosyası
+LOG_DATABASE_PATH = os.getenv("LOG_DATABASE_PATH") or None
+# Eski görüşme kayıtlarının aylık arşiv dosyaları (opsiyonel)
+TRANSCRIPT_ARCHIVE_DIR = os.getenv("TRANSCRIPT_ARCHIVE_DIR") or None
+# Mesaj/araç sonucu kolonları için sıkıştırma: zlib | zstd (boş ise düz metin)
+PAYLOAD_COMPRESSION = os.getenv("PAYLOAD_COMPRESSION") or None
+PAYLOAD_ZSTD_DICTIONARY = os.getenv("PAYLOAD_ZSTD_DICTIONARY") or None
+# Başarılı araç çağrılarının tam log satırı için örnekleme oranı (hatalar her zaman loglanır)
+TOOL_LOG_SUCCESS_SAMPLE_RATE = float(os.getenv("TOOL_LOG_SUCCESS_SAMPLE_RATE", "1.0"))
+# Servis katmanı önbelleği kayıt sayısı (0: kapalı)
+SERVICE_CACHE_SIZE = int(os.getenv("SERVICE_CACHE_SIZE", "1024"))
+# Kolon bazlı DuckDB rapor aynası (opsiyonel, duckdb paketi gerekir)
+ANALYTICS_DUCKDB_PATH = os.getenv("ANALYTICS_DUCKDB_PATH") or None
+# Mock gecikme/hata profili: off | legacy | realistic | degraded, JSON metni ya da JSON dosya yolu
+MOCK_FAULT_PROFILE = os.getenv("MOCK_FAULT_PROFILE", "off")
+# Bu boyutun (bayt) üstündeki yanıtlar gzip ile sıkıştırılır (0: kapalı)
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
 
 try:
-    db = CallCenterDatabase(DATABASE_PATH)
-    services = ServiceFactory(db)  # Services factory initialize
+    if DATABASE_URL:
+        db = create_storage_backend(DATABASE_URL)
+    else:
+        db = CallCenterDatabase(
+            DATABASE_PATH,
+            replica_path=REPORTING_REPLICA_PATH,
+            replica_refresh_seconds=REPORTING_REPLICA_REFRESH_SECONDS,
+            log_db_path=LOG_DATABASE_PATH,
+            archive_dir=TRANSCRIPT_ARCHIVE_DIR,
+            payload_codec=PayloadCodec(
+                PAYLOAD_COMPRESSION,
+                zstd_dictionary=Path(PAYLOAD_ZSTD_DICTIONARY).read_bytes() if PAYLOAD_ZSTD_DICTIONARY else None
+            ),
+            tool_logging_policy=ToolLoggingPolicy(success_sample_rate=TOOL_LOG_SUCCESS_SAMPLE_RATE)
+        )
+    analytics_engine = None
+    if ANALYTICS_DUCKDB_PATH and not DATABASE_URL:
+        from analytics_engine import DuckDBAnalyticsEngine
+        analytics_engine = DuckDBAnalyticsEngine(DATABASE_PATH, ANALYTICS_DUCKDB_PATH, log_db_path=LOG_DATABASE_PATH)
+    services = ServiceFactory(db, analytics_engine=analytics_engine, cache_size=SERVICE_CACHE_SIZE)  # Services factory initialize
     logger.info(f"✅ Database initialized: {DATABASE_PATH}")
     logger.info(f"✅ Services initialized")
+    faults = load_fault_injector(MOCK_FAULT_PROFILE)
+    logger.info(f"✅ Fault profile: {faults.name}")
 except Exception as e:
     logger.error(f"❌ Database/Services initialization failed: {e}")
     raise
@@ -61,25 +125,434 @@ class PackageChangeRequest(BaseModel):
             raise ValueError(f'Geçersiz paket adı. Geçerli paketler: {valid_packages}')
         return str(v).strip()
 
+class PackageMigrationRequest(BaseModel):
+    target_package: str = Field(..., example="Gold")
+    customer_ids: Optional[List[str]] = Field(None, example=["1001", "1002"])
+    from_package: Optional[str] = Field(None, example="Bronze")
+    usage_filter: Optional[Dict] = Field(None, example={"usage_month": "2025-07", "min_data_mb": 10000})
+    chunk_size: int = Field(1000, ge=1, le=50000)
+    dry_run: bool = True
+    migration_id: Optional[str] = None
+
+# Ödeme sonuç kodlarının HTTP karşılıkları
+PAYMENT_ERRORS = {
+    RESULT_CUSTOMER_NOT_FOUND: (404, "Kullanıcı bulunamadı"),
+    RESULT_BILL_NOT_FOUND: (404, "Fatura bulunamadı"),
+    RESULT_ALREADY_PAID: (409, "Fatura zaten ödenmiş"),
+    RESULT_AMOUNT_MISMATCH: (400, "Tutar uyuşmuyor"),
+}
+
+# /customer/{id}/context ile seçilebilen alanlar
+CONTEXT_FIELDS = ("info", "bills", "usage", "package")
+
+# Toplu uç noktalarda tek istekte kabul edilen en fazla müşteri sayısı
+MAX_BATCH_CUSTOMER_IDS = 500
+
+class CustomerBatchRequest(BaseModel):
+    customer_ids: List[str] = Field(..., example=["1001", "1002", "1003"])
+    month: Optional[str] = Field(None, example="2025-07")
+    limit: int = Field(10, ge=1, le=100)
+    
+    @validator('customer_ids')
+    def validate_customer_ids(cls, v):
+        ids = list(dict.fromkeys(str(cid).strip() for cid in v if str(cid).strip()))
+        if not ids:
+            raise ValueError('En az bir müşteri ID gerekli')
+        if len(ids) > MAX_BATCH_CUSTOMER_IDS:
+            raise ValueError(f'En fazla {MAX_BATCH_CUSTOMER_IDS} müşteri ID gönderilebilir')
+        return ids
+
+# /batch ile çağrılabilen işlemler: okumalar eşzamanlı, yazmalar sırayla çalışır
+BATCH_READ_OPERATIONS = ("getUserInfo", "getAvailablePackages", "getBillingInfo", "getUsageStats", "customerContext")
+BATCH_WRITE_OPERATIONS = ("initiatePackageChange", "payBill")
+# Tek /batch isteğinde kabul edilen en fazla işlem sayısı
+MAX_BATCH_OPERATIONS = 20
+
+class BatchOperation(BaseModel):
+    op: str = Field(..., example="getUserInfo")
+    params: Dict = Field(default_factory=dict, example={"customer_id": "1001"})
+    id: Optional[str] = Field(None, example="info-1")
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    
+    @validator('operations')
+    def validate_operations(cls, v):
+        if not v:
+            raise ValueError('En az bir işlem gerekli')
+        if len(v) > MAX_BATCH_OPERATIONS:
+            raise ValueError(f'En fazla {MAX_BATCH_OPERATIONS} işlem gönderilebilir')
+        unknown = sorted({o.op for o in v} - set(BATCH_READ_OPERATIONS + BATCH_WRITE_OPERATIONS))
+        if unknown:
+            raise ValueError(f'Bilinmeyen işlem: {", ".join(unknown)}')
+        return v
+
+class CollectionsClaimRequest(BaseModel):
+    worker_id: str = Field(..., example="agent-07")
+    batch_size: int = Field(20, ge=1, le=500)
+    lease_seconds: int = Field(900, ge=30, le=86400)
+
+class CollectionsCompleteRequest(BaseModel):
+    worker_id: str = Field(..., example="agent-07")
+    customer_id: str = Field(..., example="1001")
+    bill_month: str = Field(..., example="2025-07")
+    outcome: str = Field(..., example="promise_to_pay")
+    retry_after_hours: int = Field(24, ge=0, le=24 * 30)
+
+class FaultProfileRequest(BaseModel):
+    # Hazır profil adı (off | legacy | realistic | degraded) ya da default/routes tanımı
+    preset: Optional[str] = Field(None, example="realistic")
+    default: Optional[Dict] = Field(None, example={"distribution": "lognormal", "median_ms": 150, "sigma": 0.5, "max_ms": 2000})
+    routes: Optional[Dict[str, Dict]] = Field(None, example={"/payBill": {"distribution": "uniform", "min_ms": 200, "max_ms": 800, "failure_rate": 0.1}})
+
 class PaymentRequest(BaseModel):
     customer_id: str = Field(..., example="1001")
     month: str = Field(..., example="2025-07")
     amount: float = Field(..., example=150.00)
 
+# -------------------------------------------------------------------
+# Response Models
+# -------------------------------------------------------------------
+# Her uç noktanın ``data`` alanı tiplidir; OpenAPI şeması ve doğrulama bunlardan
+# üretilir. Şeması kayıt türüne göre değişen satırlar (oturum mesajları, tablo
+# sayaçları vb.) Dict[str, Any] olarak bırakılmıştır.
+
+class HealthData(BaseModel):
+    api_status: str
+    database_status: str
+    total_customers: int
+    total_sessions: int
+
+class UserInfoData(BaseModel):
+    name: str
+    package: str
+    balance: float
+
+class PackageInfo(BaseModel):
+    price: float
+    features: List[str]
+
+class PackageChangeData(BaseModel):
+    code: str
+    previous_package: Optional[str] = None
+
+class BillItem(BaseModel):
+    month: str
+    amount: float
+    paid: bool
+
+class BillingData(BaseModel):
+    bills: List[BillItem]
+
+class UsageData(BaseModel):
+    calls: int
+    data_mb: int
+    sms: int
+
+class PaymentData(BaseModel):
+    code: str
+    balance_after: Optional[float] = None
+
+class CurrentPackage(BaseModel):
+    name: str
+    price: float
+    features: List[str]
+
+class CustomerContextData(BaseModel):
+    # İstenmeyen alanlar yanıtta yer almaz (response_model_exclude_unset)
+    info: Optional[UserInfoData] = None
+    bills: Optional[List[BillItem]] = None
+    usage: Optional[UsageData] = None
+    package: Optional[CurrentPackage] = None
+
+class CallHistoryItem(BaseModel):
+    session_id: str
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    status: Optional[str] = None
+    resolution_status: Optional[str] = None
+    customer_satisfaction: Optional[int] = None
+
+class CallHistoryData(BaseModel):
+    history: List[CallHistoryItem]
+
+class BatchCustomerInfoData(BaseModel):
+    customers: Dict[str, Dict[str, Any]]
+    not_found: List[str]
+
+class BatchBillsData(BaseModel):
+    bills: Dict[str, List[Dict[str, Any]]]
+
+class BatchUsageData(BaseModel):
+    usage: Dict[str, Optional[Dict[str, Any]]]
+
+class BatchHistoryData(BaseModel):
+    history: Dict[str, List[CallHistoryItem]]
+
+class BatchOperationResult(BaseModel):
+    id: Optional[str] = None
+    op: str
+    status: str
+    status_code: int
+    data: Optional[Dict[str, Any]] = None
+    message: Optional[str] = None
+    duration_ms: float
+
+class BatchData(BaseModel):
+    results: List[BatchOperationResult]
+    failed: int
+    duration_ms: float
+
+class DailyMetricsData(BaseModel):
+    total_calls: int = 0
+    completed_calls: int = 0
+    resolved_calls: int = 0
+    avg_duration: Optional[float] = None
+    avg_satisfaction: Optional[float] = None
+
+class LatencyData(BaseModel):
+    metric: str
+    dimension: Optional[str] = None
+    window_minutes: int
+    count: int
+    avg_ms: Optional[float] = None
+    latency_p50_ms: float
+    latency_p90_ms: float
+    latency_p99_ms: float
+    dimensions: List[str]
+
+class ToolUsageStat(BaseModel):
+    tool_name: str
+    usage_count: int
+    avg_execution_time: Optional[float] = None
+    success_rate: Optional[float] = None
+    latency_histogram: Dict[str, int]
+    execution_time_p50_ms: float
+    execution_time_p90_ms: float
+    execution_time_p99_ms: float
+
+class SessionDetailsData(BaseModel):
+    session: Dict[str, Any]
+    messages: List[Dict[str, Any]] = []
+    tool_usage: List[Dict[str, Any]] = []
+
+class CollectionsPageData(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    summary: List[Dict[str, Any]] = []
+
+class CollectionsClaimData(BaseModel):
+    items: List[Dict[str, Any]]
+
+class ChangeBatchData(BaseModel):
+    consumer: str
+    offset: int
+    changes: List[Dict[str, Any]]
+    next_offset: int
+    has_more: bool
+    # offset + 1'den büyükse aradaki kayıtlar okunmadan budanmıştır
+    first_available_seq: int
+
+class ChangeOffsetData(BaseModel):
+    consumer: str
+    offset: int
+
+class ChangeConsumerStatus(BaseModel):
+    consumer: str
+    last_seq: int
+    updated_at: Optional[str] = None
+    lag: int
+
+class ChangeFeedStatusData(BaseModel):
+    oldest_seq: Optional[int] = None
+    latest_seq: Optional[int] = None
+    entries: int
+    consumers: List[ChangeConsumerStatus]
+
+class CleanupData(BaseModel):
+    deleted_sessions: int
+    balance_ledger: Optional[Dict[str, Any]] = None
+    pruned_changes: Optional[int] = None
+
+class BackupData(BaseModel):
+    backup_path: str
+
+class FaultProfileData(BaseModel):
+    name: str
+    default: Optional[Dict[str, Any]] = None
+    routes: Dict[str, Dict[str, Any]]
+
+class FaultStatusData(BaseModel):
+    profile: FaultProfileData
+    stats: Dict[str, Dict[str, float]]
+
+class AgentSessionData(BaseModel):
+    session_id: str
+
+class AgentMessageData(BaseModel):
+    message_id: int
+
+class SampleCustomersData(BaseModel):
+    customers: List[Dict[str, str]]
+
+class HealthResponse(StandardResponse):
+    data: Optional[HealthData] = None
+
+class UserInfoResponse(StandardResponse):
+    data: Optional[UserInfoData] = None
+
+class PackagesResponse(StandardResponse):
+    data: Optional[Dict[str, PackageInfo]] = None
+
+class PackageChangeResponse(StandardResponse):
+    data: Optional[PackageChangeData] = None
+
+class BillingResponse(StandardResponse):
+    data: Optional[BillingData] = None
+
+class UsageResponse(StandardResponse):
+    data: Optional[UsageData] = None
+
+class PaymentResponse(StandardResponse):
+    data: Optional[PaymentData] = None
+
+class CustomerContextResponse(StandardResponse):
+    data: Optional[CustomerContextData] = None
+
+class CallHistoryResponse(StandardResponse):
+    data: Optional[CallHistoryData] = None
+
+class BatchCustomerInfoResponse(StandardResponse):
+    data: Optional[BatchCustomerInfoData] = None
+
+class BatchBillsResponse(StandardResponse):
+    data: Optional[BatchBillsData] = None
+
+class BatchUsageResponse(StandardResponse):
+    data: Optional[BatchUsageData] = None
+
+class BatchHistoryResponse(StandardResponse):
+    data: Optional[BatchHistoryData] = None
+
+class BatchResponse(StandardResponse):
+    data: Optional[BatchData] = None
+
+class DailyMetricsResponse(StandardResponse):
+    data: Optional[DailyMetricsData] = None
+
+class LatencyResponse(StandardResponse):
+    data: Optional[LatencyData] = None
+
+class ToolUsageResponse(StandardResponse):
+    data: Optional[List[ToolUsageStat]] = None
+
+class CountersResponse(StandardResponse):
+    # Önbellek sayaçları ve tablo bazlı kayıt sayıları gibi serbest anahtarlı istatistikler
+    data: Optional[Dict[str, Any]] = None
+
+class SessionDetailsResponse(StandardResponse):
+    data: Optional[SessionDetailsData] = None
+
+class CollectionsPageResponse(StandardResponse):
+    data: Optional[CollectionsPageData] = None
+
+class CollectionsClaimResponse(StandardResponse):
+    data: Optional[CollectionsClaimData] = None
+
+class ChangeBatchResponse(StandardResponse):
+    data: Optional[ChangeBatchData] = None
+
+class ChangeOffsetResponse(StandardResponse):
+    data: Optional[ChangeOffsetData] = None
+
+class ChangeFeedStatusResponse(StandardResponse):
+    data: Optional[ChangeFeedStatusData] = None
+
+class PackageMigrationResponse(StandardResponse):
+    # Dry-run ve gerçek taşıma özetleri farklı alanlar içerir
+    data: Optional[Dict[str, Any]] = None
+
+class CleanupResponse(StandardResponse):
+    data: Optional[CleanupData] = None
+
+class BackupResponse(StandardResponse):
+    data: Optional[BackupData] = None
+
+class FaultStatusResponse(StandardResponse):
+    data: Optional[FaultStatusData] = None
+
+class FaultProfileResponse(StandardResponse):
+    data: Optional[FaultProfileData] = None
+
+class AgentSessionResponse(StandardResponse):
+    data: Optional[AgentSessionData] = None
+
+class AgentMessageResponse(StandardResponse):
+    data: Optional[AgentMessageData] = None
+
+class SampleCustomersResponse(StandardResponse):
+    data: Optional[SampleCustomersData] = None
+
 # -------------------------------------------------------------------
 # Utility Functions 
 # -------------------------------------------------------------------
-def simulate_latency(min_ms: int = 50, max_ms: int = 300):
-    """Random delay to mimic real API response times."""
-    delay = random.uniform(min_ms / 1000, max_ms / 1000)
-    time.sleep(delay)
+def format_user_info(customer_info: Dict) -> Dict:
+    """getUserInfo yanıt formatı."""
+    return {
+        "name": customer_info["name"],
+        "package": customer_info["package_name"] or "Tanımsız",
+        "balance": float(customer_info["current_balance"] or 0)
+    }
+
+def format_bills(bills: List[Dict]) -> List[Dict]:
+    """getBillingInfo yanıt formatı."""
+    return [
+        {"month": bill["bill_month"], "amount": float(bill["amount"]), "paid": bool(bill["is_paid"])}
+        for bill in bills
+    ]
 
-def random_failure(chance: float = 0.05):
-    """Randomly raise a 503 to simulate transient errors."""
-    if random.random() < chance:
-        logger.warning("Simulated downstream service failure")
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                            detail="Geçici hizmet kesintisi, lütfen tekrar deneyin")
+def format_usage(stats: Optional[Dict]) -> Dict:
+    """getUsageStats yanıt formatı (kayıt yoksa sıfırlar)."""
+    stats = stats or {"calls_minutes": 0, "data_mb": 0, "sms_count": 0}
+    return {
+        "calls": int(stats["calls_minutes"]),
+        "data_mb": int(stats["data_mb"]),
+        "sms": int(stats["sms_count"])
+    }
+
+def json_default(value: Any) -> Any:
+    """JSON'un doğrudan desteklemediği veritabanı değerleri (PostgreSQL Decimal/tarih vb.)."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"{type(value).__name__} JSON'a çevrilemiyor")
+
+class FastJSONResponse(JSONResponse):
+    """orjson ile yazılan JSON yanıtı; orjson kurulu değilse standart json kullanılır."""
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, default=json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+def fast_response(data: Any, message: Optional[str] = None) -> FastJSONResponse:
+    """Büyük yükler (oturum, geçmiş, analitik) için doğrudan yazılan başarı yanıtı.
+
+    Response nesnesi döndüğünde FastAPI yanıt modeli doğrulamasını ve
+    jsonable_encoder geçişini atlar; şema response_model ile belgelenmeye devam eder.
+    """
+    return FastJSONResponse(content={"status": "success", "data": data, "message": message})
+
+async def run_blocking(func, *args, **kwargs):
+    """Senkron DB/servis çağrısını event loop'u bloklamadan thread havuzunda çalıştır."""
+    return await asyncio.to_thread(func, *args, **kwargs)
 
 # -------------------------------------------------------------------
 # FastAPI Initialization  
@@ -87,19 +560,123 @@ def random_failure(chance: float = 0.05):
 app = FastAPI(
     title="Çağrı Merkezi API (Database Edition)",
     version="2.0.0",
-    description="Gelişmiş veritabanı destekli çağrı merkezi servisleri."
+    description="Gelişmiş veritabanı destekli çağrı merkezi servisleri.",
+    default_response_class=FastJSONResponse
 )
 
+# Koşullu GET desteklenen rotalar: (yol deseni, data_versions kapsamı, Cache-Control).
+# Katalog herkes için aynı; fatura/kullanım kişiye özel ve her seferinde doğrulanır.
+CONDITIONAL_ROUTES = [
+    (re.compile(r"^/getAvailablePackages/(?P<customer_id>[^/]+)$"), "packages", "public, max-age=300"),
+    (re.compile(r"^/getBillingInfo/(?P<customer_id>[^/]+)$"), "bills:{customer_id}", "private, no-cache"),
+    (re.compile(r"^/getUsageStats/(?P<customer_id>[^/]+)$"), "usage:{customer_id}", "private, no-cache"),
+]
+
+def validator_headers(stamp: Dict, cache_control: str) -> Dict[str, str]:
+    """Sürüm damgasından ETag / Last-Modified / Cache-Control başlıkları."""
+    # Zayıf ETag: aynı sürümün sıkıştırılmış ve düz gövdesi eşdeğer sayılır
+    headers = {"ETag": f'W/"{stamp["scope"]}-v{stamp["version"]}"', "Cache-Control": cache_control}
+    if stamp.get("updated_at"):
+        modified = datetime.strptime(stamp["updated_at"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """If-None-Match (öncelikli) ya da If-Modified-Since istemcideki kopyanın güncel olduğunu söylüyor mu?"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or headers["ETag"].removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+# Saf ASGI ara katmanları: BaseHTTPMiddleware (@app.middleware) gövdeyi akış olarak
+# ilettiğinden dıştaki GZipMiddleware boyutu göremez ve minimum_size etkisiz kalır
+class ConditionalGetMiddleware:
+    """Katalog/fatura/kullanım yanıtlarına doğrulayıcı ekle; istemcideki kopya güncelse 304 dön."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        route = None
+        if scope["type"] == "http" and scope["method"] == "GET":
+            for pattern, version_scope, cache_control in CONDITIONAL_ROUTES:
+                matched = pattern.match(scope["path"])
+                if matched:
+                    route = (matched.group("customer_id"), version_scope, cache_control)
+                    break
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        
+        customer_id, version_scope, cache_control = route
+        # Damga veriden önce okunur: arada yazma olursa gövde daha yeni olur, sonraki istek 200 alır
+        stamp = await services.call_async(services.versions.get_stamp, version_scope.format(customer_id=customer_id))
+        if stamp is None:
+            await self.app(scope, receive, send)
+            return
+        
+        headers = validator_headers(stamp, cache_control)
+        if is_not_modified(Request(scope), headers) and \
+                await services.call_async(services.customer.customer_exists, customer_id):
+            await Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)(scope, receive, send)
+            return
+        
+        async def send_with_validators(message: Message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+        
+        await self.app(scope, receive, send_with_validators)
+
+class FaultInjectionMiddleware:
+    """Aktif profile göre rota bazlı gecikme ve geçici hata enjekte et."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            try:
+                await faults.apply(scope["path"])
+            except InjectedFault as e:
+                logger.warning(f"Simulated downstream service failure: {e.route}")
+                response = JSONResponse(
+                    status_code=e.status_code,
+                    content=StandardResponse(
+                        status="error",
+                        message="Geçici hizmet kesintisi, lütfen tekrar deneyin"
+                    ).dict()
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+# Son eklenen en dışta çalışır: koşullu GET, gecikme/hata enjeksiyonu, sıkıştırma.
+# Gecikme/hata enjeksiyonu 304'ün dışında: 304 yanıtları da ağ gecikmesine tabidir
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(FaultInjectionMiddleware)
+
+# En dışta: eşiğin üstündeki gövdeler istemci Accept-Encoding: gzip gönderdiyse sıkıştırılır
+if RESPONSE_GZIP_MIN_BYTES > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_GZIP_MIN_BYTES, compresslevel=RESPONSE_GZIP_LEVEL)
+
 # -------------------------------------------------------------------
 # API Endpoints - Services Pattern 
 # -------------------------------------------------------------------
 
-@app.get("/health", response_model=StandardResponse)
-def health_check():
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
     """API ve veritabanı sağlık kontrolü."""
     try:
         
-        stats = services.analytics.get_database_stats()
+        stats = await services.call_async(services.analytics.get_database_stats)
         return StandardResponse(
             status="success",
             data={
@@ -114,27 +691,21 @@ def health_check():
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail="Veritabanı bağlantı sorunu")
 
-@app.get("/getUserInfo/{customer_id}", response_model=StandardResponse)
-def get_user_info(customer_id: str):
+@app.get("/getUserInfo/{customer_id}", response_model=UserInfoResponse)
+async def get_user_info(customer_id: str):
     """Kullanıcı bilgilerini döner."""
     
     try:
         
-        customer_info = services.customer.get_customer_info(customer_id)
+        customer_info = await services.call_async(services.customer.get_customer_info, customer_id)
         
         if not customer_info:
             logger.error(f"getUserInfo: {customer_id} bulunamadı")
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
         
-        response_data = {
-            "name": customer_info["name"],
-            "package": customer_info["package_name"] or "Tanımsız",
-            "balance": float(customer_info["current_balance"] or 0)
-        }
-        
         logger.info(f"getUserInfo: {customer_id} başarıyla getirildi")
-        return StandardResponse(status="success", data=response_data)
+        return StandardResponse(status="success", data=format_user_info(customer_info))
         
     except HTTPException:
         raise
@@ -144,20 +715,19 @@ def get_user_info(customer_id: str):
 
 
 
-@app.get("/getAvailablePackages/{customer_id}", response_model=StandardResponse)
-def get_available_packages(customer_id: str):
+@app.get("/getAvailablePackages/{customer_id}", response_model=PackagesResponse)
+async def get_available_packages(customer_id: str):
     """Mevcut paket listesini döner."""
     
     
     try:
         
-        customer_info = services.customer.get_customer_info(customer_id)
-        if not customer_info:
+        if not await services.call_async(services.customer.customer_exists, customer_id):
             logger.error(f"getAvailablePackages: {customer_id} bulunamadı")
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
         
-        packages = services.package.get_available_packages()
+        packages = await services.call_async(services.package.get_available_packages)
         
        
         packages_dict = {}
@@ -178,8 +748,8 @@ def get_available_packages(customer_id: str):
 
 
 
-@app.post("/initiatePackageChange", response_model=StandardResponse)
-def initiate_package_change(req: PackageChangeRequest):
+@app.post("/initiatePackageChange", response_model=PackageChangeResponse)
+async def initiate_package_change(req: PackageChangeRequest):
     """Kullanıcının paketini değiştirir."""
     
     # DEBUG: Gelen request'i logla
@@ -191,27 +761,24 @@ def initiate_package_change(req: PackageChangeRequest):
     
     try:
         
-        customer_info = services.customer.get_customer_info(req.customer_id)
-        logger.info(f"🔍 Customer info result: {customer_info}")
+        # Doğrulama ve değişiklik tek işlemde (müşteri kontrolü dahil)
+        logger.info(f"🔍 Attempting package change: {req.customer_id} -> {req.new_package}")
+        result = await run_blocking(services.package.change_package_checked, req.customer_id, req.new_package)
+        logger.info(f"🔍 Package change result: {result['code']}")
         
-        if not customer_info:
+        if result["code"] == RESULT_CUSTOMER_NOT_FOUND:
             logger.error(f"initiatePackageChange: {req.customer_id} bulunamadı")
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
-        
-        
-        logger.info(f"🔍 Attempting package change: {req.customer_id} -> {req.new_package}")
-        success = services.package.change_customer_package(req.customer_id, req.new_package)
-        logger.info(f"🔍 Package change result: {success}")
-        
-        if not success:
+        if not result["ok"]:
             logger.error(f"initiatePackageChange: {req.new_package} geçersiz")
             raise HTTPException(status_code=400, detail="Paket bulunamadı")
         
-        old_package = customer_info["package_name"] or "Tanımsız"
+        old_package = result.get("previous_package") or "Tanımsız"
         logger.info(f"{req.customer_id}: {old_package} → {req.new_package}")
         
         return StandardResponse(
             status="success",
+            data={"code": result["code"], "previous_package": result.get("previous_package")},
             message=f"Paket başarıyla {req.new_package} olarak güncellendi"
         )
         
@@ -224,32 +791,22 @@ def initiate_package_change(req: PackageChangeRequest):
 
 
 
-@app.get("/getBillingInfo/{customer_id}", response_model=StandardResponse)
-def get_billing_info(customer_id: str):
+@app.get("/getBillingInfo/{customer_id}", response_model=BillingResponse)
+async def get_billing_info(customer_id: str):
     """Müşterinin fatura geçmişini getirir."""
    
     
     try:
         
-        customer_info = services.customer.get_customer_info(customer_id)
-        if not customer_info:
+        if not await services.call_async(services.customer.customer_exists, customer_id):
             logger.error(f"getBillingInfo: {customer_id} bulunamadı")
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
         
-        bills = services.billing.get_customer_bills(customer_id)
-        
-        # Format to match old format
-        formatted_bills = []
-        for bill in bills:
-            formatted_bills.append({
-                "month": bill["bill_month"],
-                "amount": float(bill["amount"]),
-                "paid": bool(bill["is_paid"])
-            })
+        bills = await services.call_async(services.billing.get_customer_bills, customer_id)
         
         logger.info(f"getBillingInfo: {customer_id} için {len(bills)} kayıt bulundu")
-        return StandardResponse(status="success", data={"bills": formatted_bills})
+        return StandardResponse(status="success", data={"bills": format_bills(bills)})
         
     except HTTPException:
         raise
@@ -257,34 +814,22 @@ def get_billing_info(customer_id: str):
         logger.error(f"getBillingInfo error: {e}")
         raise HTTPException(status_code=500, detail="İç sistem hatası")
 
-@app.get("/getUsageStats/{customer_id}", response_model=StandardResponse)
-def get_usage_stats(customer_id: str):
+@app.get("/getUsageStats/{customer_id}", response_model=UsageResponse)
+async def get_usage_stats(customer_id: str):
     """Müşteri kullanım istatistiklerini döner."""
     
     
     try:
         
-        customer_info = services.customer.get_customer_info(customer_id)
-        if not customer_info:
+        if not await services.call_async(services.customer.customer_exists, customer_id):
             logger.error(f"getUsageStats: {customer_id} bulunamadı")
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
         
-        stats = services.billing.get_customer_usage_stats(customer_id)
-        
-        if not stats:
-            
-            stats = {"calls_minutes": 0, "data_mb": 0, "sms_count": 0}
-        
-       
-        formatted_stats = {
-            "calls": int(stats["calls_minutes"]),
-            "data_mb": int(stats["data_mb"]),
-            "sms": int(stats["sms_count"])
-        }
+        stats = await services.call_async(services.billing.get_customer_usage_stats, customer_id)
         
         logger.info(f"getUsageStats: {customer_id} istatistik gönderildi")
-        return StandardResponse(status="success", data=formatted_stats)
+        return StandardResponse(status="success", data=format_usage(stats))
         
     except HTTPException:
         raise
@@ -292,148 +837,446 @@ def get_usage_stats(customer_id: str):
         logger.error(f"getUsageStats error: {e}")
         raise HTTPException(status_code=500, detail="İç sistem hatası")
 
-@app.post("/payBill", response_model=StandardResponse)
-def pay_bill(req: PaymentRequest):
+@app.post("/payBill", response_model=PaymentResponse)
+async def pay_bill(req: PaymentRequest):
     """Fatura ödemesi gerçekleştirir."""
     
     
     try:
         
-        customer_info = services.customer.get_customer_info(req.customer_id)
-        if not customer_info:
-            logger.error(f"payBill: {req.customer_id} bulunamadı")
-            raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
-        
-        
-        bills = services.billing.get_customer_bills(req.customer_id)
-        bill_to_pay = None
-        
-        for bill in bills:
-            if bill["bill_month"] == req.month:
-                bill_to_pay = bill
-                break
+        # Doğrulama ve ödeme tek işlemde; eşzamanlı iki ödemeden yalnızca biri başarılı olur
+        result = await run_blocking(services.billing.pay_bill_checked, req.customer_id, req.month, req.amount)
         
-        if not bill_to_pay:
-            raise HTTPException(status_code=404, detail="Fatura bulunamadı")
+        if not result["ok"]:
+            status_code, detail = PAYMENT_ERRORS.get(result["code"], (500, "Ödeme işlenemedi"))
+            logger.error(f"payBill: {req.customer_id} {req.month} -> {result['code']}")
+            raise HTTPException(status_code=status_code, detail=detail)
         
-        if bill_to_pay["is_paid"]:
-            raise HTTPException(status_code=409, detail="Fatura zaten ödenmiş")
+        logger.info(f"{req.customer_id}: {req.month} faturası ödendi")
+        return StandardResponse(
+            status="success",
+            data={"code": result["code"], "balance_after": result.get("balance_after")},
+            message="Fatura ödendi"
+        )
         
-        if abs(float(bill_to_pay["amount"]) - req.amount) > 0.01:
-            raise HTTPException(status_code=400, detail="Tutar uyuşmuyor")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"payBill error: {e}")
+        raise HTTPException(status_code=500, detail="İç sistem hatası")
+
+
+@app.get("/customer/{customer_id}/context", response_model=CustomerContextResponse,
+         response_model_exclude_unset=True)
+async def get_customer_context(customer_id: str, fields: Optional[str] = None):
+    """Müşteri bilgisi, faturalar, kullanım ve mevcut paket tek yanıtta.
+
+    Parçalar eşzamanlı toplanır; ``fields=info,bills`` gibi virgüllü liste ile
+    yalnızca gereken alanlar istenebilir (varsayılan: hepsi). Alan formatları
+    getUserInfo / getBillingInfo / getUsageStats yanıtlarıyla aynıdır.
+    """
+    requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(CONTEXT_FIELDS)
+    unknown = [f for f in requested if f not in CONTEXT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen alan: {', '.join(unknown)}")
+    
+    try:
+        # info/package müşteri kaydından gelir; aynı sorgu varlık kontrolü yerine de geçer
+        needs_info = "info" in requested or "package" in requested
+        lookups = {
+            "customer": services.call_async(
+                services.customer.get_customer_info if needs_info else services.customer.customer_exists,
+                customer_id
+            )
+        }
+        if "bills" in requested:
+            lookups["bills"] = services.call_async(services.billing.get_customer_bills, customer_id)
+        if "usage" in requested:
+            lookups["usage"] = services.call_async(services.billing.get_customer_usage_stats, customer_id)
+        if "package" in requested:
+            lookups["packages"] = services.call_async(services.package.get_available_packages)
         
+        results = dict(zip(lookups, await asyncio.gather(*lookups.values())))
         
-        success = services.billing.pay_bill(req.customer_id, req.month, req.amount)
+        customer = results["customer"]
+        if not customer:
+            logger.error(f"customerContext: {customer_id} bulunamadı")
+            raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
-        if not success:
-            raise HTTPException(status_code=500, detail="Ödeme işlenemedi")
+        context = {}
+        if "info" in requested:
+            context["info"] = format_user_info(customer)
+        if "bills" in requested:
+            context["bills"] = format_bills(results["bills"])
+        if "usage" in requested:
+            context["usage"] = format_usage(results["usage"])
+        if "package" in requested:
+            current = next((p for p in results["packages"] if p["package_name"] == customer["package_name"]), None)
+            context["package"] = {
+                "name": current["package_name"],
+                "price": float(current["price"]),
+                "features": current["features"]
+            } if current else None
         
-        logger.info(f"{req.customer_id}: {req.month} faturası ödendi")
-        return StandardResponse(status="success", message="Fatura ödendi")
+        logger.info(f"customerContext: {customer_id} ({', '.join(requested)})")
+        return StandardResponse(status="success", data=context)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"payBill error: {e}")
+        logger.error(f"customerContext error: {e}")
         raise HTTPException(status_code=500, detail="İç sistem hatası")
 
 
+# -------------------------------------------------------------------
+# Batch Customer Endpoints - Services Pattern
+# -------------------------------------------------------------------
+
+@app.post("/customers/batch/info", response_model=BatchCustomerInfoResponse)
+async def get_user_info_batch(req: CustomerBatchRequest):
+    """Birden çok müşterinin bilgileri (tek sorgu)."""
+    try:
+        customers = await services.call_async(services.customer.get_customer_info_many, req.customer_ids)
+        return fast_response({
+            "customers": {cid: info for cid, info in customers.items() if info},
+            "not_found": [cid for cid, info in customers.items() if not info]
+        })
+    except Exception as e:
+        logger.error(f"Batch user info error: {e}")
+        raise HTTPException(status_code=500, detail="Müşteri bilgileri alınamadı")
+
+@app.post("/customers/batch/bills", response_model=BatchBillsResponse)
+async def get_billing_info_batch(req: CustomerBatchRequest):
+    """Birden çok müşterinin faturaları (tek sorgu)."""
+    try:
+        bills = await services.call_async(services.billing.get_customer_bills_many, req.customer_ids)
+        return fast_response({"bills": bills})
+    except Exception as e:
+        logger.error(f"Batch billing info error: {e}")
+        raise HTTPException(status_code=500, detail="Fatura bilgileri alınamadı")
+
+@app.post("/customers/batch/usage", response_model=BatchUsageResponse)
+async def get_usage_stats_batch(req: CustomerBatchRequest):
+    """Birden çok müşterinin kullanım istatistikleri (month verilmezse son ay)."""
+    try:
+        usage = await services.call_async(services.billing.get_customer_usage_stats_many, req.customer_ids, req.month)
+        return fast_response({"usage": usage})
+    except Exception as e:
+        logger.error(f"Batch usage stats error: {e}")
+        raise HTTPException(status_code=500, detail="Kullanım istatistikleri alınamadı")
+
+@app.post("/customers/batch/history", response_model=BatchHistoryResponse)
+async def get_call_history_batch(req: CustomerBatchRequest):
+    """Birden çok müşterinin görüşme geçmişi (müşteri başına limit kadar)."""
+    try:
+        history = await services.call_async(services.customer.get_customer_call_history_many, req.customer_ids, req.limit)
+        return fast_response({"history": history})
+    except Exception as e:
+        logger.error(f"Batch call history error: {e}")
+        raise HTTPException(status_code=500, detail="Görüşme geçmişi alınamadı")
+
+# -------------------------------------------------------------------
+# Generic Batch Endpoint
+# -------------------------------------------------------------------
+
+BATCH_HANDLERS = {
+    "getUserInfo": get_user_info,
+    "getAvailablePackages": get_available_packages,
+    "getBillingInfo": get_billing_info,
+    "getUsageStats": get_usage_stats,
+    "customerContext": get_customer_context,
+    "initiatePackageChange": lambda **params: initiate_package_change(PackageChangeRequest(**params)),
+    "payBill": lambda **params: pay_bill(PaymentRequest(**params)),
+}
+
+async def run_batch_operation(operation: BatchOperation) -> Dict:
+    """Tek işlemi ilgili uç nokta fonksiyonuyla çalıştırır; hatayı sonuca çevirir."""
+    start = time.perf_counter()
+    try:
+        response = await BATCH_HANDLERS[operation.op](**operation.params)
+        result = {"status": "success", "status_code": 200, "data": response.data, "message": response.message}
+    except HTTPException as e:
+        result = {"status": "error", "status_code": e.status_code, "data": None, "message": e.detail}
+    except (TypeError, ValueError) as e:
+        # Eksik/fazla parametre ya da istek modeli doğrulama hatası
+        result = {"status": "error", "status_code": 422, "data": None, "message": f"Geçersiz parametre: {e}"}
+    except Exception as e:
+        logger.error(f"Batch operation {operation.op} error: {e}")
+        result = {"status": "error", "status_code": 500, "data": None, "message": "İç sistem hatası"}
+    return {
+        "id": operation.id,
+        "op": operation.op,
+        **result,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+@app.post("/batch", response_model=BatchResponse)
+async def run_batch(req: BatchRequest):
+    """Birden çok işlemi tek istekte çalıştırır.
+
+    Ardışık okumalar eşzamanlı çalışır; her yazma kendisinden önceki okumaların
+    bitmesini bekler ve sonraki işlemlerden önce tamamlanır, böylece sonuçlar
+    istek sırasıyla tutarlıdır. Sonuçlar istek sırasıyla döner.
+    """
+    start = time.perf_counter()
+    results: List[Dict] = []
+    pending_reads: List[BatchOperation] = []
+    
+    async def flush_reads():
+        results.extend(await asyncio.gather(*(run_batch_operation(o) for o in pending_reads)))
+        pending_reads.clear()
+    
+    for operation in req.operations:
+        if operation.op in BATCH_READ_OPERATIONS:
+            pending_reads.append(operation)
+            continue
+        await flush_reads()
+        results.append(await run_batch_operation(operation))
+    await flush_reads()
+    
+    failed = sum(1 for r in results if r["status"] != "success")
+    logger.info(f"batch: {len(results)} işlem, {failed} hata")
+    return StandardResponse(
+        status="success" if not failed else "partial",
+        data={
+            "results": results,
+            "failed": failed,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+    )
+
 # -------------------------------------------------------------------
 # Additional Analytics Endpoints - Services Pattern
 # -------------------------------------------------------------------
 
-@app.get("/analytics/daily", response_model=StandardResponse)
-def get_daily_analytics():
+@app.get("/analytics/daily", response_model=DailyMetricsResponse)
+async def get_daily_analytics():
     """Günlük analitik verileri."""
     try:
         # DEĞIŞIM: db.get_daily_metrics() -> services.analytics.get_daily_metrics()
-        metrics = services.analytics.get_daily_metrics()
-        return StandardResponse(status="success", data=metrics)
+        metrics = await services.call_async(services.analytics.get_daily_metrics)
+        return fast_response(metrics)
     except Exception as e:
         logger.error(f"Daily analytics error: {e}")
         raise HTTPException(status_code=500, detail="Analitik veriler alınamadı")
 
-@app.get("/analytics/tools", response_model=StandardResponse)
-def get_tool_analytics(days: int = 30):
+@app.get("/analytics/latency", response_model=LatencyResponse)
+async def get_latency_analytics(metric: str = "response", dimension: Optional[str] = None, minutes: int = 60):
+    """Gecikme yüzdelikleri (metric: response | tool, dimension: uzman veya araç adı)."""
+    if metric not in ("response", "tool"):
+        raise HTTPException(status_code=400, detail="Geçersiz metrik. 'response' veya 'tool' olmalı")
+    try:
+        percentiles = await services.call_async(services.analytics.get_latency_percentiles, metric, dimension, minutes)
+        return fast_response(percentiles)
+    except Exception as e:
+        logger.error(f"Latency analytics error: {e}")
+        raise HTTPException(status_code=500, detail="Gecikme verileri alınamadı")
+
+@app.get("/analytics/tools", response_model=ToolUsageResponse)
+async def get_tool_analytics(days: int = 30):
     """Araç kullanım istatistikleri."""
     try:
         # DEĞIŞIM: db.get_tool_usage_stats() -> services.analytics.get_tool_usage_stats()
-        tool_stats = services.analytics.get_tool_usage_stats(days)
-        return StandardResponse(status="success", data=tool_stats)
+        tool_stats = await services.call_async(services.analytics.get_tool_usage_stats, days)
+        return fast_response(tool_stats)
     except Exception as e:
         logger.error(f"Tool analytics error: {e}")
         raise HTTPException(status_code=500, detail="Araç istatistikleri alınamadı")
 
-@app.get("/analytics/database", response_model=StandardResponse)
-def get_database_analytics():
+@app.get("/analytics/cache", response_model=CountersResponse)
+async def get_cache_analytics():
+    """Servis önbelleği ve istek birleştirme (single-flight) sayaçları."""
+    return fast_response({
+        **services.cache_stats(),
+        "single_flight": services.flight_stats(),
+        "customer_index": services.customer_index.stats() if services.customer_index else {"enabled": False}
+    })
+
+@app.get("/analytics/database", response_model=CountersResponse)
+async def get_database_analytics():
     """Veritabanı istatistikleri."""
     try:
         # DEĞIŞIM: db.get_database_stats() -> services.analytics.get_database_stats()
-        db_stats = services.analytics.get_database_stats()
-        return StandardResponse(status="success", data=db_stats)
+        db_stats = await services.call_async(services.analytics.get_database_stats)
+        return fast_response(db_stats)
     except Exception as e:
         logger.error(f"Database analytics error: {e}")
         raise HTTPException(status_code=500, detail="Veritabanı istatistikleri alınamadı")
 
-@app.get("/customer/{customer_id}/history", response_model=StandardResponse)
-def get_customer_call_history(customer_id: str, limit: int = 10):
+@app.get("/customer/{customer_id}/history", response_model=CallHistoryResponse)
+async def get_customer_call_history(customer_id: str, limit: int = 10):
     """Müşterinin görüşme geçmişi."""
     try:
-        # DEĞIŞIM: db.get_customer_info() -> services.customer.get_customer_info()
-        customer_info = services.customer.get_customer_info(customer_id)
-        if not customer_info:
+        if not await services.call_async(services.customer.customer_exists, customer_id):
             raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
         
         # DEĞIŞIM: db.get_customer_call_history() -> services.customer.get_customer_call_history()
-        history = services.customer.get_customer_call_history(customer_id, limit)
-        return StandardResponse(status="success", data={"history": history})
+        history = await services.call_async(services.customer.get_customer_call_history, customer_id, limit)
+        return fast_response({"history": history})
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Customer history error: {e}")
         raise HTTPException(status_code=500, detail="Görüşme geçmişi alınamadı")
 
-@app.get("/session/{session_id}", response_model=StandardResponse)
-def get_session_details(session_id: str):
+@app.get("/session/{session_id}", response_model=SessionDetailsResponse)
+async def get_session_details(session_id: str):
     """Görüşme oturumu detayları."""
     try:
         # DEĞIŞIM: db.get_call_session_history() -> services.session.get_call_session_history()
-        session_info = services.session.get_call_session_history(session_id)
+        session_info = await services.call_async(services.session.get_call_session_history, session_id)
         if not session_info:
             raise HTTPException(status_code=404, detail="Oturum bulunamadı")
         
-        return StandardResponse(status="success", data=session_info)
+        return fast_response(session_info)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Session details error: {e}")
         raise HTTPException(status_code=500, detail="Oturum detayları alınamadı")
 
+# -------------------------------------------------------------------
+# Collections Queue Endpoints
+# -------------------------------------------------------------------
+
+@app.get("/collections/queue", response_model=CollectionsPageResponse)
+async def get_collections_queue(limit: int = 50, cursor: Optional[str] = None):
+    """Gecikmiş faturalar, öncelik sırasıyla (sayfalama için next_cursor kullanılır)."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Tahsilat kuyruğu bu veritabanı için desteklenmiyor")
+    try:
+        page = await services.call_async(services.collections.get_page, min(max(limit, 1), 500), cursor)
+        page["summary"] = await services.call_async(services.collections.get_summary)
+        return StandardResponse(status="success", data=page)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+    except Exception as e:
+        logger.error(f"Collections queue error: {e}")
+        raise HTTPException(status_code=500, detail="Tahsilat kuyruğu alınamadı")
+
+@app.post("/collections/claim", response_model=CollectionsClaimResponse)
+async def claim_collections(req: CollectionsClaimRequest):
+    """Sıradaki tahsilat işlerini çalışana atar."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Tahsilat kuyruğu bu veritabanı için desteklenmiyor")
+    try:
+        items = await run_blocking(services.collections.claim_items, req.worker_id, req.batch_size, req.lease_seconds)
+        return StandardResponse(status="success", data={"items": items}, message=f"{len(items)} iş atandı")
+    except Exception as e:
+        logger.error(f"Collections claim error: {e}")
+        raise HTTPException(status_code=500, detail="Tahsilat işleri atanamadı")
+
+@app.post("/collections/complete", response_model=StandardResponse)
+async def complete_collection(req: CollectionsCompleteRequest):
+    """Tahsilat işinin sonucunu kaydeder."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Tahsilat kuyruğu bu veritabanı için desteklenmiyor")
+    try:
+        done = await run_blocking(
+            services.collections.complete_item,
+            req.customer_id, req.bill_month, req.worker_id, req.outcome, req.retry_after_hours
+        )
+    except Exception as e:
+        logger.error(f"Collections complete error: {e}")
+        raise HTTPException(status_code=500, detail="Tahsilat sonucu kaydedilemedi")
+    if not done:
+        raise HTTPException(status_code=409, detail="İş bu çalışana atanmış değil veya fatura ödenmiş")
+    return StandardResponse(status="success", message="Tahsilat sonucu kaydedildi")
+
+# -------------------------------------------------------------------
+# Change Feed Endpoints
+# -------------------------------------------------------------------
+
+@app.get("/changes", response_model=ChangeBatchResponse)
+async def read_changes(consumer: str, limit: int = 500, tables: Optional[str] = None):
+    """Tüketici için bekleyen değişiklikler (tables: virgülle ayrılmış tablo listesi)."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Değişiklik akışı bu veritabanı için desteklenmiyor")
+    try:
+        table_list = [t.strip() for t in tables.split(",") if t.strip()] if tables else None
+        batch = await services.call_async(services.changes.read_changes, consumer, min(max(limit, 1), 5000), table_list)
+        return StandardResponse(status="success", data=batch)
+    except Exception as e:
+        logger.error(f"Change feed read error: {e}")
+        raise HTTPException(status_code=500, detail="Değişiklikler alınamadı")
+
+@app.post("/changes/{consumer}/commit", response_model=ChangeOffsetResponse)
+async def commit_changes(consumer: str, seq: int):
+    """Tüketicinin işlediği son sıra numarasını kaydeder."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Değişiklik akışı bu veritabanı için desteklenmiyor")
+    try:
+        await run_blocking(services.changes.commit_offset, consumer, seq)
+        return StandardResponse(status="success", data={"consumer": consumer, "offset": seq})
+    except Exception as e:
+        logger.error(f"Change feed commit error: {e}")
+        raise HTTPException(status_code=500, detail="Sıra numarası kaydedilemedi")
+
+@app.get("/changes/status", response_model=ChangeFeedStatusResponse)
+async def get_change_feed_status():
+    """Outbox durumu ve tüketici gecikmeleri."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Değişiklik akışı bu veritabanı için desteklenmiyor")
+    try:
+        return StandardResponse(status="success", data=await services.call_async(services.changes.get_status))
+    except Exception as e:
+        logger.error(f"Change feed status error: {e}")
+        raise HTTPException(status_code=500, detail="Değişiklik akışı durumu alınamadı")
+
 # -------------------------------------------------------------------
 # Maintenance Endpoints - Services Pattern
 # -------------------------------------------------------------------
 
-@app.post("/admin/cleanup", response_model=StandardResponse)
-def cleanup_old_data(days_to_keep: int = 90):
+@app.post("/admin/cleanup", response_model=CleanupResponse)
+async def cleanup_old_data(days_to_keep: int = 90):
     """Eski verileri temizle."""
     try:
         # Bu fonksiyon direkt database üzerinde çalışır, services'e taşımaya gerek yok
-        deleted_count = db.cleanup_old_logs(days_to_keep)
+        deleted_count = await run_blocking(db.cleanup_old_logs, days_to_keep)
+        ledger = await run_blocking(db.compact_balance_ledger, days_to_keep) if isinstance(db, CallCenterDatabase) else None
+        pruned_changes = await run_blocking(db.prune_change_outbox, days_to_keep) if isinstance(db, CallCenterDatabase) else None
         return StandardResponse(
             status="success", 
-            data={"deleted_sessions": deleted_count},
+            data={"deleted_sessions": deleted_count, "balance_ledger": ledger,
+                  "pruned_changes": pruned_changes},
             message=f"{deleted_count} eski oturum temizlendi"
         )
     except Exception as e:
         logger.error(f"Cleanup error: {e}")
         raise HTTPException(status_code=500, detail="Temizlik işlemi başarısız")
 
-@app.post("/admin/backup", response_model=StandardResponse)
-def backup_database():
+@app.post("/admin/packages/migrate", response_model=PackageMigrationResponse)
+async def migrate_package_cohort(req: PackageMigrationRequest):
+    """Toplu paket taşıma (varsayılan: dry-run). Yarıda kalan taşıma migration_id ile devam ettirilir."""
+    if not isinstance(db, CallCenterDatabase):
+        raise HTTPException(status_code=501, detail="Toplu paket taşıma bu veritabanı için desteklenmiyor")
+    if req.customer_ids is None and not req.from_package and not req.usage_filter and not req.migration_id:
+        raise HTTPException(status_code=400, detail="Müşteri listesi veya filtre belirtilmeli")
+    try:
+        summary = await run_blocking(
+            services.package.migrate_package_cohort,
+            req.target_package,
+            customer_ids=req.customer_ids,
+            from_package_name=req.from_package,
+            usage_filter=req.usage_filter,
+            chunk_size=req.chunk_size,
+            dry_run=req.dry_run,
+            migration_id=req.migration_id
+        )
+        message = "Dry-run tamamlandı" if req.dry_run else f"{summary['migrated_customers']} müşteri taşındı"
+        return StandardResponse(status="success", data=summary, message=message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Package migration error: {e}")
+        raise HTTPException(status_code=500, detail="Toplu paket taşıma başarısız")
+
+@app.post("/admin/backup", response_model=BackupResponse)
+async def backup_database():
     """Veritabanı yedeği oluştur."""
     try:
         
-        backup_path = db.backup_database()
+        backup_path = await run_blocking(db.backup_database)
         return StandardResponse(
             status="success",
             data={"backup_path": backup_path},
@@ -443,16 +1286,47 @@ def backup_database():
         logger.error(f"Backup error: {e}")
         raise HTTPException(status_code=500, detail="Yedekleme başarısız")
 
+@app.get("/admin/faults", response_model=FaultStatusResponse)
+async def get_fault_profile():
+    """Aktif gecikme/hata profili ve rota bazlı enjeksiyon istatistikleri."""
+    return StandardResponse(
+        status="success",
+        data={"profile": faults.to_dict(), "stats": faults.stats()}
+    )
+
+@app.put("/admin/faults", response_model=FaultProfileResponse)
+async def set_fault_profile(req: FaultProfileRequest):
+    """Gecikme/hata profilini yeniden başlatmadan değiştir."""
+    try:
+        if req.preset:
+            faults.configure_from_dict(PRESETS[req.preset], name=req.preset)
+        else:
+            faults.configure_from_dict({"default": req.default, "routes": req.routes})
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen profil: {req.preset}")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Geçersiz profil: {e}")
+    faults.reset_stats()
+    logger.info(f"Fault profile changed: {faults.name}")
+    return StandardResponse(status="success", data=faults.to_dict(), message="Hata profili güncellendi")
+
+@app.delete("/admin/faults", response_model=StandardResponse)
+async def clear_fault_profile():
+    """Gecikme/hata enjeksiyonunu kapat."""
+    faults.configure_from_dict(PRESETS['off'], name='off')
+    faults.reset_stats()
+    return StandardResponse(status="success", message="Hata enjeksiyonu kapatıldı")
+
 # -------------------------------------------------------------------
 # Web Agent Integration Endpoints - Services Pattern
 # -------------------------------------------------------------------
 
-@app.post("/agent/start", response_model=StandardResponse)
-def start_agent_session(customer_id: Optional[str] = None):
+@app.post("/agent/start", response_model=AgentSessionResponse)
+async def start_agent_session(customer_id: Optional[str] = None):
     """Yeni agent oturumu başlat."""
     try:
         
-        session_id = services.session.create_call_session(customer_id, 'web_api')
+        session_id = await run_blocking(services.session.create_call_session, customer_id, 'web_api')
         return StandardResponse(
             status="success",
             data={"session_id": session_id},
@@ -463,11 +1337,11 @@ def start_agent_session(customer_id: Optional[str] = None):
         raise HTTPException(status_code=500, detail="Agent oturumu başlatılamadı")
 
 @app.post("/agent/end/{session_id}", response_model=StandardResponse)
-def end_agent_session(session_id: str, satisfaction: Optional[int] = None, notes: Optional[str] = None):
+async def end_agent_session(session_id: str, satisfaction: Optional[int] = None, notes: Optional[str] = None):
     """Agent oturumunu sonlandır."""
     try:
         # DEĞIŞIM: db.end_call_session() -> services.session.end_call_session()
-        success = services.session.end_call_session(session_id, "completed", satisfaction, notes)
+        success = await run_blocking(services.session.end_call_session, session_id, "completed", satisfaction, notes)
         if not success:
             raise HTTPException(status_code=404, detail="Oturum bulunamadı")
         
@@ -481,12 +1355,12 @@ def end_agent_session(session_id: str, satisfaction: Optional[int] = None, notes
         logger.error(f"End agent session error: {e}")
         raise HTTPException(status_code=500, detail="Agent oturumu sonlandırılamadı")
 
-@app.post("/agent/log/{session_id}", response_model=StandardResponse)
-def log_agent_message(session_id: str, role: str, content: str, tool_call: Optional[str] = None):
+@app.post("/agent/log/{session_id}", response_model=AgentMessageResponse)
+async def log_agent_message(session_id: str, role: str, content: str, tool_call: Optional[str] = None):
     """Agent mesajını logla."""
     try:
         
-        message_id = services.session.add_call_message(session_id, role, content, tool_call=tool_call)
+        message_id = await run_blocking(services.session.add_call_message, session_id, role, content, tool_call=tool_call)
         return StandardResponse(
             status="success",
             data={"message_id": message_id},
@@ -501,9 +1375,10 @@ def log_agent_message(session_id: str, role: str, content: str, tool_call: Optio
 # -------------------------------------------------------------------
 
 @app.post("/dev/reset-test-data", response_model=StandardResponse)
-def reset_test_data():
+async def reset_test_data():
     """Test verilerini sıfırla ve yeniden oluştur."""
     try:
+        services.clear_cache()
         return StandardResponse(
             status="success",
             message="Test verileri sıfırlandı (geliştirme modu)"
@@ -512,8 +1387,8 @@ def reset_test_data():
         logger.error(f"Reset test data error: {e}")
         raise HTTPException(status_code=500, detail="Test verileri sıfırlanamadı")
 
-@app.get("/dev/sample-customers", response_model=StandardResponse)
-def get_sample_customers():
+@app.get("/dev/sample-customers", response_model=SampleCustomersResponse)
+async def get_sample_customers():
     """Test müşteri listesi."""
     sample_customers = [
         {"id": "1001", "name": "Ali Veli", "package": "Premium"},
@@ -563,7 +1438,7 @@ async def startup_event():
     # Veritabanı istatistikleri
     try:
         
-        stats = services.analytics.get_database_stats()
+        stats = await run_blocking(services.analytics.get_database_stats)
         logger.info(f"📈 Toplam müşteri: {stats.get('customers_count', 0)}")
         logger.info(f"📞 Toplam görüşme: {stats.get('call_sessions_count', 0)}")
         logger.info(f"💾 DB boyutu: {stats.get('db_size_mb', 0):.2f} MB")
@@ -576,7 +1451,7 @@ async def shutdown_event():
     
     # Son yedek alma (opsiyonel)
     try:
-        backup_path = db.backup_database()  
+        backup_path = await run_blocking(db.backup_database)
         logger.info(f"💾 Kapatılırken yedek alındı: {backup_path}")
     except Exception as e:
         logger.warning(f"Shutdown backup failed: {e}")
@@ -1,16 +1,215 @@
 # database.py
 import sqlite3
 import json
+import os
+import re
+import time
+import random
+import hashlib
 import uuid
+import queue
+import functools
+import threading
+import weakref
 from datetime import datetime, date
 from typing import Dict, List, Optional, Tuple, Any
 from contextlib import contextmanager
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from storage_backend import (
+    StorageBackend, RESULT_OK, RESULT_UNCHANGED, RESULT_CUSTOMER_NOT_FOUND, RESULT_BILL_NOT_FOUND,
+    RESULT_ALREADY_PAID, RESULT_AMOUNT_MISMATCH, RESULT_PACKAGE_NOT_FOUND
+)
+from transcript_archive import TranscriptArchive
+from payload_codec import PayloadCodec
+from latency_sketch import DDSketch, LatencySketchRecorder, bucket_start, merge_sketches
+
 logger = logging.getLogger("database")
 
+# ================================
+# Query Routing
+# ================================
+
+def read_route(func):
+    """Tag a method as read-only; its queries run on the reporting connections."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        previous = getattr(self._route_state, 'route', None)
+        self._route_state.route = 'read'
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self._route_state.route = previous
+    wrapper.db_route = 'read'
+    return wrapper
+
+def write_route(func):
+    """Tag a method as transactional; its queries always run on the primary file."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        previous = getattr(self._route_state, 'route', None)
+        self._route_state.route = 'write'
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self._route_state.route = previous
+    wrapper.db_route = 'write'
+    return wrapper
+
+class ReadConnectionPool:
+    """Bounded pool of read-only SQLite connections used for reporting queries.
+
+    Connections are opened with a ``file:...?mode=ro`` URI and ``PRAGMA query_only``
+    so a reporting query can never take the write lock. When ``replica_path`` is
+    given, connections read from a snapshot copy of the primary file that is
+    refreshed every ``refresh_seconds`` instead of the primary file itself.
+    """
+
+    def __init__(self, source_path: str, size: int = 2, replica_path: str = None,
+                 refresh_seconds: int = 300, timeout: float = 30.0,
+                 attachments: Optional[Dict[str, str]] = None):
+        self.source_path = source_path
+        self.attachments = attachments or {}
+        self.replica_path = replica_path
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=size)
+        self._generation = 0
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+        for _ in range(size):
+            self._pool.put(None)  # Connections are opened lazily on first checkout
+
+        if self.replica_path:
+            self.refresh_replica()
+
+    @property
+    def read_path(self) -> str:
+        return self.replica_path or self.source_path
+
+    def _open(self) -> sqlite3.Connection:
+        uri = f"{Path(self.read_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=self.timeout)
+        conn.row_factory = sqlite3.Row
+        for alias, path in self.attachments.items():
+            conn.execute(f'ATTACH DATABASE ? AS {alias}', (f"{Path(path).resolve().as_uri()}?mode=ro",))
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def refresh_replica(self) -> bool:
+        """Copy the primary file into the replica path. Returns False if a refresh is already running."""
+        if not self.replica_path:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            tmp_path = f"{self.replica_path}.tmp"
+            source = sqlite3.connect(self.source_path)
+            target = sqlite3.connect(tmp_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            # Readers holding the old file keep their snapshot until they are recycled
+            os.replace(tmp_path, self.replica_path)
+            self._generation += 1
+            self._last_refresh = time.time()
+            logger.info(f"Reporting replica refreshed: {self.replica_path}")
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def _replica_is_stale(self) -> bool:
+        return bool(self.replica_path) and time.time() - self._last_refresh >= self.refresh_seconds
+
+    @contextmanager
+    def connection(self):
+        """Check out a read-only connection, returning it to the pool afterwards."""
+        if self._replica_is_stale():
+            self.refresh_replica()
+
+        # Pool slots hold (generation, connection) pairs; None marks an unopened slot
+        slot = self._pool.get(timeout=self.timeout)
+        try:
+            if slot is None or slot[0] != self._generation:
+                if slot is not None:
+                    slot[1].close()
+                slot = (self._generation, self._open())
+            yield slot[1]
+            slot[1].rollback()  # End the implicit read transaction so WAL can checkpoint
+        except Exception as e:
+            logger.error(f"Read connection error: {e}")
+            if slot is not None:
+                slot[1].close()
+                slot = None
+            raise
+        finally:
+            self._pool.put(slot)
+
+    def close(self):
+        """Close all idle connections in the pool."""
+        while True:
+            try:
+                slot = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            if slot is not None:
+                slot[1].close()
+
+# Append-heavy tables that may be moved to a separate log database file
+TELEMETRY_TABLES = ['call_messages', 'tool_usage_logs', 'error_logs', 'session_transcripts',
+                    'error_fingerprints', 'error_counts_hourly', 'tool_usage_minutely',
+                    'latency_sketches']
+
+# Severities counted as recent errors in the health report; error_counts_hourly
+# counts them per hour in severe_count, independent of the hour's last severity
+SEVERE_ERROR_LEVELS = ('high', 'critical')
+SEVERE_ERROR_LEVELS_SQL = ", ".join(f"'{level}'" for level in SEVERE_ERROR_LEVELS)
+
+# Tables whose row changes are captured in change_outbox, with the key stored as row_key
+CHANGE_CAPTURE_TABLES = {
+    'customers': 'customer_id',
+    'bills': 'bill_id',
+    'customer_subscriptions': 'subscription_id',
+    'call_sessions': 'session_id',
+}
+
+# Tables whose changes bump a data_versions stamp: table -> (scope, per customer?).
+# Per-customer scopes are stored as '<scope>:<customer_id>'.
+DATA_VERSION_TABLES = {
+    'packages': ('packages', False),
+    'package_features': ('packages', False),
+    'bills': ('bills', True),
+    'usage_stats': ('usage', True),
+}
+
+# Quantiles reported next to the average latencies
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+# Upper bounds (ms) of the tool latency histogram buckets; slower calls go to bucket_inf
+TOOL_LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+TOOL_LATENCY_BUCKET_COLUMNS = [f'bucket_le_{bound}' for bound in TOOL_LATENCY_BUCKETS_MS] + ['bucket_inf']
+
+
+def tool_latency_bucket(execution_time_ms: float) -> str:
+    for bound, column in zip(TOOL_LATENCY_BUCKETS_MS, TOOL_LATENCY_BUCKET_COLUMNS):
+        if execution_time_ms <= bound:
+            return column
+    return 'bucket_inf'
+
+# Parts of a stack trace / message that vary between occurrences of the same error
+_ERROR_NOISE_PATTERNS = [
+    (re.compile(r', line \d+'), ''),
+    (re.compile(r'0x[0-9a-fA-F]+'), '0x?'),
+    (re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'), '<uuid>'),
+    (re.compile(r"'[^'\n]*'|\"[^\"\n]*\""), '<str>'),
+    (re.compile(r'\d+'), '<n>'),
+]
+
 # ================================
 # Data Models
 
@@ -58,21 +257,94 @@ class CallMessage:
     tool_result: Optional[str] = None
     processing_time_ms: Optional[int] = None
 
+@dataclass
+class ToolLoggingPolicy:
+    """Which tool calls get a full tool_usage_logs row.
+
+    Failures are always logged; successes are sampled per tool. The per-minute
+    counters behind the statistics are updated for every call regardless.
+    """
+    success_sample_rate: float = 1.0
+    tool_sample_rates: Dict[str, float] = field(default_factory=dict)
+
+    def should_log(self, tool_name: str, success: bool) -> bool:
+        if not success:
+            return True
+        rate = self.tool_sample_rates.get(tool_name, self.success_sample_rate)
+        return rate >= 1.0 or random.random() < rate
+
 # ================================
 # Database Manager Class
 # ================================
 
-class CallCenterDatabase:
-    def __init__(self, db_path: str = "call_center.db"):
+class CallCenterDatabase(StorageBackend):
+    def __init__(self, db_path: str = "call_center.db", read_pool_size: int = 2,
+                 replica_path: str = None, replica_refresh_seconds: int = 300,
+                 seed_sample_data: bool = True, log_db_path: str = None,
+                 log_checkpoint_seconds: Optional[int] = 60, archive_dir: str = None,
+                 payload_codec: PayloadCodec = None, transcript_grace_seconds: int = 3600,
+                 error_rows_per_hour: int = 5, error_sample_rate: float = 0.01,
+                 tool_logging_policy: ToolLoggingPolicy = None, latency_bucket_seconds: int = 300,
+                 latency_flush_seconds: Optional[int] = 10):
         self.db_path = db_path
+        self.seed_sample_data = seed_sample_data
+        # call_messages, tool_usage_logs and error_logs can live in their own ATTACHed file
+        self.log_db_path = log_db_path
+        # Month-partitioned archive files for old transcripts (disabled when None)
+        self.archive = TranscriptArchive(archive_dir) if archive_dir else None
+        # Large payload columns are compressed on write when a codec is given;
+        # reads always decode, so rows written with or without it stay readable
+        self.codec = payload_codec or PayloadCodec(compression=None)
+        # Ended sessions are compacted into one session_transcripts row; the
+        # per-row records are kept this long before they are purged
+        self.transcript_codec = self.codec if self.codec.enabled else PayloadCodec('zlib')
+        self.transcript_grace_seconds = transcript_grace_seconds
+        # Repeated errors are counted per fingerprint; full error_logs rows are kept
+        # for the first few occurrences per hour and a random sample after that
+        self.error_rows_per_hour = error_rows_per_hour
+        self.error_sample_rate = error_sample_rate
+        self.tool_logging_policy = tool_logging_policy or ToolLoggingPolicy()
+        # Response/tool latency sketches accumulate in memory and are merged
+        # into latency_sketches rows on every flush
+        self.latency_recorder = LatencySketchRecorder(latency_bucket_seconds)
+        # The flush thread starts with the first recorded latency
+        self.latency_flush_seconds = latency_flush_seconds
+        self._latency_flush_started = False
+        self._latency_flush_lock = threading.Lock()
+        self._route_state = threading.local()
+        self.read_pool = None
+        self._background_stop = threading.Event()
         self.init_database()
+
+        # Reporting queries get their own read-only connections (in-memory DBs cannot be shared)
+        if read_pool_size > 0 and db_path != ":memory:":
+            self.read_pool = ReadConnectionPool(
+                db_path, size=read_pool_size, replica_path=replica_path,
+                refresh_seconds=replica_refresh_seconds,
+                attachments={'logs': log_db_path} if log_db_path else None
+            )
+
+        if log_db_path and log_checkpoint_seconds:
+            self._start_periodic("log-db-checkpoint", log_checkpoint_seconds, 'checkpoint_log_db')
         logger.info(f"Database initialized: {db_path}")
 
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections."""
+        """Context manager for database connections.
+
+        Inside a method tagged with ``@read_route`` this yields a pooled read-only
+        connection; everything else gets a fresh transactional connection.
+        """
+        if self.read_pool and getattr(self._route_state, 'route', None) == 'read':
+            with self.read_pool.connection() as conn:
+                yield conn
+            return
+
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row  # Enable dict-like access
+        if self.log_db_path:
+            # Unqualified telemetry table names resolve to the attached file
+            conn.execute('ATTACH DATABASE ? AS logs', (self.log_db_path,))
         try:
             yield conn
             conn.commit()
@@ -86,14 +358,158 @@ class CallCenterDatabase:
     def init_database(self):
         """Initialize database with schema."""
         with self.get_connection() as conn:
+            # WAL lets reporting readers run without blocking writers
+            if self.db_path != ":memory:":
+                conn.execute('PRAGMA journal_mode=WAL')
+
             # Read and execute schema
             schema_sql = self._get_schema_sql()
             conn.executescript(schema_sql)
-            
+            self._ensure_column(conn, 'customer_balances', 'ledger_entry_id', 'INTEGER')
+            self._create_change_capture_triggers(conn)
+            self._create_data_version_triggers(conn)
+            # Bills that predate the queue triggers
+            conn.execute('''
+                INSERT OR IGNORE INTO collections_queue (customer_id, bill_month, amount, due_date, priority)
+                SELECT customer_id, bill_month, amount, due_date,
+                       CASE WHEN amount >= 1000 THEN 1 WHEN amount >= 250 THEN 2 ELSE 3 END
+                FROM bills WHERE is_paid = FALSE
+            ''')
+
+            # Unqualified: the table may already live in the attached log file
+            had_tool_minutely = bool(conn.execute('PRAGMA table_info(tool_usage_minutely)').fetchall())
+            if self.log_db_path:
+                conn.execute('PRAGMA logs.journal_mode=WAL')
+                self._migrate_telemetry_to_log_db(conn)
+            else:
+                conn.executescript(self._get_telemetry_schema_sql('main'))
+            if not had_tool_minutely:
+                self._backfill_tool_usage_minutely(conn)
+            self._ensure_column(conn, 'session_transcripts', 'last_message_id', 'INTEGER')
+            self._ensure_column(conn, 'session_transcripts', 'last_tool_log_id', 'INTEGER')
+            # Transcripts compacted before the watermarks existed cover every row still present
+            conn.execute('''
+                UPDATE session_transcripts SET
+                    last_message_id = COALESCE((SELECT MAX(message_id) FROM call_messages m
+                                                WHERE m.session_id = session_transcripts.session_id), 0),
+                    last_tool_log_id = COALESCE((SELECT MAX(log_id) FROM tool_usage_logs t
+                                                 WHERE t.session_id = session_transcripts.session_id), 0)
+                WHERE last_message_id IS NULL OR last_tool_log_id IS NULL
+            ''')
+            if self._ensure_column(conn, 'error_counts_hourly', 'severe_count', 'INTEGER DEFAULT 0'):
+                # Best effort for older rows: only the last severity of the hour was kept
+                conn.execute(f'''
+                    UPDATE error_counts_hourly SET severe_count = occurrence_count
+                    WHERE severity IN ({SEVERE_ERROR_LEVELS_SQL})
+                ''')
+
             # Insert initial data
             self._insert_initial_data(conn)
             logger.info("Database schema created successfully")
 
+    @staticmethod
+    def _backfill_tool_usage_minutely(conn):
+        """Build the per-minute tool counters from the logged rows that predate them.
+
+        Runs once, when tool_usage_minutely is first created. Only the rows that
+        were written to tool_usage_logs can be counted.
+        """
+        elapsed = 'COALESCE(execution_time_ms, 0)'
+        lower_bounds = [None] + TOOL_LATENCY_BUCKETS_MS
+        upper_bounds = TOOL_LATENCY_BUCKETS_MS + [None]
+        buckets = []
+        for lower, upper in zip(lower_bounds, upper_bounds):
+            conditions = [f'{elapsed} > {lower}' if lower is not None else None,
+                          f'{elapsed} <= {upper}' if upper is not None else None]
+            buckets.append(f"SUM(CASE WHEN {' AND '.join(c for c in conditions if c)} THEN 1 ELSE 0 END)")
+
+        backfilled = conn.execute(f'''
+            INSERT INTO tool_usage_minutely
+            (tool_name, minute, call_count, success_count, total_execution_time_ms,
+             {', '.join(TOOL_LATENCY_BUCKET_COLUMNS)})
+            SELECT tool_name, strftime('%Y-%m-%d %H:%M:00', timestamp), COUNT(*),
+                   SUM(CASE WHEN success THEN 1 ELSE 0 END), SUM({elapsed}),
+                   {', '.join(buckets)}
+            FROM tool_usage_logs
+            GROUP BY tool_name, strftime('%Y-%m-%d %H:%M:00', timestamp)
+        ''').rowcount
+        if backfilled:
+            logger.info(f"Backfilled {backfilled} tool_usage_minutely rows from tool_usage_logs")
+
+    @staticmethod
+    def _create_change_capture_triggers(conn):
+        """(Re)create the outbox triggers so their payload covers the current columns."""
+        for table, key in CHANGE_CAPTURE_TABLES.items():
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+            changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in columns)
+            for operation, event, ref, when in (
+                ('insert', 'INSERT', 'NEW', ''),
+                ('update', 'UPDATE', 'NEW', f'WHEN {changed}'),
+                ('delete', 'DELETE', 'OLD', ''),
+            ):
+                payload = ", ".join(f"'{c}', {ref}.{c}" for c in columns)
+                conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_outbox_{operation}')
+                conn.execute(f'''
+                    CREATE TRIGGER trg_{table}_outbox_{operation} AFTER {event} ON {table} {when}
+                    BEGIN
+                        INSERT INTO change_outbox (table_name, operation, row_key, payload)
+                        VALUES ('{table}', '{operation}', {ref}.{key}, json_object({payload}));
+                    END
+                ''')
+
+    @staticmethod
+    def _create_data_version_triggers(conn):
+        """(Re)create the triggers that bump data_versions on every write.
+
+        Rows written before the triggers existed get a stamp at version 1 so
+        every existing scope has a Last-Modified value.
+        """
+        def bump(scope_sql: str, when: str = 'TRUE') -> str:
+            # The WHERE clause is required for SQLite to parse the upsert after a SELECT
+            return f'''
+                INSERT INTO data_versions (scope, version, updated_at)
+                SELECT {scope_sql}, 1, CURRENT_TIMESTAMP WHERE {when}
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+            '''
+
+        for table, (scope, per_customer) in DATA_VERSION_TABLES.items():
+            for operation, event, ref in (
+                ('insert', 'INSERT', 'NEW'),
+                ('update', 'UPDATE', 'NEW'),
+                ('delete', 'DELETE', 'OLD'),
+            ):
+                if not per_customer:
+                    statements = bump(f"'{scope}'")
+                else:
+                    statements = bump(f"'{scope}:' || {ref}.customer_id")
+                    if operation == 'update':
+                        # A row moved to another customer changes the old customer's data too
+                        statements += bump(f"'{scope}:' || OLD.customer_id", 'OLD.customer_id IS NOT NEW.customer_id')
+                conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_version_{operation}')
+                conn.execute(f'''
+                    CREATE TRIGGER trg_{table}_version_{operation} AFTER {event} ON {table}
+                    BEGIN
+                        {statements}
+                    END
+                ''')
+
+            if per_customer:
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO data_versions (scope, version)
+                    SELECT DISTINCT '{scope}:' || customer_id, 1 FROM {table}
+                ''')
+            else:
+                conn.execute(f"INSERT OR IGNORE INTO data_versions (scope, version) SELECT '{scope}', 1 FROM {table} LIMIT 1")
+
+    @staticmethod
+    def _ensure_column(conn, table: str, column: str, column_type: str):
+        """Add a column introduced after the table was first created. Returns True if it was added."""
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+            return True
+        return False
+
     def _get_schema_sql(self) -> str:
         """Returns the database schema SQL."""
         return '''
@@ -150,9 +566,92 @@ class CallCenterDatabase:
             current_balance DECIMAL(10,2) DEFAULT 0.00,
             credit_limit DECIMAL(10,2) DEFAULT 0.00,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ledger_entry_id INTEGER,
             FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE
         );
 
+        -- Append-only balance movements; balance_after of the newest entry is the current balance
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+            entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id VARCHAR(10) NOT NULL,
+            entry_type VARCHAR(20) NOT NULL,
+            amount DECIMAL(10,2) NOT NULL,
+            balance_after DECIMAL(10,2) NOT NULL,
+            reference VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+        );
+
+        -- Unpaid bills awaiting collection, ordered by (priority, due_date); maintained by triggers on bills
+        CREATE TABLE IF NOT EXISTS collections_queue (
+            customer_id VARCHAR(10) NOT NULL,
+            bill_month VARCHAR(7) NOT NULL,
+            amount DECIMAL(10,2) NOT NULL,
+            due_date DATE NOT NULL,
+            priority INTEGER NOT NULL,
+            claimed_by VARCHAR(50),
+            claimed_until TIMESTAMP,
+            attempts INTEGER DEFAULT 0,
+            last_worked_at TIMESTAMP,
+            last_outcome VARCHAR(50),
+            enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (customer_id, bill_month)
+        );
+
+        -- Change-data-capture outbox (filled by triggers, see CHANGE_CAPTURE_TABLES)
+        -- row_key has no declared type so integer and text keys keep their type
+        CREATE TABLE IF NOT EXISTS change_outbox (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name VARCHAR(50) NOT NULL,
+            operation VARCHAR(10) NOT NULL,
+            row_key,
+            payload TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Version stamps for HTTP validators (ETag / Last-Modified), bumped by triggers
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope VARCHAR(60) PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Last committed outbox sequence per downstream consumer
+        CREATE TABLE IF NOT EXISTS change_consumers (
+            consumer VARCHAR(50) PRIMARY KEY,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Bulk package migrations: progress checkpoint and the frozen cohort
+        CREATE TABLE IF NOT EXISTS package_migrations (
+            migration_id VARCHAR(50) PRIMARY KEY,
+            target_package_id INTEGER NOT NULL,
+            status VARCHAR(20) DEFAULT 'running',
+            total_customers INTEGER DEFAULT 0,
+            migrated_customers INTEGER DEFAULT 0,
+            last_customer_id VARCHAR(10) DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (target_package_id) REFERENCES packages(package_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS package_migration_members (
+            migration_id VARCHAR(50) NOT NULL,
+            customer_id VARCHAR(10) NOT NULL,
+            previous_package_id INTEGER,
+            PRIMARY KEY (migration_id, customer_id)
+        );
+
+        -- Balances at compaction points, for point-in-time queries before the retained ledger
+        CREATE TABLE IF NOT EXISTS balance_snapshots (
+            customer_id VARCHAR(10) NOT NULL,
+            as_of_entry_id INTEGER NOT NULL,
+            as_of_time TIMESTAMP NOT NULL,
+            balance DECIMAL(10,2) NOT NULL,
+            PRIMARY KEY (customer_id, as_of_entry_id)
+        );
+
         -- Bills
         CREATE TABLE IF NOT EXISTS bills (
             bill_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -200,8 +699,75 @@ class CallCenterDatabase:
             FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
         );
 
+        -- Manifest of sessions moved to monthly archive files
+        CREATE TABLE IF NOT EXISTS archive_manifest (
+            session_id VARCHAR(50) PRIMARY KEY,
+            customer_id VARCHAR(10),
+            archive_month VARCHAR(7) NOT NULL,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            duration_seconds INTEGER,
+            status VARCHAR(20),
+            resolution_status VARCHAR(30),
+            customer_satisfaction INTEGER,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Indexes
+        CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone);
+        CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status);
+        CREATE INDEX IF NOT EXISTS idx_bills_customer ON bills(customer_id);
+        CREATE INDEX IF NOT EXISTS idx_bills_month ON bills(bill_month);
+        CREATE INDEX IF NOT EXISTS idx_call_sessions_customer ON call_sessions(customer_id);
+        CREATE INDEX IF NOT EXISTS idx_archive_manifest_customer ON archive_manifest(customer_id, start_time);
+        CREATE INDEX IF NOT EXISTS idx_balance_ledger_customer ON balance_ledger(customer_id, entry_id);
+        CREATE INDEX IF NOT EXISTS idx_collections_priority ON collections_queue(priority, due_date, customer_id, bill_month);
+        CREATE INDEX IF NOT EXISTS idx_collections_due_date ON collections_queue(due_date);
+
+        -- Keep collections_queue in step with bills
+        CREATE TRIGGER IF NOT EXISTS trg_bills_collections_insert AFTER INSERT ON bills
+        BEGIN
+            DELETE FROM collections_queue
+            WHERE NEW.is_paid AND customer_id = NEW.customer_id AND bill_month = NEW.bill_month;
+            INSERT INTO collections_queue (customer_id, bill_month, amount, due_date, priority)
+            SELECT NEW.customer_id, NEW.bill_month, NEW.amount, NEW.due_date,
+                   CASE WHEN NEW.amount >= 1000 THEN 1 WHEN NEW.amount >= 250 THEN 2 ELSE 3 END
+            WHERE NOT NEW.is_paid
+            ON CONFLICT(customer_id, bill_month) DO UPDATE SET
+                amount = excluded.amount, due_date = excluded.due_date, priority = excluded.priority;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_bills_collections_update AFTER UPDATE OF is_paid, amount, due_date ON bills
+        BEGIN
+            DELETE FROM collections_queue
+            WHERE NEW.is_paid AND customer_id = NEW.customer_id AND bill_month = NEW.bill_month;
+            INSERT INTO collections_queue (customer_id, bill_month, amount, due_date, priority)
+            SELECT NEW.customer_id, NEW.bill_month, NEW.amount, NEW.due_date,
+                   CASE WHEN NEW.amount >= 1000 THEN 1 WHEN NEW.amount >= 250 THEN 2 ELSE 3 END
+            WHERE NOT NEW.is_paid
+            ON CONFLICT(customer_id, bill_month) DO UPDATE SET
+                amount = excluded.amount, due_date = excluded.due_date, priority = excluded.priority;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_bills_collections_delete AFTER DELETE ON bills
+        BEGIN
+            DELETE FROM collections_queue WHERE customer_id = OLD.customer_id AND bill_month = OLD.bill_month;
+        END;
+        '''
+
+    def _get_telemetry_schema_sql(self, schema: str = 'main') -> str:
+        """Returns the schema of the append-heavy telemetry tables.
+
+        With a separate log file the tables live in the attached ``logs``
+        schema; SQLite cannot enforce foreign keys across files, so they are
+        only declared when the tables share the main file.
+        """
+        def fk(clause: str) -> str:
+            return f",\n            {clause}" if schema == 'main' else ''
+
+        return f'''
         -- Call messages
-        CREATE TABLE IF NOT EXISTS call_messages (
+        CREATE TABLE IF NOT EXISTS {schema}.call_messages (
             message_id INTEGER PRIMARY KEY AUTOINCREMENT,
             session_id VARCHAR(50) NOT NULL,
             role VARCHAR(20) NOT NULL,
@@ -210,12 +776,11 @@ class CallCenterDatabase:
             message_type VARCHAR(20) DEFAULT 'text',
             tool_call VARCHAR(50),
             tool_result TEXT,
-            processing_time_ms INTEGER,
-            FOREIGN KEY (session_id) REFERENCES call_sessions(session_id) ON DELETE CASCADE
+            processing_time_ms INTEGER{fk("FOREIGN KEY (session_id) REFERENCES call_sessions(session_id) ON DELETE CASCADE")}
         );
 
         -- Tool usage logs
-        CREATE TABLE IF NOT EXISTS tool_usage_logs (
+        CREATE TABLE IF NOT EXISTS {schema}.tool_usage_logs (
             log_id INTEGER PRIMARY KEY AUTOINCREMENT,
             session_id VARCHAR(50) NOT NULL,
             tool_name VARCHAR(50) NOT NULL,
@@ -224,12 +789,11 @@ class CallCenterDatabase:
             execution_time_ms INTEGER,
             success BOOLEAN DEFAULT TRUE,
             error_message TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES call_sessions(session_id) ON DELETE CASCADE
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP{fk("FOREIGN KEY (session_id) REFERENCES call_sessions(session_id) ON DELETE CASCADE")}
         );
 
         -- Error logs
-        CREATE TABLE IF NOT EXISTS error_logs (
+        CREATE TABLE IF NOT EXISTS {schema}.error_logs (
             error_id INTEGER PRIMARY KEY AUTOINCREMENT,
             session_id VARCHAR(50),
             error_type VARCHAR(50) NOT NULL,
@@ -237,37 +801,136 @@ class CallCenterDatabase:
             stack_trace TEXT,
             severity VARCHAR(20) DEFAULT 'medium',
             resolved BOOLEAN DEFAULT FALSE,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES call_sessions(session_id)
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP{fk("FOREIGN KEY (session_id) REFERENCES call_sessions(session_id)")}
         );
 
-        -- Indexes
-        CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone);
-        CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status);
-        CREATE INDEX IF NOT EXISTS idx_bills_customer ON bills(customer_id);
-        CREATE INDEX IF NOT EXISTS idx_bills_month ON bills(bill_month);
-        CREATE INDEX IF NOT EXISTS idx_call_sessions_customer ON call_sessions(customer_id);
-        CREATE INDEX IF NOT EXISTS idx_call_messages_session ON call_messages(session_id);
-        CREATE INDEX IF NOT EXISTS idx_tool_usage_session ON tool_usage_logs(session_id);
+        -- Compacted transcripts of ended sessions (messages + tool usage in one blob)
+        CREATE TABLE IF NOT EXISTS {schema}.session_transcripts (
+            session_id VARCHAR(50) PRIMARY KEY,
+            message_count INTEGER NOT NULL,
+            tool_count INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            purge_after TIMESTAMP,
+            -- Highest per-row ids folded into the payload; newer rows were logged after the end
+            last_message_id INTEGER,
+            last_tool_log_id INTEGER{fk("FOREIGN KEY (session_id) REFERENCES call_sessions(session_id) ON DELETE CASCADE")}
+        );
+
+        -- One row per distinct error (error_type + normalized stack)
+        CREATE TABLE IF NOT EXISTS {schema}.error_fingerprints (
+            fingerprint VARCHAR(40) PRIMARY KEY,
+            error_type VARCHAR(50) NOT NULL,
+            severity VARCHAR(20),
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            occurrence_count INTEGER DEFAULT 0,
+            sample_message TEXT,
+            sample_stack_trace TEXT
+        );
+
+        -- Exact occurrence counts per fingerprint and hour
+        CREATE TABLE IF NOT EXISTS {schema}.error_counts_hourly (
+            fingerprint VARCHAR(40) NOT NULL,
+            hour TIMESTAMP NOT NULL,
+            severity VARCHAR(20),
+            occurrence_count INTEGER DEFAULT 0,
+            severe_count INTEGER DEFAULT 0,
+            PRIMARY KEY (fingerprint, hour)
+        );
+
+        -- Exact per-minute tool call counters with a latency histogram
+        CREATE TABLE IF NOT EXISTS {schema}.tool_usage_minutely (
+            tool_name VARCHAR(50) NOT NULL,
+            minute TIMESTAMP NOT NULL,
+            call_count INTEGER DEFAULT 0,
+            success_count INTEGER DEFAULT 0,
+            total_execution_time_ms INTEGER DEFAULT 0,
+            bucket_le_10 INTEGER DEFAULT 0,
+            bucket_le_25 INTEGER DEFAULT 0,
+            bucket_le_50 INTEGER DEFAULT 0,
+            bucket_le_100 INTEGER DEFAULT 0,
+            bucket_le_250 INTEGER DEFAULT 0,
+            bucket_le_500 INTEGER DEFAULT 0,
+            bucket_le_1000 INTEGER DEFAULT 0,
+            bucket_le_2500 INTEGER DEFAULT 0,
+            bucket_le_5000 INTEGER DEFAULT 0,
+            bucket_inf INTEGER DEFAULT 0,
+            PRIMARY KEY (minute, tool_name)
+        );
+
+        -- Mergeable latency sketches (DDSketch) per metric, dimension and time bucket
+        CREATE TABLE IF NOT EXISTS {schema}.latency_sketches (
+            metric VARCHAR(20) NOT NULL,
+            dimension VARCHAR(50) NOT NULL DEFAULT '',
+            bucket_start TIMESTAMP NOT NULL,
+            sample_count INTEGER NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (metric, bucket_start, dimension)
+        );
+
+        CREATE INDEX IF NOT EXISTS {schema}.idx_call_messages_session ON call_messages(session_id);
+        CREATE INDEX IF NOT EXISTS {schema}.idx_error_counts_hour ON error_counts_hourly(hour);
+        CREATE INDEX IF NOT EXISTS {schema}.idx_tool_usage_session ON tool_usage_logs(session_id);
+        CREATE INDEX IF NOT EXISTS {schema}.idx_session_transcripts_purge ON session_transcripts(purge_after);
         '''
 
+    def _migrate_telemetry_to_log_db(self, conn):
+        """Create the telemetry tables in the log file and move any rows still in the main file."""
+        conn.executescript(self._get_telemetry_schema_sql('logs'))
+
+        for table in TELEMETRY_TABLES:
+            exists = conn.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            if not exists:
+                continue
+
+            columns = ', '.join(
+                row[1] for row in conn.execute(f'PRAGMA main.table_info({table})')
+            )
+            moved = conn.execute(
+                f'INSERT INTO logs.{table} ({columns}) SELECT {columns} FROM main.{table}'
+            ).rowcount
+            conn.execute(f'DROP TABLE main.{table}')
+            logger.info(f"Moved {moved} rows of {table} to log database {self.log_db_path}")
+
+    def _start_periodic(self, name: str, interval_seconds: int, method_name: str):
+        """Run a method every ``interval_seconds`` on a daemon thread until ``close()``.
+
+        The thread holds only a weak reference, so an instance that is dropped
+        without ``close()`` is still collected (with its pooled connections)
+        and the thread ends at its next wake-up.
+        """
+        threading.Thread(
+            target=self._run_periodic, args=(weakref.ref(self), self._background_stop, interval_seconds, method_name),
+            name=name, daemon=True
+        ).start()
+
+    @staticmethod
+    def _run_periodic(db_ref, stop: threading.Event, interval_seconds: int, method_name: str):
+        while not stop.wait(interval_seconds):
+            db = db_ref()
+            if db is None:
+                return
+            try:
+                getattr(db, method_name)()
+            except Exception as e:
+                logger.warning(f"Background {method_name} failed: {e}")
+            del db
+
+    def checkpoint_log_db(self, mode: str = 'PASSIVE') -> Optional[Tuple]:
+        """Checkpoint the log file's WAL independently of the main file."""
+        if not self.log_db_path:
+            return None
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Invalid checkpoint mode: {mode}")
+        with self.get_connection() as conn:
+            return tuple(conn.execute(f'PRAGMA logs.wal_checkpoint({mode})').fetchone())
+
     def _insert_initial_data(self, conn):
         """Insert initial test data."""
         
-        # Insert customers
-        customers_data = [
-            ("1001", "Ali Veli", "5551234567", "ali.veli@email.com", "İstanbul"),
-            ("1002", "Ayşe Demir", "5552345678", "ayse.demir@email.com", "Ankara"),
-            ("1003", "Mehmet Can", "5553456789", "mehmet.can@email.com", "İzmir"),
-            ("1004", "Elif Yılmaz", "5554567890", "elif.yilmaz@email.com", "Bursa"),
-            ("1005", "Berke Kara", "5555678901", "berke.kara@email.com", "Antalya"),
-        ]
-        
-        conn.executemany('''
-            INSERT OR REPLACE INTO customers (customer_id, name, phone, email, address)
-            VALUES (?, ?, ?, ?, ?)
-        ''', customers_data)
-
         # Insert packages
         packages_data = [
             ("Bronze", 25.00, "Başlangıç paketi"),
@@ -303,6 +966,24 @@ class CallCenterDatabase:
                     VALUES (?, ?, ?)
                 ''', (package_id, feature.split()[1], feature.split()[0]))
 
+        # Sample customers and their records (skipped for shards, which are seeded by the router)
+        if not self.seed_sample_data:
+            return
+
+        # Insert customers
+        customers_data = [
+            ("1001", "Ali Veli", "5551234567", "ali.veli@email.com", "İstanbul"),
+            ("1002", "Ayşe Demir", "5552345678", "ayse.demir@email.com", "Ankara"),
+            ("1003", "Mehmet Can", "5553456789", "mehmet.can@email.com", "İzmir"),
+            ("1004", "Elif Yılmaz", "5554567890", "elif.yilmaz@email.com", "Bursa"),
+            ("1005", "Berke Kara", "5555678901", "berke.kara@email.com", "Antalya"),
+        ]
+        
+        conn.executemany('''
+            INSERT OR REPLACE INTO customers (customer_id, name, phone, email, address)
+            VALUES (?, ?, ?, ?, ?)
+        ''', customers_data)
+
         # Insert customer subscriptions
         subscription_data = [
             ("1001", "Premium", "2024-01-01"),
@@ -333,8 +1014,9 @@ class CallCenterDatabase:
             ("1005", 5415.20, 25.00),
         ]
         
+        # Balances are owned by the ledger once seeded; never reset them on restart
         conn.executemany('''
-            INSERT OR REPLACE INTO customer_balances 
+            INSERT OR IGNORE INTO customer_balances 
             (customer_id, current_balance, credit_limit)
             VALUES (?, ?, ?)
         ''', balance_data)
@@ -376,7 +1058,12 @@ class CallCenterDatabase:
             query = '''
                 SELECT 
                     c.customer_id, c.name, c.phone, c.email,
-                    p.package_name, cb.current_balance, cb.credit_limit,
+                    p.package_name, cb.credit_limit,
+                    COALESCE(
+                        (SELECT bl.balance_after FROM balance_ledger bl 
+                         WHERE bl.customer_id = c.customer_id ORDER BY bl.entry_id DESC LIMIT 1),
+                        cb.current_balance
+                    ) as current_balance,
                     julianday('now') - julianday(c.registration_date) as days_as_customer,
                     SUM(CASE WHEN b.is_paid = TRUE THEN b.amount ELSE 0 END) as total_paid
                 FROM customers c
@@ -400,6 +1087,18 @@ class CallCenterDatabase:
             
             return {}
 
+    def customer_exists(self, customer_id: str) -> bool:
+        """Primary-key check for an active customer (no joins)."""
+        with self.get_connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM customers WHERE customer_id = ? AND status = 'active'", (customer_id,)
+            ).fetchone() is not None
+
+    def get_active_customer_ids(self) -> List[str]:
+        with self.get_connection() as conn:
+            return [row[0] for row in conn.execute("SELECT customer_id FROM customers WHERE status = 'active'")]
+
+    @read_route
     def get_system_health(self) -> Dict:
         """Get system health metrics."""
         with self.get_connection() as conn:
@@ -409,36 +1108,31 @@ class CallCenterDatabase:
                 WHERE start_time >= datetime('now', '-24 hours')
             ''').fetchone()[0]
             
-            recent_errors = conn.execute('''
-                SELECT COUNT(*) FROM error_logs 
-                WHERE timestamp >= datetime('now', '-24 hours')
-                AND severity IN ('high', 'critical')
-            ''').fetchone()[0]
+            recent_errors, top_errors = self._get_recent_error_summary(conn)
             
             active_sessions = conn.execute('''
                 SELECT COUNT(*) FROM call_sessions 
                 WHERE status = 'active'
             ''').fetchone()[0]
             
-            avg_response_time = conn.execute('''
-                SELECT AVG(processing_time_ms) FROM call_messages
-                WHERE timestamp >= datetime('now', '-1 hour')
-                AND processing_time_ms IS NOT NULL
-            ''').fetchone()[0]
+            response_latency = merge_sketches(self._load_latency_sketches(conn, 'response', 60).values())
+            avg_response_time = response_latency.avg if response_latency else None
             
             # Tool success rate
             tool_success_rate = conn.execute('''
                 SELECT 
-                    (COUNT(CASE WHEN success = 1 THEN 1 END) * 100.0 / COUNT(*)) as success_rate
-                FROM tool_usage_logs
-                WHERE timestamp >= datetime('now', '-24 hours')
+                    (SUM(success_count) * 100.0 / SUM(call_count)) as success_rate
+                FROM tool_usage_minutely
+                WHERE minute >= strftime('%Y-%m-%d %H:%M:00', 'now', '-24 hours')
             ''').fetchone()[0]
             
             return {
                 'recent_calls_24h': recent_calls,
                 'recent_errors_24h': recent_errors,
+                'top_errors_24h': top_errors,
                 'active_sessions': active_sessions,
                 'avg_response_time_ms': avg_response_time or 0,
+                **self._latency_quantiles(response_latency, 'response_time'),
                 'tool_success_rate': tool_success_rate or 0,
                 'status': 'healthy' if recent_errors < 10 else 'warning'
             }
@@ -447,6 +1141,7 @@ class CallCenterDatabase:
     # Call Session Management
     # ================================
     
+    @write_route
     def create_call_session(self, customer_id: str = None, agent_mode: str = 'ai') -> str:
         """Create a new call session."""
         session_id = str(uuid.uuid4())
@@ -461,6 +1156,7 @@ class CallCenterDatabase:
         logger.info(f"New call session created: {session_id}")
         return session_id
 
+    @write_route
     def end_call_session(self, session_id: str, resolution_status: str = None, 
                         customer_satisfaction: int = None, notes: str = None) -> bool:
         """End a call session."""
@@ -483,49 +1179,268 @@ class CallCenterDatabase:
                     notes = ?
                 WHERE session_id = ?
             ''', (resolution_status, customer_satisfaction, notes, session_id))
+
+            # The transcript is final now; fold it into a single row
+            self._compact_session(conn, session_id)
+
+        if self.transcript_grace_seconds:
+            self.purge_compacted_transcripts()
         
         logger.info(f"Call session ended: {session_id}")
         return True
 
+    # ================================
+    # Transcript Compaction
+    # ================================
+
+    def _read_session_rows(self, conn, session_id: str, after_message_id: int = 0,
+                           after_tool_log_id: int = 0) -> Tuple[List[Dict], List[Dict], int, int]:
+        """Messages and tool usage newer than the given ids, plus the highest ids read."""
+        messages = [dict(row) for row in conn.execute('''
+            SELECT message_id, role, content, timestamp, message_type, tool_call, tool_result
+            FROM call_messages
+            WHERE session_id = ? AND message_id > ?
+            ORDER BY timestamp, message_id
+        ''', (session_id, after_message_id))]
+        tools = [dict(row) for row in conn.execute('''
+            SELECT log_id, tool_name, parameters, result, execution_time_ms, success
+            FROM tool_usage_logs
+            WHERE session_id = ? AND log_id > ?
+            ORDER BY timestamp, log_id
+        ''', (session_id, after_tool_log_id))]
+        last_message_id = max([after_message_id] + [msg.pop('message_id') for msg in messages])
+        last_tool_log_id = max([after_tool_log_id] + [tool.pop('log_id') for tool in tools])
+        return (
+            [self.codec.decode_row(msg, ['content', 'tool_result']) for msg in messages],
+            [self.codec.decode_row(tool, ['parameters', 'result']) for tool in tools],
+            last_message_id, last_tool_log_id
+        )
+
+    def _read_transcript(self, conn, session_id: str) -> Optional[Tuple[Dict, bool, int, int]]:
+        """(transcript, has late rows?, last message id, last tool log id) of a compacted session.
+
+        Rows logged after the transcript was written are appended to it.
+        """
+        transcript = conn.execute('''
+            SELECT payload, last_message_id, last_tool_log_id FROM session_transcripts WHERE session_id = ?
+        ''', (session_id,)).fetchone()
+        if not transcript:
+            return None
+        compacted = json.loads(self.transcript_codec.decode_text(transcript['payload']))
+        messages, tools, last_message_id, last_tool_log_id = self._read_session_rows(
+            conn, session_id, transcript['last_message_id'] or 0, transcript['last_tool_log_id'] or 0
+        )
+        compacted['messages'] += messages
+        compacted['tool_usage'] += tools
+        return compacted, bool(messages or tools), last_message_id, last_tool_log_id
+
+    def _compact_session(self, conn, session_id: str):
+        """Serialize a session's messages and tool usage into session_transcripts.
+
+        A session that is already compacted (ended twice, or logged to after
+        its end) keeps its transcript: only rows newer than the transcript's
+        watermarks are merged in, since older rows may already be purged.
+        """
+        existing = self._read_transcript(conn, session_id)
+        if existing is not None:
+            compacted, late_rows, last_message_id, last_tool_log_id = existing
+            if not late_rows:
+                return
+            messages, tools = compacted['messages'], compacted['tool_usage']
+        else:
+            messages, tools, last_message_id, last_tool_log_id = self._read_session_rows(conn, session_id)
+        payload = self.transcript_codec.encode_text(
+            json.dumps({'messages': messages, 'tool_usage': tools}, ensure_ascii=False, default=str)
+        )
+
+        conn.execute('''
+            INSERT OR REPLACE INTO session_transcripts 
+            (session_id, message_count, tool_count, payload, purge_after, last_message_id, last_tool_log_id)
+            VALUES (?, ?, ?, ?, datetime('now', ?), ?, ?)
+        ''', (session_id, len(messages), len(tools), payload, f'+{int(self.transcript_grace_seconds)} seconds',
+              last_message_id, last_tool_log_id))
+
+        if not self.transcript_grace_seconds:
+            self._purge_session_rows(conn, session_id)
+
+    def _purge_session_rows(self, conn, session_id: str):
+        # Rows logged after the transcript was written are not in it yet and stay
+        conn.execute('''
+            DELETE FROM call_messages WHERE session_id = ? AND message_id <= (
+                SELECT last_message_id FROM session_transcripts WHERE session_id = ?)
+        ''', (session_id, session_id))
+        conn.execute('''
+            DELETE FROM tool_usage_logs WHERE session_id = ? AND log_id <= (
+                SELECT last_tool_log_id FROM session_transcripts WHERE session_id = ?)
+        ''', (session_id, session_id))
+        conn.execute('UPDATE session_transcripts SET purge_after = NULL WHERE session_id = ?', (session_id,))
+
+    @write_route
+    def purge_compacted_transcripts(self, limit: int = 500) -> int:
+        """Drop per-row records of compacted sessions whose grace period has passed."""
+        with self.get_connection() as conn:
+            due = conn.execute('''
+                SELECT session_id FROM session_transcripts
+                WHERE purge_after IS NOT NULL AND purge_after <= CURRENT_TIMESTAMP
+                LIMIT ?
+            ''', (limit,)).fetchall()
+
+            for row in due:
+                self._purge_session_rows(conn, row['session_id'])
+
+        if due:
+            logger.info(f"Purged per-row records of {len(due)} compacted sessions")
+        return len(due)
+
+    @write_route
+    def compact_completed_sessions(self, batch_size: int = 500) -> int:
+        """Backfill transcripts for completed sessions that ended before compaction existed."""
+        with self.get_connection() as conn:
+            sessions = conn.execute('''
+                SELECT cs.session_id FROM call_sessions cs
+                LEFT JOIN session_transcripts st ON st.session_id = cs.session_id
+                WHERE cs.status = 'completed' AND st.session_id IS NULL
+                LIMIT ?
+            ''', (batch_size,)).fetchall()
+
+            for row in sessions:
+                self._compact_session(conn, row['session_id'])
+
+        logger.info(f"Compacted {len(sessions)} completed sessions")
+        return len(sessions)
+
+    @write_route
     def add_call_message(self, session_id: str, role: str, content: str, 
                         message_type: str = 'text', tool_call: str = None, 
-                        tool_result: str = None, processing_time_ms: int = None) -> int:
-        """Add a message to call session."""
+                        tool_result: str = None, processing_time_ms: int = None,
+                        specialist: str = None) -> int:
+        """Add a message to call session.
+
+        ``specialist`` is the agent layer that produced the message; it is the
+        dimension of the response latency sketch.
+        """
+        if processing_time_ms is not None:
+            self._record_latency('response', specialist, processing_time_ms)
+
         with self.get_connection() as conn:
             cursor = conn.execute('''
                 INSERT INTO call_messages 
                 (session_id, role, content, message_type, tool_call, tool_result, processing_time_ms)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (session_id, role, content, message_type, tool_call, tool_result, processing_time_ms))
+            ''', (session_id, role, self.codec.encode_text(content), message_type, tool_call,
+                  self.codec.encode_text(tool_result), processing_time_ms))
             
             return cursor.lastrowid
 
+    @write_route
     def log_tool_usage(self, session_id: str, tool_name: str, parameters: Dict, 
                       result: str, execution_time_ms: int, success: bool = True, 
                       error_message: str = None) -> int:
-        """Log tool usage."""
+        """Log tool usage.
+
+        The per-minute counters are always updated; a tool_usage_logs row is
+        written when the logging policy selects the call. Returns its log_id,
+        or 0 when the call was only counted.
+        """
+        bucket = tool_latency_bucket(execution_time_ms or 0)
+        self._record_latency('tool', tool_name, execution_time_ms or 0)
+
         with self.get_connection() as conn:
+            conn.execute(f'''
+                INSERT INTO tool_usage_minutely 
+                (tool_name, minute, call_count, success_count, total_execution_time_ms, {bucket})
+                VALUES (?, strftime('%Y-%m-%d %H:%M:00', 'now'), 1, ?, ?, 1)
+                ON CONFLICT(minute, tool_name) DO UPDATE SET
+                    call_count = call_count + 1,
+                    success_count = success_count + excluded.success_count,
+                    total_execution_time_ms = total_execution_time_ms + excluded.total_execution_time_ms,
+                    {bucket} = {bucket} + 1
+            ''', (tool_name, 1 if success else 0, execution_time_ms or 0))
+
+            if not self.tool_logging_policy.should_log(tool_name, success):
+                return 0
+
             cursor = conn.execute('''
                 INSERT INTO tool_usage_logs 
                 (session_id, tool_name, parameters, result, execution_time_ms, success, error_message)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (session_id, tool_name, json.dumps(parameters), result, 
+            ''', (session_id, tool_name, self.codec.encode_json(parameters), self.codec.encode_text(result),
                   execution_time_ms, success, error_message))
             
             return cursor.lastrowid
 
+    @staticmethod
+    def error_fingerprint(error_type: str, error_message: str, stack_trace: str = None) -> str:
+        """Stable id of an error: its type plus the stack (or message) with volatile parts removed."""
+        text = stack_trace or error_message or ''
+        for pattern, replacement in _ERROR_NOISE_PATTERNS:
+            text = pattern.sub(replacement, text)
+        return hashlib.sha1(f"{error_type}\n{text}".encode('utf-8')).hexdigest()
+
+    @write_route
     def log_error(self, session_id: str, error_type: str, error_message: str, 
                  stack_trace: str = None, severity: str = 'medium') -> int:
-        """Log system errors."""
+        """Log system errors.
+
+        Every occurrence is counted in the fingerprint aggregates; a full
+        error_logs row is only written for sampled occurrences. Returns the
+        error_id of that row, or 0 when the occurrence was only counted.
+        """
+        fingerprint = self.error_fingerprint(error_type, error_message, stack_trace)
+        severe = 1 if severity in SEVERE_ERROR_LEVELS else 0
+
         with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO error_fingerprints 
+                (fingerprint, error_type, severity, occurrence_count, sample_message, sample_stack_trace)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    occurrence_count = occurrence_count + 1,
+                    last_seen = CURRENT_TIMESTAMP,
+                    severity = excluded.severity
+            ''', (fingerprint, error_type, severity, error_message, self.codec.encode_text(stack_trace)))
+
+            hourly_count = conn.execute('''
+                INSERT INTO error_counts_hourly (fingerprint, hour, severity, occurrence_count, severe_count)
+                VALUES (?, strftime('%Y-%m-%d %H:00:00', 'now'), ?, 1, ?)
+                ON CONFLICT(fingerprint, hour) DO UPDATE SET
+                    occurrence_count = occurrence_count + 1,
+                    severe_count = severe_count + excluded.severe_count,
+                    severity = excluded.severity
+                RETURNING occurrence_count
+            ''', (fingerprint, severity, severe)).fetchone()[0]
+
+            if hourly_count > self.error_rows_per_hour and random.random() >= self.error_sample_rate:
+                return 0
+
             cursor = conn.execute('''
                 INSERT INTO error_logs 
                 (session_id, error_type, error_message, stack_trace, severity)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (session_id, error_type, error_message, stack_trace, severity))
+            ''', (session_id, error_type, error_message, self.codec.encode_text(stack_trace), severity))
             
             return cursor.lastrowid
 
+    def _get_recent_error_summary(self, conn) -> Tuple[int, List[Dict]]:
+        """High/critical error count of the last 24 hours and the most frequent fingerprints."""
+        recent_errors = conn.execute('''
+            SELECT COALESCE(SUM(severe_count), 0) FROM error_counts_hourly 
+            WHERE hour >= strftime('%Y-%m-%d %H:00:00', 'now', '-24 hours')
+        ''').fetchone()[0]
+
+        top_errors = conn.execute('''
+            SELECT 
+                f.fingerprint, f.error_type, f.severity, f.first_seen, f.last_seen,
+                SUM(h.occurrence_count) as count_24h, f.sample_message
+            FROM error_counts_hourly h
+            JOIN error_fingerprints f ON f.fingerprint = h.fingerprint
+            WHERE h.hour >= strftime('%Y-%m-%d %H:00:00', 'now', '-24 hours')
+            GROUP BY f.fingerprint
+            ORDER BY count_24h DESC
+            LIMIT 5
+        ''').fetchall()
+        return recent_errors, [dict(row) for row in top_errors]
+
     def get_call_session_history(self, session_id: str) -> Dict:
         """Get complete call session with messages."""
         with self.get_connection() as conn:
@@ -539,36 +1454,25 @@ class CallCenterDatabase:
             session = conn.execute(session_query, (session_id,)).fetchone()
             
             if not session:
-                return None
-            
-            # Get messages
-            messages_query = '''
-                SELECT role, content, timestamp, message_type, tool_call, tool_result
-                FROM call_messages
-                WHERE session_id = ?
-                ORDER BY timestamp
-            '''
-            messages = conn.execute(messages_query, (session_id,)).fetchall()
-            
-            # Get tool usage
-            tools_query = '''
-                SELECT tool_name, parameters, result, execution_time_ms, success
-                FROM tool_usage_logs
-                WHERE session_id = ?
-                ORDER BY timestamp
-            '''
-            tools = conn.execute(tools_query, (session_id,)).fetchall()
+                return self._get_archived_session_history(conn, session_id)
             
+            # Ended sessions are a single row fetch (plus any rows logged after the end)
+            existing = self._read_transcript(conn, session_id)
+            if existing is not None:
+                return {'session': dict(session), **existing[0]}
+
+            messages, tools, _, _ = self._read_session_rows(conn, session_id)
             return {
                 'session': dict(session),
-                'messages': [dict(msg) for msg in messages],
-                'tool_usage': [dict(tool) for tool in tools]
+                'messages': messages,
+                'tool_usage': tools
             }
 
     # ================================
     # Analytics and Reporting
     # ================================
     
+    @read_route
     def get_daily_metrics(self, date_str: str = None) -> Dict:
         """Get daily performance metrics."""
         if not date_str:
@@ -589,23 +1493,34 @@ class CallCenterDatabase:
             result = conn.execute(query, (date_str,)).fetchone()
             return dict(result) if result else {}
 
+    @read_route
     def get_tool_usage_stats(self, days: int = 30) -> List[Dict]:
-        """Get tool usage statistics."""
+        """Get tool usage statistics (exact, from the per-minute counters)."""
         with self.get_connection() as conn:
+            bucket_sums = ', '.join(f'SUM({column}) as {column}' for column in TOOL_LATENCY_BUCKET_COLUMNS)
+            sketches = self._load_latency_sketches(conn, 'tool', int(days) * 24 * 60)
             query = '''
                 SELECT 
                     tool_name,
-                    COUNT(*) as usage_count,
-                    AVG(execution_time_ms) as avg_execution_time,
-                    (COUNT(CASE WHEN success = 1 THEN 1 END) * 100.0 / COUNT(*)) as success_rate
-                FROM tool_usage_logs 
-                WHERE timestamp >= datetime('now', '-{} days')
+                    SUM(call_count) as usage_count,
+                    SUM(total_execution_time_ms) * 1.0 / SUM(call_count) as avg_execution_time,
+                    (SUM(success_count) * 100.0 / SUM(call_count)) as success_rate,
+                    {}
+                FROM tool_usage_minutely 
+                WHERE minute >= strftime('%Y-%m-%d %H:%M:00', 'now', '-{} days')
                 GROUP BY tool_name
                 ORDER BY usage_count DESC
-            '''.format(days)
-            
-            result = conn.execute(query).fetchall()
-            return [dict(row) for row in result]
+            '''.format(bucket_sums, int(days))
+            
+            stats = []
+            for row in conn.execute(query).fetchall():
+                data = dict(row)
+                data['latency_histogram'] = {
+                    column.replace('bucket_', ''): data.pop(column) for column in TOOL_LATENCY_BUCKET_COLUMNS
+                }
+                data.update(self._latency_quantiles(sketches.get(data['tool_name']), 'execution_time'))
+                stats.append(data)
+            return stats
 
     def get_customer_call_history(self, customer_id: str, limit: int = 10) -> List[Dict]:
         """Get customer's recent call history."""
@@ -621,12 +1536,443 @@ class CallCenterDatabase:
             '''
             
             result = conn.execute(query, (customer_id, limit)).fetchall()
-            return [dict(row) for row in result]
+            history = [dict(row) for row in result]
+
+            if self.archive and len(history) < limit:
+                # Older calls may have been moved to the archive; the manifest has their summary
+                archived = conn.execute('''
+                    SELECT 
+                        session_id, start_time, end_time, duration_seconds,
+                        status, resolution_status, customer_satisfaction
+                    FROM archive_manifest
+                    WHERE customer_id = ?
+                    ORDER BY start_time DESC
+                    LIMIT ?
+                ''', (customer_id, limit - len(history))).fetchall()
+                history.extend(dict(row) for row in archived)
+
+            return history
+
+    # ================================
+    # Batch Reads
+    # ================================
+    # Multi-key variants of the customer reads. The ids are passed as one JSON
+    # array parameter and joined through json_each, so a call is one query
+    # regardless of how many ids it carries.
+
+    @staticmethod
+    def _group_by_customer(customer_ids: List[str], rows, empty=list) -> Dict:
+        grouped = {cid: empty() for cid in customer_ids}
+        for row in rows:
+            data = dict(row)
+            grouped[data.pop('customer_id')].append(data)
+        return grouped
+
+    def get_customer_info_many(self, customer_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """``get_customer_info`` for several customers; unknown or inactive ids map to None."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT 
+                    c.customer_id, c.name, c.phone, c.email,
+                    p.package_name, cb.credit_limit,
+                    COALESCE(
+                        (SELECT bl.balance_after FROM balance_ledger bl 
+                         WHERE bl.customer_id = c.customer_id ORDER BY bl.entry_id DESC LIMIT 1),
+                        cb.current_balance
+                    ) as current_balance,
+                    julianday('now') - julianday(c.registration_date) as days_as_customer,
+                    SUM(CASE WHEN b.is_paid = TRUE THEN b.amount ELSE 0 END) as total_paid
+                FROM customers c
+                LEFT JOIN customer_subscriptions cs ON c.customer_id = cs.customer_id 
+                    AND cs.status = 'active'
+                LEFT JOIN packages p ON cs.package_id = p.package_id
+                LEFT JOIN customer_balances cb ON c.customer_id = cb.customer_id
+                LEFT JOIN bills b ON c.customer_id = b.customer_id
+                WHERE c.customer_id IN (SELECT value FROM json_each(?)) AND c.status = 'active'
+                GROUP BY c.customer_id
+            ''', (json.dumps(customer_ids),)).fetchall()
+
+        customers = dict.fromkeys(customer_ids)
+        for row in rows:
+            data = dict(row)
+            months_as_customer = max(1, data['days_as_customer'] / 30)
+            data['monthly_value'] = data['total_paid'] / months_as_customer if data['total_paid'] else 0
+            customers[data['customer_id']] = data
+        return customers
+
+    def get_customer_bills_many(self, customer_ids: List[str]) -> Dict[str, List[Dict]]:
+        """``get_customer_bills`` for several customers."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT customer_id, bill_month, amount, due_date, is_paid, paid_date, payment_method
+                FROM bills
+                WHERE customer_id IN (SELECT value FROM json_each(?))
+                ORDER BY customer_id, bill_month DESC
+            ''', (json.dumps(customer_ids),)).fetchall()
+        return self._group_by_customer(customer_ids, rows)
+
+    def get_customer_usage_stats_many(self, customer_ids: List[str],
+                                      month: str = None) -> Dict[str, Optional[Dict]]:
+        """``get_customer_usage_stats`` for several customers (latest month when none is given)."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT customer_id, calls_minutes, data_mb, sms_count, extra_charges
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY customer_id ORDER BY usage_month DESC
+                    ) as rn
+                    FROM usage_stats
+                    WHERE customer_id IN (SELECT value FROM json_each(?))
+                    AND (? IS NULL OR usage_month = ?)
+                )
+                WHERE rn = 1
+            ''', (json.dumps(customer_ids), month, month)).fetchall()
+
+        stats = dict.fromkeys(customer_ids)
+        for row in rows:
+            data = dict(row)
+            stats[data.pop('customer_id')] = data
+        return stats
+
+    def get_customer_call_history_many(self, customer_ids: List[str],
+                                       limit: int = 10) -> Dict[str, List[Dict]]:
+        """``get_customer_call_history`` for several customers, ``limit`` calls each."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        query = '''
+            SELECT customer_id, session_id, start_time, end_time, duration_seconds,
+                   status, resolution_status, customer_satisfaction
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY customer_id ORDER BY start_time DESC
+                ) as rn
+                FROM {table}
+                WHERE customer_id IN (SELECT value FROM json_each(?))
+            )
+            WHERE rn <= ?
+            ORDER BY customer_id, start_time DESC
+        '''
+        with self.get_connection() as conn:
+            rows = conn.execute(query.format(table='call_sessions'), (json.dumps(customer_ids), limit)).fetchall()
+            history = self._group_by_customer(customer_ids, rows)
+
+            short = [cid for cid, calls in history.items() if len(calls) < limit]
+            if self.archive and short:
+                # Older calls may have been moved to the archive; the manifest has their summary
+                archived = conn.execute(
+                    query.format(table='archive_manifest'), (json.dumps(short), limit)
+                ).fetchall()
+                for cid, calls in self._group_by_customer(short, archived).items():
+                    history[cid].extend(calls[:limit - len(history[cid])])
+
+        return history
+
+    # ================================
+    # Latency Sketches
+    # ================================
+
+    def _record_latency(self, metric: str, dimension: Optional[str], elapsed_ms: float):
+        self.latency_recorder.record(metric, dimension, elapsed_ms)
+        if self.latency_flush_seconds and not self._latency_flush_started:
+            with self._latency_flush_lock:
+                if not self._latency_flush_started and not self._background_stop.is_set():
+                    self._latency_flush_started = True
+                    self._start_periodic("latency-sketch-flush", self.latency_flush_seconds, 'flush_latency_sketches')
+
+    @write_route
+    def flush_latency_sketches(self) -> int:
+        """Merge the in-memory sketches into the persisted rows. Returns rows written."""
+        pending = self.latency_recorder.drain()
+        if not pending:
+            return 0
+
+        try:
+            with self.get_connection() as conn:
+                for (metric, dimension, bucket), sketch in pending.items():
+                    stored = conn.execute('''
+                        SELECT sketch FROM latency_sketches 
+                        WHERE metric = ? AND bucket_start = ? AND dimension = ?
+                    ''', (metric, bucket, dimension)).fetchone()
+                    if stored:
+                        sketch = sketch.copy()
+                        sketch.merge(DDSketch.from_bytes(stored['sketch']))
+
+                    conn.execute('''
+                        INSERT OR REPLACE INTO latency_sketches 
+                        (metric, dimension, bucket_start, sample_count, sketch)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (metric, dimension, bucket, sketch.count, sketch.to_bytes()))
+        except Exception:
+            self.latency_recorder.restore(pending)
+            raise
+        return len(pending)
+
+    def _load_latency_sketches(self, conn, metric: str, minutes: int) -> Dict[str, DDSketch]:
+        """Persisted plus not yet flushed sketches of the window, merged per dimension."""
+        since = bucket_start(time.time() - minutes * 60, self.latency_recorder.bucket_seconds)
+        rows = conn.execute('''
+            SELECT dimension, sketch FROM latency_sketches 
+            WHERE metric = ? AND bucket_start >= ?
+        ''', (metric, since)).fetchall()
+
+        merged: Dict[str, DDSketch] = {}
+        parts = [(row['dimension'], DDSketch.from_bytes(row['sketch'])) for row in rows]
+        for dimension, sketch in parts + self.latency_recorder.pending(metric, since):
+            if dimension in merged:
+                merged[dimension].merge(sketch)
+            else:
+                merged[dimension] = sketch
+        return merged
+
+    @staticmethod
+    def _latency_quantiles(sketch: Optional[DDSketch], prefix: str) -> Dict:
+        return {
+            f'{prefix}_p{int(q * 100)}_ms': (sketch.quantile(q) if sketch else None) or 0
+            for q in LATENCY_QUANTILES
+        }
+
+    @read_route
+    def get_latency_sketches(self, metric: str = 'response', minutes: int = 60) -> Dict[str, DDSketch]:
+        """Latency sketches of a window per dimension, for callers that merge several databases."""
+        with self.get_connection() as conn:
+            return self._load_latency_sketches(conn, metric, minutes)
+
+    def get_latency_percentiles(self, metric: str = 'response', dimension: str = None,
+                                minutes: int = 60) -> Dict:
+        """p50/p90/p99 of 'response' (per specialist) or 'tool' (per tool) latency over a window.
+
+        Without a dimension all dimensions are merged.
+        """
+        return self.latency_percentiles_report(
+            self.get_latency_sketches(metric, minutes), metric, dimension, minutes
+        )
+
+    @classmethod
+    def latency_percentiles_report(cls, sketches: Dict[str, DDSketch], metric: str,
+                                   dimension: Optional[str], minutes: int) -> Dict:
+        """The ``get_latency_percentiles`` result for per-dimension sketches."""
+        if dimension is not None:
+            sketch = sketches.get(dimension)
+        else:
+            sketch = merge_sketches(sketches.values())
+
+        return {
+            'metric': metric,
+            'dimension': dimension,
+            'window_minutes': minutes,
+            'count': sketch.count if sketch else 0,
+            'avg_ms': sketch.avg if sketch else None,
+            **cls._latency_quantiles(sketch, 'latency'),
+            'dimensions': sorted(sketches)
+        }
+
+    # ================================
+    # Balance Ledger
+    # ================================
+
+    def _append_balance_entry(self, conn, customer_id: str, entry_type: str, amount: float,
+                              reference: str = None, absolute: bool = False) -> int:
+        """Append a ledger entry in one statement. Returns the entry_id, or 0 for unknown customers.
+
+        ``balance_after`` is computed from the newest entry (or the compacted base
+        balance in customer_balances); with ``absolute`` the amount is the target balance.
+        """
+        cursor = conn.execute('''
+            INSERT INTO balance_ledger (customer_id, entry_type, amount, balance_after, reference)
+            SELECT ?, ?,
+                   CASE WHEN ? THEN ROUND(? - base.balance, 2) ELSE ? END,
+                   CASE WHEN ? THEN ? ELSE ROUND(base.balance + ?, 2) END,
+                   ?
+            FROM (
+                SELECT COALESCE(
+                    (SELECT balance_after FROM balance_ledger 
+                     WHERE customer_id = ? ORDER BY entry_id DESC LIMIT 1),
+                    cb.current_balance
+                ) as balance
+                FROM customer_balances cb
+                WHERE cb.customer_id = ?
+            ) base
+        ''', (customer_id, entry_type, absolute, amount, amount, absolute, amount, amount,
+              reference, customer_id, customer_id))
+        return cursor.lastrowid if cursor.rowcount > 0 else 0
+
+    def get_current_balance(self, customer_id: str) -> Optional[float]:
+        """Current balance: the newest ledger entry, or the base balance if there is none."""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT COALESCE(
+                    (SELECT balance_after FROM balance_ledger 
+                     WHERE customer_id = ? ORDER BY entry_id DESC LIMIT 1),
+                    current_balance
+                ) FROM customer_balances WHERE customer_id = ?
+            ''', (customer_id, customer_id)).fetchone()
+            return row[0] if row else None
+
+    def get_balance_at(self, customer_id: str, at: str) -> Optional[float]:
+        """Balance at a point in time ('YYYY-MM-DD HH:MM:SS', UTC).
+
+        Returns None when the time is before the retained history.
+        """
+        with self.get_connection() as conn:
+            entry = conn.execute('''
+                SELECT balance_after FROM balance_ledger
+                WHERE customer_id = ? AND created_at <= ?
+                ORDER BY entry_id DESC LIMIT 1
+            ''', (customer_id, at)).fetchone()
+            if entry:
+                return entry[0]
+
+            snapshot = conn.execute('''
+                SELECT balance FROM balance_snapshots
+                WHERE customer_id = ? AND as_of_time <= ?
+                ORDER BY as_of_entry_id DESC LIMIT 1
+            ''', (customer_id, at)).fetchone()
+            if snapshot:
+                return snapshot[0]
+
+            # Never compacted: before the first entry the balance was the base balance
+            base = conn.execute('''
+                SELECT current_balance, ledger_entry_id FROM customer_balances WHERE customer_id = ?
+            ''', (customer_id,)).fetchone()
+            if base and base['ledger_entry_id'] is None:
+                return base['current_balance']
+            return None
+
+    def get_balance_history(self, customer_id: str, limit: int = 20) -> List[Dict]:
+        """Newest ledger entries of a customer."""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT entry_id, entry_type, amount, balance_after, reference, created_at
+                FROM balance_ledger
+                WHERE customer_id = ?
+                ORDER BY entry_id DESC
+                LIMIT ?
+            ''', (customer_id, limit)).fetchall()
+            return [dict(row) for row in rows]
+
+    @write_route
+    def compact_balance_ledger(self, retain_days: int = 90) -> Dict:
+        """Snapshot balances and prune ledger entries older than the retention window.
+
+        The newest pruned entry of each customer becomes a balance_snapshots row
+        and the new base balance in customer_balances, so current-balance reads
+        and point-in-time queries stay correct.
+        """
+        cutoff = f'-{int(retain_days)} days'
+        with self.get_connection() as conn:
+            snapshots = conn.execute('''
+                SELECT bl.customer_id, bl.entry_id, bl.created_at, bl.balance_after
+                FROM balance_ledger bl
+                JOIN (
+                    SELECT customer_id, MAX(entry_id) as entry_id FROM balance_ledger
+                    WHERE created_at < datetime('now', ?)
+                    GROUP BY customer_id
+                ) last_old ON last_old.entry_id = bl.entry_id
+            ''', (cutoff,)).fetchall()
+
+            conn.executemany('''
+                INSERT OR REPLACE INTO balance_snapshots (customer_id, as_of_entry_id, as_of_time, balance)
+                VALUES (?, ?, ?, ?)
+            ''', [tuple(row) for row in snapshots])
+            conn.executemany('''
+                UPDATE customer_balances
+                SET current_balance = ?, ledger_entry_id = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE customer_id = ?
+            ''', [(row['balance_after'], row['entry_id'], row['customer_id']) for row in snapshots])
+
+            pruned = conn.execute('''
+                DELETE FROM balance_ledger WHERE created_at < datetime('now', ?)
+            ''', (cutoff,)).rowcount
+
+        logger.info(f"Balance ledger compacted: {len(snapshots)} snapshots, {pruned} entries pruned")
+        return {'snapshots': len(snapshots), 'pruned_entries': pruned}
+
+    # ================================
+    # Transcript Archive
+    # ================================
+
+    def _get_archived_session_history(self, conn, session_id: str) -> Optional[Dict]:
+        """Look a session up in the manifest and read it from its month file."""
+        if not self.archive:
+            return None
+
+        entry = conn.execute(
+            'SELECT archive_month FROM archive_manifest WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        if not entry:
+            return None
+        return self.archive.read_session(entry['archive_month'], session_id)
+
+    @write_route
+    def archive_old_sessions(self, older_than_days: int = 180, batch_size: int = 500) -> Dict:
+        """Move completed sessions older than the threshold into monthly archive files.
+
+        Transcripts are written to the archive first; the manifest rows and the
+        deletion of the hot rows then commit in one transaction, so a crash in
+        between only leaves a duplicate in the archive, never a lost session.
+        The session's error log rows travel with its transcript under ``errors``.
+        """
+        if not self.archive:
+            raise RuntimeError("Archive is not configured (archive_dir)")
+
+        summary = {'archived_sessions': 0, 'months': set()}
+        while True:
+            with self.get_connection() as conn:
+                sessions = conn.execute('''
+                    SELECT session_id, strftime('%Y-%m', start_time) as archive_month
+                    FROM call_sessions
+                    WHERE status = 'completed'
+                    AND start_time < datetime('now', ?)
+                    ORDER BY start_time
+                    LIMIT ?
+                ''', (f'-{int(older_than_days)} days', batch_size)).fetchall()
+
+            if not sessions:
+                break
+
+            by_month: Dict[str, List[Dict]] = {}
+            for row in sessions:
+                transcript = self.get_call_session_history(row['session_id'])
+                with self.get_connection() as conn:
+                    transcript['errors'] = [dict(e) for e in conn.execute('''
+                        SELECT error_type, error_message, stack_trace, severity, resolved, timestamp
+                        FROM error_logs WHERE session_id = ? ORDER BY error_id
+                    ''', (row['session_id'],))]
+                by_month.setdefault(row['archive_month'], []).append(transcript)
+            for archive_month, transcripts in by_month.items():
+                self.archive.write_sessions(archive_month, transcripts)
+                summary['months'].add(archive_month)
+
+            with self.get_connection() as conn:
+                for row in sessions:
+                    session_id = row['session_id']
+                    conn.execute('''
+                        INSERT OR REPLACE INTO archive_manifest 
+                        (session_id, customer_id, archive_month, start_time, end_time, duration_seconds,
+                         status, resolution_status, customer_satisfaction)
+                        SELECT session_id, customer_id, ?, start_time, end_time, duration_seconds,
+                               status, resolution_status, customer_satisfaction
+                        FROM call_sessions WHERE session_id = ?
+                    ''', (row['archive_month'], session_id))
+                    conn.execute('DELETE FROM call_messages WHERE session_id = ?', (session_id,))
+                    conn.execute('DELETE FROM tool_usage_logs WHERE session_id = ?', (session_id,))
+                    conn.execute('DELETE FROM error_logs WHERE session_id = ?', (session_id,))
+                    conn.execute('DELETE FROM session_transcripts WHERE session_id = ?', (session_id,))
+                    conn.execute('DELETE FROM call_sessions WHERE session_id = ?', (session_id,))
+
+            summary['archived_sessions'] += len(sessions)
+
+        summary['months'] = sorted(summary['months'])
+        logger.info(f"Archived {summary['archived_sessions']} sessions into {summary['months']}")
+        return summary
 
     # ================================
     # Maintenance and Utilities
     # ================================
     
+    @write_route
     def cleanup_old_logs(self, days_to_keep: int = 90) -> int:
         """Clean up old call logs and messages."""
         with self.get_connection() as conn:
@@ -644,13 +1990,38 @@ class CallCenterDatabase:
                 conn.execute('DELETE FROM call_messages WHERE session_id = ?', (session_id,))
                 conn.execute('DELETE FROM tool_usage_logs WHERE session_id = ?', (session_id,))
                 conn.execute('DELETE FROM error_logs WHERE session_id = ?', (session_id,))
+                conn.execute('DELETE FROM session_transcripts WHERE session_id = ?', (session_id,))
                 conn.execute('DELETE FROM call_sessions WHERE session_id = ?', (session_id,))
                 
                 deleted_count += 1
             
+            conn.execute('''
+                DELETE FROM error_counts_hourly WHERE hour < datetime('now', '-{} days')
+            '''.format(days_to_keep))
+            conn.execute('''
+                DELETE FROM tool_usage_minutely WHERE minute < datetime('now', '-{} days')
+            '''.format(days_to_keep))
+            conn.execute('''
+                DELETE FROM latency_sketches WHERE bucket_start < datetime('now', '-{} days')
+            '''.format(days_to_keep))
+            # change_outbox is pruned by prune_change_outbox, which respects consumer offsets
+            
             logger.info(f"Cleaned up {deleted_count} old call sessions")
             return deleted_count
 
+    def refresh_reporting_replica(self) -> bool:
+        """Refresh the snapshot file used by reporting queries, if one is configured."""
+        if not self.read_pool:
+            return False
+        return self.read_pool.refresh_replica()
+
+    def close(self):
+        """Flush latency sketches, stop background threads and release pooled connections."""
+        self._background_stop.set()
+        self.flush_latency_sketches()
+        if self.read_pool:
+            self.read_pool.close()
+
     def backup_database(self, backup_path: str = None) -> str:
         """Create database backup."""
         if not backup_path:
@@ -661,10 +2032,16 @@ class CallCenterDatabase:
             backup_conn = sqlite3.connect(backup_path)
             conn.backup(backup_conn)
             backup_conn.close()
+
+            if self.log_db_path:
+                logs_backup_conn = sqlite3.connect(f"{Path(backup_path).with_suffix('')}_logs.db")
+                conn.backup(logs_backup_conn, name='logs')
+                logs_backup_conn.close()
         
         logger.info(f"Database backed up to: {backup_path}")
         return backup_path
 
+    @read_route
     def get_database_stats(self) -> Dict:
         """Get database statistics."""
         with self.get_connection() as conn:
@@ -672,7 +2049,8 @@ class CallCenterDatabase:
             
             # Table row counts
             tables = ['customers', 'packages', 'call_sessions', 'call_messages', 
-                     'tool_usage_logs', 'bills', 'usage_stats', 'error_logs']
+                     'tool_usage_logs', 'bills', 'usage_stats', 'error_logs', 'session_transcripts',
+                     'error_fingerprints', 'balance_ledger']
             
             for table in tables:
                 count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
@@ -680,6 +2058,8 @@ class CallCenterDatabase:
             
             # Database file size
             stats['db_size_mb'] = Path(self.db_path).stat().st_size / (1024 * 1024)
+            if self.log_db_path:
+                stats['log_db_size_mb'] = Path(self.log_db_path).stat().st_size / (1024 * 1024)
             
             # Recent activity
             recent_calls = conn.execute('''
@@ -718,20 +2098,42 @@ class CallCenterDatabase:
             
             return result
 
+    @write_route
     def change_customer_package(self, customer_id: str, new_package_name: str) -> bool:
         """Change customer's package."""
+        return self.change_package_checked(customer_id, new_package_name)['ok']
+
+    @write_route
+    def change_package_checked(self, customer_id: str, new_package_name: str) -> Dict:
+        """Validate and change the package in one write transaction.
+
+        Returns ``{'ok', 'code', ...}`` with ``code`` one of RESULT_OK,
+        RESULT_UNCHANGED (already on that package), RESULT_CUSTOMER_NOT_FOUND
+        or RESULT_PACKAGE_NOT_FOUND.
+        """
         with self.get_connection() as conn:
-            # Get new package ID
-            package_result = conn.execute(
-                'SELECT package_id FROM packages WHERE package_name = ? AND is_active = TRUE',
-                (new_package_name,)
-            ).fetchone()
-            
-            if not package_result:
-                return False
-            
-            package_id = package_result[0]
-            
+            # Take the write lock before validating so the checks cannot go stale
+            conn.execute('BEGIN IMMEDIATE')
+            state = conn.execute('''
+                SELECT c.customer_id IS NOT NULL as customer_found,
+                       p.package_id, cs.package_id as current_package_id,
+                       cp.package_name as previous_package
+                FROM (SELECT 1)
+                LEFT JOIN customers c ON c.customer_id = ? AND c.status = 'active'
+                LEFT JOIN packages p ON p.package_name = ? AND p.is_active = TRUE
+                LEFT JOIN customer_subscriptions cs ON cs.customer_id = c.customer_id AND cs.status = 'active'
+                LEFT JOIN packages cp ON cp.package_id = cs.package_id
+            ''', (customer_id, new_package_name)).fetchone()
+
+            result = {'customer_id': customer_id, 'package_name': new_package_name,
+                      'previous_package': state['previous_package']}
+            if not state['customer_found']:
+                return {**result, 'ok': False, 'code': RESULT_CUSTOMER_NOT_FOUND}
+            if state['package_id'] is None:
+                return {**result, 'ok': False, 'code': RESULT_PACKAGE_NOT_FOUND}
+            if state['current_package_id'] == state['package_id']:
+                return {**result, 'ok': True, 'code': RESULT_UNCHANGED}
+
             # End current subscription
             conn.execute('''
                 UPDATE customer_subscriptions 
@@ -740,13 +2142,195 @@ class CallCenterDatabase:
             ''', (customer_id,))
             
             # Create new subscription
-            conn.execute('''
+            cursor = conn.execute('''
                 INSERT INTO customer_subscriptions 
                 (customer_id, package_id, start_date)
                 VALUES (?, ?, DATE('now'))
-            ''', (customer_id, package_id))
-            
-            return True
+            ''', (customer_id, state['package_id']))
+            
+            return {**result, 'ok': True, 'code': RESULT_OK, 'subscription_id': cursor.lastrowid}
+
+    # Usage filters accepted by migrate_package_cohort, mapped to usage_stats conditions
+    COHORT_USAGE_FILTERS = {
+        'min_data_mb': 'us.data_mb >= ?',
+        'max_data_mb': 'us.data_mb <= ?',
+        'min_calls_minutes': 'us.calls_minutes >= ?',
+        'max_calls_minutes': 'us.calls_minutes <= ?',
+        'min_sms_count': 'us.sms_count >= ?',
+        'max_sms_count': 'us.sms_count <= ?',
+    }
+
+    def _select_package_cohort(self, conn, target_package_id: int, customer_ids: List[str] = None,
+                               from_package_name: str = None, usage_filter: Dict = None) -> Tuple[str, list]:
+        """SELECT (customer_id, previous_package_id) of the cohort; explicit ids are read from temp.cohort_ids."""
+        joins = []
+        conditions = ["c.status = 'active'", "COALESCE(cs.package_id, -1) != ?"]
+        params: list = [target_package_id]
+
+        if customer_ids is not None:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS cohort_ids (customer_id VARCHAR(10) PRIMARY KEY)')
+            conn.execute('DELETE FROM temp.cohort_ids')
+            conn.executemany('INSERT OR IGNORE INTO temp.cohort_ids VALUES (?)', [(cid,) for cid in customer_ids])
+            joins.append('JOIN temp.cohort_ids ids ON ids.customer_id = c.customer_id')
+
+        if from_package_name:
+            joins.append('JOIN packages fp ON fp.package_id = cs.package_id AND fp.package_name = ?')
+            params.insert(0, from_package_name)
+
+        if usage_filter:
+            unknown = set(usage_filter) - set(self.COHORT_USAGE_FILTERS) - {'usage_month'}
+            if unknown:
+                raise ValueError(f"Unknown usage filter: {sorted(unknown)}")
+            month = usage_filter.get('usage_month') or datetime.now().strftime('%Y-%m')
+            joins.append('JOIN usage_stats us ON us.customer_id = c.customer_id AND us.usage_month = ?')
+            params.insert(len(params) - 1, month)
+            for key, condition in self.COHORT_USAGE_FILTERS.items():
+                if key in usage_filter:
+                    conditions.append(condition)
+                    params.append(usage_filter[key])
+
+        query = f'''
+            SELECT c.customer_id, cs.package_id as previous_package_id
+            FROM customers c
+            LEFT JOIN customer_subscriptions cs ON cs.customer_id = c.customer_id AND cs.status = 'active'
+            {' '.join(joins)}
+            WHERE {' AND '.join(conditions)}
+        '''
+        return query, params
+
+    @write_route
+    def migrate_package_cohort(self, target_package_name: str, customer_ids: List[str] = None,
+                               from_package_name: str = None, usage_filter: Dict = None,
+                               chunk_size: int = 1000, dry_run: bool = False,
+                               migration_id: str = None) -> Dict:
+        """Move a cohort of customers to another package in chunked set-based statements.
+
+        The cohort is an explicit list of customer ids and/or a filter on the
+        current package and on usage_stats (see ``COHORT_USAGE_FILTERS``).
+        ``dry_run`` only counts the cohort. A real run freezes the cohort in
+        package_migration_members and commits each chunk together with its
+        checkpoint, so an interrupted run is resumed by passing its migration_id.
+        """
+        started = time.time()
+        with self.get_connection() as conn:
+            target = conn.execute(
+                'SELECT package_id FROM packages WHERE package_name = ? AND is_active = TRUE',
+                (target_package_name,)
+            ).fetchone()
+            if not target:
+                raise ValueError(f"Unknown or inactive package: {target_package_name}")
+            target_package_id = target[0]
+
+            existing = conn.execute(
+                'SELECT * FROM package_migrations WHERE migration_id = ?', (migration_id,)
+            ).fetchone() if migration_id else None
+
+            if existing and existing['target_package_id'] != target_package_id:
+                raise ValueError(f"Migration {migration_id} targets another package")
+
+            if dry_run or not existing:
+                query, params = self._select_package_cohort(
+                    conn, target_package_id, customer_ids, from_package_name, usage_filter
+                )
+                if dry_run:
+                    breakdown = conn.execute(f'''
+                        SELECT COALESCE(p.package_name, '-') as package_name, COUNT(*) as customers
+                        FROM ({query}) cohort
+                        LEFT JOIN packages p ON p.package_id = cohort.previous_package_id
+                        GROUP BY p.package_name
+                        ORDER BY customers DESC
+                    ''', params).fetchall()
+                    by_package = {row['package_name']: row['customers'] for row in breakdown}
+                    return {
+                        'dry_run': True,
+                        'target_package': target_package_name,
+                        'total_customers': sum(by_package.values()),
+                        'by_previous_package': by_package,
+                        'chunks': -(-sum(by_package.values()) // chunk_size),
+                    }
+
+                migration_id = migration_id or str(uuid.uuid4())
+                frozen = conn.execute(f'''
+                    INSERT INTO package_migration_members (migration_id, customer_id, previous_package_id)
+                    SELECT ?, customer_id, previous_package_id FROM ({query})
+                ''', [migration_id] + params).rowcount
+                conn.execute('''
+                    INSERT INTO package_migrations (migration_id, target_package_id, total_customers)
+                    VALUES (?, ?, ?)
+                ''', (migration_id, target_package_id, frozen))
+                logger.info(f"Package migration {migration_id}: {frozen} customers -> {target_package_name}")
+
+        chunks = 0
+        while True:
+            with self.get_connection() as conn:
+                checkpoint = conn.execute(
+                    'SELECT last_customer_id FROM package_migrations WHERE migration_id = ?', (migration_id,)
+                ).fetchone()
+                conn.execute('CREATE TEMP TABLE IF NOT EXISTS migration_chunk (customer_id VARCHAR(10) PRIMARY KEY)')
+                conn.execute('DELETE FROM temp.migration_chunk')
+                moved = conn.execute('''
+                    INSERT INTO temp.migration_chunk (customer_id)
+                    SELECT customer_id FROM package_migration_members
+                    WHERE migration_id = ? AND customer_id > ?
+                    ORDER BY customer_id
+                    LIMIT ?
+                ''', (migration_id, checkpoint['last_customer_id'], chunk_size)).rowcount
+
+                if not moved:
+                    conn.execute('''
+                        UPDATE package_migrations SET status = 'completed', updated_at = CURRENT_TIMESTAMP
+                        WHERE migration_id = ?
+                    ''', (migration_id,))
+                    break
+
+                conn.execute('''
+                    UPDATE customer_subscriptions 
+                    SET status = 'cancelled', end_date = DATE('now')
+                    WHERE status = 'active' 
+                    AND customer_id IN (SELECT customer_id FROM temp.migration_chunk)
+                ''')
+                conn.execute('''
+                    INSERT INTO customer_subscriptions (customer_id, package_id, start_date)
+                    SELECT customer_id, ?, DATE('now') FROM temp.migration_chunk
+                ''', (target_package_id,))
+                conn.execute('''
+                    UPDATE package_migrations
+                    SET migrated_customers = migrated_customers + ?,
+                        last_customer_id = (SELECT MAX(customer_id) FROM temp.migration_chunk),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE migration_id = ?
+                ''', (moved, migration_id))
+                chunks += 1
+
+        summary = self.get_package_migration(migration_id)
+        summary['chunks_this_run'] = chunks
+        summary['elapsed_seconds'] = round(time.time() - started, 3)
+        logger.info(f"Package migration {migration_id} finished: {summary['migrated_customers']} customers")
+        return summary
+
+    def get_package_migration(self, migration_id: str) -> Optional[Dict]:
+        """Progress of a bulk package migration with a per-previous-package breakdown."""
+        with self.get_connection() as conn:
+            migration = conn.execute('''
+                SELECT m.*, p.package_name as target_package
+                FROM package_migrations m
+                JOIN packages p ON p.package_id = m.target_package_id
+                WHERE m.migration_id = ?
+            ''', (migration_id,)).fetchone()
+            if not migration:
+                return None
+
+            breakdown = conn.execute('''
+                SELECT COALESCE(p.package_name, '-') as package_name, COUNT(*) as customers
+                FROM package_migration_members mm
+                LEFT JOIN packages p ON p.package_id = mm.previous_package_id
+                WHERE mm.migration_id = ?
+                GROUP BY p.package_name
+            ''', (migration_id,)).fetchall()
+
+            summary = dict(migration)
+            summary['by_previous_package'] = {row['package_name']: row['customers'] for row in breakdown}
+            return summary
 
     def get_customer_bills(self, customer_id: str) -> List[Dict]:
         """Get customer billing information."""
@@ -761,36 +2345,59 @@ class CallCenterDatabase:
             result = conn.execute(query, (customer_id,)).fetchall()
             return [dict(bill) for bill in result]
 
+    @write_route
     def pay_bill(self, customer_id: str, bill_month: str, amount: float, payment_method: str = 'online') -> bool:
         """Process bill payment."""
+        return self.pay_bill_checked(customer_id, bill_month, amount, payment_method)['ok']
+
+    @write_route
+    def pay_bill_checked(self, customer_id: str, bill_month: str, amount: float,
+                         payment_method: str = 'online') -> Dict:
+        """Validate and pay a bill in one transaction.
+
+        The bill is claimed by a single conditional UPDATE, so two concurrent
+        payments cannot both succeed. Only when it matches nothing is the state
+        read back to pick the code: RESULT_CUSTOMER_NOT_FOUND,
+        RESULT_BILL_NOT_FOUND, RESULT_ALREADY_PAID or RESULT_AMOUNT_MISMATCH.
+        """
+        result = {'customer_id': customer_id, 'bill_month': bill_month}
         with self.get_connection() as conn:
-            # Check if bill exists and unpaid
             bill = conn.execute('''
-                SELECT bill_id, amount FROM bills
-                WHERE customer_id = ? AND bill_month = ? AND is_paid = FALSE
-            ''', (customer_id, bill_month)).fetchone()
-            
-            if not bill:
-                return False
-            
-            if abs(bill['amount'] - amount) > 0.01:
-                return False
-            
-            # Update bill as paid
-            conn.execute('''
                 UPDATE bills
                 SET is_paid = TRUE, paid_date = CURRENT_TIMESTAMP, payment_method = ?
-                WHERE customer_id = ? AND bill_month = ?
-            ''', (payment_method, customer_id, bill_month))
-            
-            # Update customer balance
-            conn.execute('''
-                UPDATE customer_balances
-                SET current_balance = current_balance - ?, last_updated = CURRENT_TIMESTAMP
-                WHERE customer_id = ?
-            ''', (amount, customer_id))
-            
-            return True
+                WHERE customer_id = ? AND bill_month = ? AND is_paid = FALSE
+                AND abs(amount - ?) <= 0.01
+                AND customer_id IN (SELECT customer_id FROM customers WHERE status = 'active')
+                RETURNING bill_id, amount
+            ''', (payment_method, customer_id, bill_month, amount)).fetchone()
+
+            if bill:
+                # Update customer balance
+                entry_id = self._append_balance_entry(conn, customer_id, 'payment', -amount,
+                                                      reference=f"bill:{bill_month}:{payment_method}")
+                balance = conn.execute(
+                    'SELECT balance_after FROM balance_ledger WHERE entry_id = ?', (entry_id,)
+                ).fetchone()
+                return {**result, 'ok': True, 'code': RESULT_OK, 'bill_id': bill['bill_id'],
+                        'amount': bill['amount'], 'balance_after': balance[0] if balance else None}
+
+            state = conn.execute('''
+                SELECT c.customer_id IS NOT NULL as customer_found, b.bill_id, b.is_paid, b.amount
+                FROM (SELECT 1)
+                LEFT JOIN customers c ON c.customer_id = ? AND c.status = 'active'
+                LEFT JOIN bills b ON b.customer_id = c.customer_id AND b.bill_month = ?
+            ''', (customer_id, bill_month)).fetchone()
+
+        if not state['customer_found']:
+            code = RESULT_CUSTOMER_NOT_FOUND
+        elif state['bill_id'] is None:
+            code = RESULT_BILL_NOT_FOUND
+        elif state['is_paid']:
+            code = RESULT_ALREADY_PAID
+        else:
+            code = RESULT_AMOUNT_MISMATCH
+            result['bill_amount'] = state['amount']
+        return {**result, 'ok': False, 'code': code}
 
     def get_customer_usage_stats(self, customer_id: str, month: str = None) -> Optional[Dict]:
         """Get customer usage statistics."""
@@ -814,6 +2421,7 @@ class CallCenterDatabase:
             
             return dict(result) if result else None
 
+    @write_route
     def create_customer(self, customer_id: str, name: str, phone: str = None, 
                        email: str = None, address: str = None) -> bool:
         """Create a new customer."""
@@ -836,6 +2444,7 @@ class CallCenterDatabase:
                 logger.error(f"Error creating customer {customer_id}: {e}")
                 return False
 
+    @write_route
     def update_customer_info(self, customer_id: str, **kwargs) -> bool:
         """Update customer information."""
         with self.get_connection() as conn:
@@ -865,37 +2474,30 @@ class CallCenterDatabase:
                 logger.error(f"Error updating customer {customer_id}: {e}")
                 return False
 
+    @write_route
     def update_customer_balance(self, customer_id: str, amount: float, operation: str = 'add') -> bool:
         """Update customer balance (add or subtract)."""
         with self.get_connection() as conn:
             try:
                 if operation == 'add':
-                    conn.execute('''
-                        UPDATE customer_balances
-                        SET current_balance = current_balance + ?, last_updated = CURRENT_TIMESTAMP
-                        WHERE customer_id = ?
-                    ''', (amount, customer_id))
+                    appended = self._append_balance_entry(conn, customer_id, 'adjustment', amount)
                 elif operation == 'subtract':
-                    conn.execute('''
-                        UPDATE customer_balances
-                        SET current_balance = current_balance - ?, last_updated = CURRENT_TIMESTAMP
-                        WHERE customer_id = ?
-                    ''', (amount, customer_id))
+                    appended = self._append_balance_entry(conn, customer_id, 'adjustment', -amount)
                 elif operation == 'set':
-                    conn.execute('''
-                        UPDATE customer_balances
-                        SET current_balance = ?, last_updated = CURRENT_TIMESTAMP
-                        WHERE customer_id = ?
-                    ''', (amount, customer_id))
+                    appended = self._append_balance_entry(conn, customer_id, 'set', amount, absolute=True)
                 else:
                     return False
                 
+                if not appended:
+                    return False
+                
                 logger.info(f"Balance updated for {customer_id}: {operation} {amount}")
                 return True
             except Exception as e:
                 logger.error(f"Error updating balance for {customer_id}: {e}")
                 return False
 
+    @write_route
     def create_bill(self, customer_id: str, bill_month: str, amount: float, due_date: str) -> bool:
         """Create a new bill for customer."""
         with self.get_connection() as conn:
@@ -911,6 +2513,7 @@ class CallCenterDatabase:
                 logger.error(f"Error creating bill for {customer_id}: {e}")
                 return False
 
+    @write_route
     def update_usage_stats(self, customer_id: str, usage_month: str, 
                           calls_minutes: int = None, data_mb: int = None, 
                           sms_count: int = None, extra_charges: float = None) -> bool:
@@ -980,6 +2583,7 @@ class CallCenterDatabase:
             
             return [dict(customer) for customer in results]
 
+    @read_route
     def get_unpaid_bills(self, customer_id: str = None) -> List[Dict]:
         """Get unpaid bills for a customer or all customers."""
         with self.get_connection() as conn:
@@ -1004,22 +2608,252 @@ class CallCenterDatabase:
             
             return [dict(bill) for bill in results]
 
+    @read_route
     def get_overdue_bills(self, days_overdue: int = 0) -> List[Dict]:
-        """Get overdue bills."""
+        """Get overdue bills (read from the collections queue, oldest due date first)."""
         with self.get_connection() as conn:
             query = '''
                 SELECT b.*, c.name as customer_name,
                        julianday('now') - julianday(b.due_date) as days_overdue
-                FROM bills b
+                FROM collections_queue q
+                JOIN bills b ON b.customer_id = q.customer_id AND b.bill_month = q.bill_month
                 JOIN customers c ON b.customer_id = c.customer_id
-                WHERE b.is_paid = FALSE 
-                AND julianday('now') - julianday(b.due_date) > ?
-                ORDER BY days_overdue DESC
+                WHERE q.due_date < DATE('now', ?)
+                ORDER BY q.due_date
             '''
             
-            results = conn.execute(query, (days_overdue,)).fetchall()
+            results = conn.execute(query, (f'-{int(days_overdue)} days',)).fetchall()
             return [dict(bill) for bill in results]
 
+    # ================================
+    # Collections Queue
+    # ================================
+
+    @write_route
+    def claim_collection_items(self, worker_id: str, batch_size: int = 20,
+                               lease_seconds: int = 900) -> List[Dict]:
+        """Atomically lease the most urgent unclaimed overdue items to a worker."""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                UPDATE collections_queue
+                SET claimed_by = ?, claimed_until = datetime('now', ?), attempts = attempts + 1
+                WHERE (customer_id, bill_month) IN (
+                    SELECT customer_id, bill_month FROM collections_queue
+                    WHERE due_date < DATE('now')
+                    AND (claimed_until IS NULL OR claimed_until < CURRENT_TIMESTAMP)
+                    ORDER BY priority, due_date
+                    LIMIT ?
+                )
+                RETURNING customer_id, bill_month, amount, due_date, priority, attempts, claimed_until
+            ''', (worker_id, f'+{int(lease_seconds)} seconds', batch_size)).fetchall()
+
+        items = sorted((dict(row) for row in rows), key=lambda item: (item['priority'], item['due_date']))
+        logger.info(f"Collections: {len(items)} items claimed by {worker_id}")
+        return items
+
+    @write_route
+    def complete_collection_item(self, customer_id: str, bill_month: str, worker_id: str,
+                                 outcome: str, retry_after_hours: int = 24) -> bool:
+        """Record a worked item; it becomes claimable again after the retry delay unless the bill is paid."""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE collections_queue
+                SET claimed_by = NULL, claimed_until = datetime('now', ?),
+                    last_worked_at = CURRENT_TIMESTAMP, last_outcome = ?
+                WHERE customer_id = ? AND bill_month = ? AND claimed_by = ?
+            ''', (f'+{int(retry_after_hours)} hours', outcome, customer_id, bill_month, worker_id))
+            return cursor.rowcount > 0
+
+    @read_route
+    def get_collections_page(self, limit: int = 50, cursor: str = None) -> Dict:
+        """Keyset-paginated overdue items in queue order.
+
+        ``cursor`` is the ``next_cursor`` of the previous page
+        (``priority|due_date|customer_id|bill_month``). Raises ValueError for a
+        malformed cursor.
+        """
+        after = None
+        if cursor:
+            after = cursor.split('|')
+            if len(after) != 4:
+                raise ValueError(f"Invalid collections cursor: {cursor!r}")
+            after[0] = int(after[0])
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT q.*, c.name as customer_name,
+                       julianday('now') - julianday(q.due_date) as days_overdue
+                FROM collections_queue q
+                JOIN customers c ON c.customer_id = q.customer_id
+                WHERE q.due_date < DATE('now')
+                {'AND (q.priority, q.due_date, q.customer_id, q.bill_month) > (?, ?, ?, ?)' if after else ''}
+                ORDER BY q.priority, q.due_date, q.customer_id, q.bill_month
+                LIMIT ?
+            ''', (after or []) + [limit]).fetchall()
+
+        items = [dict(row) for row in rows]
+        next_cursor = None
+        if len(items) == limit:
+            last = items[-1]
+            next_cursor = f"{last['priority']}|{last['due_date']}|{last['customer_id']}|{last['bill_month']}"
+        return {'items': items, 'next_cursor': next_cursor}
+
+    @read_route
+    def get_collections_summary(self) -> List[Dict]:
+        """Overdue item counts and amounts per priority, split by claim state."""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT priority,
+                       COUNT(*) as items,
+                       SUM(amount) as total_amount,
+                       COUNT(CASE WHEN claimed_until >= CURRENT_TIMESTAMP THEN 1 END) as claimed_or_snoozed,
+                       MIN(due_date) as oldest_due_date
+                FROM collections_queue
+                WHERE due_date < DATE('now')
+                GROUP BY priority
+                ORDER BY priority
+            ''').fetchall()
+            return [dict(row) for row in rows]
+
+    # ================================
+    # Change Feed
+    # ================================
+
+    @read_route
+    def read_changes(self, consumer: str, limit: int = 500, tables: List[str] = None,
+                     after_seq: int = None) -> Dict:
+        """Outbox entries after the consumer's committed offset, in sequence order.
+
+        Reading does not move the offset; call ``commit_change_offset`` with
+        ``next_offset`` once the batch has been processed. An unknown consumer
+        is registered first, so like ``register_change_consumer`` it starts at
+        the current end of the outbox. In-memory consumers that track their own
+        position pass ``after_seq`` instead; they are not protected from
+        pruning and must compare ``first_available_seq`` (the oldest entry still
+        stored, or the next one to be written) with ``offset + 1`` to notice
+        entries that were pruned before they read them.
+        """
+        offset = after_seq
+        if offset is None:
+            with self.get_connection() as conn:
+                row = conn.execute('SELECT last_seq FROM change_consumers WHERE consumer = ?', (consumer,)).fetchone()
+            offset = row['last_seq'] if row else self.register_change_consumer(consumer)
+
+        with self.get_connection() as conn:
+            table_filter = ''
+            params = [offset]
+            if tables:
+                table_filter = f"AND table_name IN ({', '.join('?' * len(tables))})"
+                params.extend(tables)
+            rows = conn.execute(f'''
+                SELECT seq, table_name, operation, row_key, payload, changed_at
+                FROM change_outbox
+                WHERE seq > ? {table_filter}
+                ORDER BY seq
+                LIMIT ?
+            ''', params + [limit]).fetchall()
+            first_available_seq = conn.execute('''
+                SELECT COALESCE(
+                    (SELECT MIN(seq) FROM change_outbox),
+                    (SELECT seq FROM sqlite_sequence WHERE name = 'change_outbox'),
+                    0) + CASE WHEN EXISTS (SELECT 1 FROM change_outbox) THEN 0 ELSE 1 END
+            ''').fetchone()[0]
+
+        changes = []
+        for row in rows:
+            change = dict(row)
+            change['payload'] = json.loads(change['payload']) if change['payload'] else None
+            changes.append(change)
+        return {
+            'consumer': consumer,
+            'offset': offset,
+            'changes': changes,
+            'next_offset': changes[-1]['seq'] if changes else offset,
+            'has_more': len(changes) == limit,
+            'first_available_seq': first_available_seq,
+        }
+
+    @write_route
+    def read_primary_changes(self, consumer: str, limit: int = 500, tables: List[str] = None,
+                             after_seq: int = None) -> Dict:
+        """``read_changes`` against the primary file, for consumers that must not lag behind a replica."""
+        return CallCenterDatabase.read_changes.__wrapped__(self, consumer, limit, tables, after_seq)
+
+    @write_route
+    def register_change_consumer(self, consumer: str, from_latest: bool = True) -> int:
+        """Register a consumer (idempotent). New consumers start at the current end of the
+        outbox unless ``from_latest`` is False. Returns the consumer's offset."""
+        with self.get_connection() as conn:
+            start = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_outbox').fetchone()[0] if from_latest else 0
+            conn.execute(
+                'INSERT OR IGNORE INTO change_consumers (consumer, last_seq) VALUES (?, ?)', (consumer, start)
+            )
+            return conn.execute('SELECT last_seq FROM change_consumers WHERE consumer = ?', (consumer,)).fetchone()[0]
+
+    @write_route
+    def commit_change_offset(self, consumer: str, seq: int) -> bool:
+        """Record that a consumer has processed everything up to ``seq``. Offsets never move back."""
+        with self.get_connection() as conn:
+            conn.execute('''
+                INSERT INTO change_consumers (consumer, last_seq) VALUES (?, ?)
+                ON CONFLICT(consumer) DO UPDATE SET
+                    last_seq = MAX(last_seq, excluded.last_seq),
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (consumer, seq))
+            return True
+
+    @write_route
+    def prune_change_outbox(self, max_age_days: int = None) -> int:
+        """Delete entries every registered consumer has committed, plus (optionally)
+        entries older than ``max_age_days`` regardless of consumer lag."""
+        with self.get_connection() as conn:
+            consumed = conn.execute('SELECT MIN(last_seq) FROM change_consumers').fetchone()[0]
+            deleted = 0
+            if consumed:
+                deleted += conn.execute('DELETE FROM change_outbox WHERE seq <= ?', (consumed,)).rowcount
+            if max_age_days is not None:
+                deleted += conn.execute(
+                    "DELETE FROM change_outbox WHERE changed_at < datetime('now', ?)", (f'-{int(max_age_days)} days',)
+                ).rowcount
+
+        if deleted:
+            logger.info(f"Pruned {deleted} change outbox entries")
+        return deleted
+
+    @read_route
+    def get_change_feed_status(self) -> Dict:
+        """Outbox bounds and the lag of every registered consumer."""
+        with self.get_connection() as conn:
+            # latest_seq survives pruning: an emptied outbox reports the last seq ever written
+            bounds = conn.execute('''
+                SELECT MIN(seq) as oldest_seq,
+                       COALESCE(MAX(seq), (SELECT seq FROM sqlite_sequence WHERE name = 'change_outbox')) as latest_seq,
+                       COUNT(*) as entries
+                FROM change_outbox
+            ''').fetchone()
+            latest = bounds['latest_seq'] or 0
+            consumers = [
+                {**dict(row), 'lag': max(latest - row['last_seq'], 0)}
+                for row in conn.execute('SELECT consumer, last_seq, updated_at FROM change_consumers ORDER BY consumer')
+            ]
+        return {**dict(bounds), 'consumers': consumers}
+
+    # ================================
+    # Data Versions
+    # ================================
+
+    def get_data_version(self, scope: str) -> Optional[Dict]:
+        """Version stamp of a data scope ('packages', 'bills:<id>', 'usage:<id>').
+
+        Scopes without any rows yet report version 0 and no ``updated_at``.
+        Read from the primary so the stamp is never older than the data the
+        service reads.
+        """
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT version, updated_at FROM data_versions WHERE scope = ?', (scope,)).fetchone()
+        return {'scope': scope, 'version': row['version'], 'updated_at': row['updated_at']} if row else \
+            {'scope': scope, 'version': 0, 'updated_at': None}
+
+    @read_route
     def get_monthly_revenue(self, year_month: str = None) -> Dict:
         """Get monthly revenue statistics."""
         with self.get_connection() as conn:
@@ -1041,6 +2875,7 @@ class CallCenterDatabase:
             result = conn.execute(query, (year_month,)).fetchone()
             return dict(result) if result else {}
 
+    @read_route
     def get_package_statistics(self) -> List[Dict]:
         """Get package subscription statistics."""
         with self.get_connection() as conn:
@@ -1061,6 +2896,7 @@ class CallCenterDatabase:
             results = conn.execute(query).fetchall()
             return [dict(stat) for stat in results]
 
+    @read_route
     def get_customer_lifetime_value(self, customer_id: str) -> Dict:
         """Calculate customer lifetime value."""
         with self.get_connection() as conn:
@@ -1087,6 +2923,7 @@ class CallCenterDatabase:
                 return data
             
             return {}
+    @read_route
     def get_system_health(self) -> Dict:
         """Get system health metrics."""
         with self.get_connection() as conn:
@@ -1096,36 +2933,31 @@ class CallCenterDatabase:
                 WHERE start_time >= datetime('now', '-24 hours')
             ''').fetchone()[0]
             
-            recent_errors = conn.execute('''
-                SELECT COUNT(*) FROM error_logs 
-                WHERE timestamp >= datetime('now', '-24 hours')
-                AND severity IN ('high', 'critical')
-            ''').fetchone()[0]
+            recent_errors, top_errors = self._get_recent_error_summary(conn)
             
             active_sessions = conn.execute('''
                 SELECT COUNT(*) FROM call_sessions 
                 WHERE status = 'active'
             ''').fetchone()[0]
             
-            avg_response_time = conn.execute('''
-                SELECT AVG(processing_time_ms) FROM call_messages
-                WHERE timestamp >= datetime('now', '-1 hour')
-                AND processing_time_ms IS NOT NULL
-            ''').fetchone()[0]
+            response_latency = merge_sketches(self._load_latency_sketches(conn, 'response', 60).values())
+            avg_response_time = response_latency.avg if response_latency else None
             
             # Tool success rate
             tool_success_rate = conn.execute('''
                 SELECT 
-                    (COUNT(CASE WHEN success = 1 THEN 1 END) * 100.0 / COUNT(*)) as success_rate
-                FROM tool_usage_logs
-                WHERE timestamp >= datetime('now', '-24 hours')
+                    (SUM(success_count) * 100.0 / SUM(call_count)) as success_rate
+                FROM tool_usage_minutely
+                WHERE minute >= strftime('%Y-%m-%d %H:%M:00', 'now', '-24 hours')
             ''').fetchone()[0]
             
             return {
                 'recent_calls_24h': recent_calls,
                 'recent_errors_24h': recent_errors,
+                'top_errors_24h': top_errors,
                 'active_sessions': active_sessions,
                 'avg_response_time_ms': avg_response_time or 0,
+                **self._latency_quantiles(response_latency, 'response_time'),
                 'tool_success_rate': tool_success_rate or 0,
                 'status': 'healthy' if recent_errors < 10 else 'warning'
             }
@@ -1149,12 +2981,13 @@ class CallSessionManager:
         return self.current_session_id
 
     def log_message(self, role: str, content: str, tool_call: str = None, 
-                   tool_result: str = None, processing_time_ms: int = None):
+                   tool_result: str = None, processing_time_ms: int = None,
+                   specialist: str = None):
         """Log a message in current session."""
         if self.current_session_id:
             self.db.add_call_message(
                 self.current_session_id, role, content, 'text',
-                tool_call, tool_result, processing_time_ms
+                tool_call, tool_result, processing_time_ms, specialist
             )
 
     def log_tool_usage(self, tool_name: str, parameters: Dict, result: str, 
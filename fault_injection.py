@@ -0,0 +1,216 @@
+# fault_injection.py
+import json
+import math
+import random
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("fault_injection")
+
+
+class InjectedFault(Exception):
+    """Raised by ``FaultInjector.apply`` when a simulated failure is drawn."""
+
+    def __init__(self, route: str, status_code: int = 503):
+        super().__init__(f"Injected failure on {route}")
+        self.route = route
+        self.status_code = status_code
+
+
+@dataclass
+class RouteFaultProfile:
+    """Latency and failure behaviour of one route (or the default for all routes).
+
+    ``distribution`` is ``'fixed'`` (always ``min_ms``), ``'uniform'``
+    (between ``min_ms`` and ``max_ms``) or ``'lognormal'`` (median
+    ``median_ms``, spread ``sigma``, clamped to ``[min_ms, max_ms]``). With
+    probability ``slow_tail_probability`` the delay is replaced by a value
+    between ``slow_tail_min_ms`` and ``slow_tail_max_ms``.
+    """
+    distribution: str = 'uniform'
+    min_ms: float = 0.0
+    max_ms: float = 0.0
+    median_ms: float = 100.0
+    sigma: float = 0.5
+    failure_rate: float = 0.0
+    failure_status: int = 503
+    slow_tail_probability: float = 0.0
+    slow_tail_min_ms: float = 1000.0
+    slow_tail_max_ms: float = 3000.0
+
+    def __post_init__(self):
+        if self.distribution not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        for name in ('failure_rate', 'slow_tail_probability'):
+            if not 0 <= getattr(self, name) <= 1:
+                raise ValueError(f"{name} must be between 0 and 1")
+        if self.max_ms < self.min_ms:
+            self.max_ms = self.min_ms
+
+    def sample(self, rng: random.Random) -> Tuple[float, bool, bool]:
+        """Draw (delay in ms, fail?, slow tail?) for one request."""
+        if self.slow_tail_probability and rng.random() < self.slow_tail_probability:
+            delay, slow = rng.uniform(self.slow_tail_min_ms, self.slow_tail_max_ms), True
+        elif self.distribution == 'fixed':
+            delay, slow = self.min_ms, False
+        elif self.distribution == 'uniform':
+            delay, slow = rng.uniform(self.min_ms, self.max_ms), False
+        else:
+            delay = rng.lognormvariate(math.log(max(self.median_ms, 1e-3)), self.sigma)
+            delay, slow = min(max(delay, self.min_ms), self.max_ms or delay), False
+        fail = bool(self.failure_rate) and rng.random() < self.failure_rate
+        return delay, fail, slow
+
+    @property
+    def is_noop(self) -> bool:
+        # A lognormal draw is always positive, with or without a max_ms clamp
+        if self.distribution == 'fixed':
+            adds_latency = self.min_ms > 0
+        elif self.distribution == 'uniform':
+            adds_latency = self.max_ms > 0
+        else:
+            adds_latency = True
+        return not adds_latency and not self.failure_rate and not self.slow_tail_probability
+
+
+# ================================
+# Presets
+# ================================
+# Selected with MOCK_FAULT_PROFILE=<name>; 'off' is the default.
+
+PRESETS: Dict[str, Dict] = {
+    'off': {},
+    # The delay/failure values simulate_latency and random_failure used to hard-code
+    'legacy': {
+        'default': {'distribution': 'uniform', 'min_ms': 50, 'max_ms': 300, 'failure_rate': 0.05},
+    },
+    'realistic': {
+        'default': {'distribution': 'lognormal', 'median_ms': 120, 'sigma': 0.6, 'min_ms': 20,
+                    'max_ms': 1500, 'failure_rate': 0.01, 'slow_tail_probability': 0.02},
+        'routes': {
+            '/payBill': {'distribution': 'lognormal', 'median_ms': 350, 'sigma': 0.5, 'min_ms': 100,
+                         'max_ms': 3000, 'failure_rate': 0.02, 'slow_tail_probability': 0.03},
+            '/initiatePackageChange': {'distribution': 'lognormal', 'median_ms': 300, 'sigma': 0.5,
+                                       'min_ms': 100, 'max_ms': 3000, 'failure_rate': 0.02},
+        },
+    },
+    'degraded': {
+        'default': {'distribution': 'lognormal', 'median_ms': 600, 'sigma': 0.8, 'min_ms': 100,
+                    'max_ms': 8000, 'failure_rate': 0.1, 'slow_tail_probability': 0.1,
+                    'slow_tail_min_ms': 3000, 'slow_tail_max_ms': 10000},
+    },
+}
+
+# Routes that are never slowed down or failed (fault control and liveness)
+EXEMPT_PREFIXES = ('/admin/faults', '/health', '/docs', '/openapi.json')
+
+
+class FaultInjector:
+    """Per-route latency and failure injection for the mock API.
+
+    Routes are matched by the longest configured path prefix, falling back
+    to the default profile. Delays are awaited with ``asyncio.sleep`` so a
+    slowed request does not hold a worker thread.
+    """
+
+    def __init__(self, default: Optional[RouteFaultProfile] = None,
+                 routes: Optional[Dict[str, RouteFaultProfile]] = None,
+                 name: str = 'custom', seed: Optional[int] = None):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self.configure(default, routes, name)
+
+    def configure(self, default: Optional[RouteFaultProfile] = None,
+                  routes: Optional[Dict[str, RouteFaultProfile]] = None, name: str = 'custom'):
+        with self._lock:
+            self.name = name
+            self.default = default
+            # Longest prefix first
+            self.routes = dict(sorted((routes or {}).items(), key=lambda item: -len(item[0])))
+
+    @classmethod
+    def from_dict(cls, spec: Dict, name: str = 'custom', seed: Optional[int] = None) -> 'FaultInjector':
+        injector = cls(seed=seed)
+        injector.configure_from_dict(spec, name)
+        return injector
+
+    def configure_from_dict(self, spec: Dict, name: str = 'custom'):
+        default = RouteFaultProfile(**spec['default']) if spec.get('default') else None
+        routes = {prefix: RouteFaultProfile(**profile) for prefix, profile in (spec.get('routes') or {}).items()}
+        self.configure(default, routes, name)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'name': self.name,
+                'default': asdict(self.default) if self.default else None,
+                'routes': {prefix: asdict(profile) for prefix, profile in self.routes.items()},
+            }
+
+    @property
+    def enabled(self) -> bool:
+        return self.default is not None or bool(self.routes)
+
+    def _match(self, path: str) -> Tuple[str, Optional[RouteFaultProfile]]:
+        """Return (matched prefix or ``'default'``, profile) for a request path."""
+        if path.startswith(EXEMPT_PREFIXES):
+            return 'default', None
+        for prefix, profile in self.routes.items():
+            if path.startswith(prefix):
+                return prefix, profile
+        return 'default', self.default
+
+    def profile_for(self, path: str) -> Optional[RouteFaultProfile]:
+        return self._match(path)[1]
+
+    async def apply(self, path: str):
+        """Sleep for the drawn delay; raise ``InjectedFault`` if a failure is drawn.
+
+        Stats are kept per matched prefix (or ``'default'``), not per raw path,
+        so paths carrying ids or arbitrary suffixes cannot grow the table.
+        """
+        key, profile = self._match(path)
+        if profile is None or profile.is_noop:
+            return
+
+        with self._lock:
+            delay_ms, fail, slow = profile.sample(self._rng)
+            stats = self._stats.setdefault(key, {'requests': 0, 'failures': 0, 'slow_tail': 0, 'delay_ms': 0.0})
+            stats['requests'] += 1
+            stats['failures'] += fail
+            stats['slow_tail'] += slow
+            stats['delay_ms'] += delay_ms
+
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+        if fail:
+            raise InjectedFault(path, profile.failure_status)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                key: {**values, 'avg_delay_ms': round(values['delay_ms'] / values['requests'], 1)}
+                for key, values in sorted(self._stats.items())
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def load_fault_injector(spec: Optional[str]) -> FaultInjector:
+    """Build an injector from a preset name, a JSON document or a path to a JSON file."""
+    spec = (spec or 'off').strip()
+    if spec in PRESETS:
+        return FaultInjector.from_dict(PRESETS[spec], name=spec)
+    if spec.startswith('{'):
+        return FaultInjector.from_dict(json.loads(spec))
+    path = Path(spec)
+    if path.exists():
+        return FaultInjector.from_dict(json.loads(path.read_text(encoding='utf-8')), name=path.stem)
+    raise ValueError(f"Unknown fault profile: {spec} (presets: {', '.join(PRESETS)})")
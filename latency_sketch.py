@@ -0,0 +1,193 @@
+# latency_sketch.py
+import math
+import time
+import zlib
+import struct
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Header: version, relative accuracy, count, sum, min, max, zero count, number of bins
+_HEADER = struct.Struct('<BdQdddQI')
+_BIN = struct.Struct('<iQ')
+_FORMAT_VERSION = 1
+
+# Values at or below this (ms) are counted as zero; the log mapping is undefined at 0
+MIN_INDEXABLE_VALUE = 1e-3
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    A value ``x`` is counted in bin ``ceil(log_gamma(x))`` with
+    ``gamma = (1 + a) / (1 - a)``, so any quantile is returned within a
+    relative error ``a`` of the true value. Sketches with the same accuracy
+    merge exactly by adding bin counts, which is what makes per-bucket
+    persistence and cross-process aggregation possible.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1):
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        """Fold the lowest bins together; only the lowest quantiles lose accuracy."""
+        indexes = sorted(self.bins)
+        overflow = indexes[:len(indexes) - self.max_bins + 1]
+        target = indexes[len(overflow)]
+        self.bins[target] += sum(self.bins.pop(i) for i in overflow)
+
+    def merge(self, other: 'DDSketch'):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def copy(self) -> 'DDSketch':
+        clone = DDSketch(self.relative_accuracy, self.max_bins)
+        clone.merge(self)
+        return clone
+
+    @property
+    def avg(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    # ================================
+    # Serialization
+    # ================================
+
+    def to_bytes(self) -> bytes:
+        bins = sorted(self.bins.items())
+        payload = _HEADER.pack(
+            _FORMAT_VERSION, self.relative_accuracy, self.count, self.sum,
+            self.min if self.count else 0.0, self.max if self.count else 0.0,
+            self.zero_count, len(bins)
+        ) + b''.join(_BIN.pack(index, count) for index, count in bins)
+        return zlib.compress(payload)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, max_bins: int = 2048) -> 'DDSketch':
+        payload = zlib.decompress(blob)
+        version, accuracy, count, total, low, high, zero_count, num_bins = _HEADER.unpack_from(payload)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format: {version}")
+
+        sketch = cls(accuracy, max_bins)
+        sketch.count, sketch.sum, sketch.zero_count = count, total, zero_count
+        sketch.min, sketch.max = (low, high) if count else (math.inf, -math.inf)
+        offset = _HEADER.size
+        for _ in range(num_bins):
+            index, bin_count = _BIN.unpack_from(payload, offset)
+            sketch.bins[index] = bin_count
+            offset += _BIN.size
+        return sketch
+
+
+def bucket_start(timestamp: float, bucket_seconds: int) -> str:
+    """UTC start of the time bucket, formatted like SQLite's CURRENT_TIMESTAMP."""
+    start = int(timestamp // bucket_seconds * bucket_seconds)
+    return datetime.fromtimestamp(start, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LatencySketchRecorder:
+    """In-process accumulation of sketches keyed by (metric, dimension, bucket).
+
+    Writers call ``record``; a periodic ``drain`` hands the accumulated
+    sketches to the database, which merges them into the persisted rows.
+    """
+
+    def __init__(self, bucket_seconds: int = 300, relative_accuracy: float = 0.01):
+        self.bucket_seconds = bucket_seconds
+        self.relative_accuracy = relative_accuracy
+        self._sketches: Dict[Tuple[str, str, str], DDSketch] = {}
+        self._lock = threading.Lock()
+
+    def record(self, metric: str, dimension: str, value: float):
+        key = (metric, dimension or '', bucket_start(time.time(), self.bucket_seconds))
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = DDSketch(self.relative_accuracy)
+            sketch.add(value)
+
+    def drain(self) -> Dict[Tuple[str, str, str], DDSketch]:
+        with self._lock:
+            sketches, self._sketches = self._sketches, {}
+        return sketches
+
+    def restore(self, sketches: Dict[Tuple[str, str, str], DDSketch]):
+        """Put drained sketches back (e.g. after a failed flush)."""
+        with self._lock:
+            for key, sketch in sketches.items():
+                current = self._sketches.get(key)
+                if current is None:
+                    self._sketches[key] = sketch
+                else:
+                    current.merge(sketch)
+
+    def pending(self, metric: str, since_bucket: str) -> List[Tuple[str, DDSketch]]:
+        """Unflushed (dimension, sketch) pairs of a metric at or after a bucket."""
+        with self._lock:
+            return [
+                (dimension, sketch.copy())
+                for (m, dimension, bucket), sketch in self._sketches.items()
+                if m == metric and bucket >= since_bucket
+            ]
+
+
+def merge_sketches(sketches: Iterable[DDSketch]) -> Optional[DDSketch]:
+    merged = None
+    for sketch in sketches:
+        if merged is None:
+            merged = DDSketch(sketch.relative_accuracy, sketch.max_bins)
+        merged.merge(sketch)
+    return merged
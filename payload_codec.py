@@ -0,0 +1,225 @@
+# payload_codec.py
+import json
+import time
+import zlib
+import random
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; parameters fall back to JSON text
+    msgpack = None
+
+logger = logging.getLogger("payload_codec")
+
+# ================================
+# Row Format
+# ================================
+# Encoded values are stored as BLOBs with a 3-byte header:
+#   MAGIC | format ('t' text, 'm' msgpack) | compression ('n' none, 'z' zlib, 's' zstd)
+# Rows written before the codec existed are plain TEXT and are returned unchanged,
+# so old and new rows can live side by side in the same column.
+
+MAGIC = b'\xfe'
+FORMAT_TEXT = b't'
+FORMAT_MSGPACK = b'm'
+COMPRESSION_NONE = b'n'
+COMPRESSION_ZLIB = b'z'
+COMPRESSION_ZSTD = b's'
+
+Payload = Union[str, bytes, None]
+
+
+class PayloadCodec:
+    """Transparent compression for large TEXT columns.
+
+    ``compression`` is ``None`` (store plain text), ``'zlib'`` or ``'zstd'``.
+    With zstd a shared dictionary trained on real transcripts
+    (see ``train_zstd_dictionary``) gives much better ratios on short rows.
+    Values shorter than ``min_size`` bytes are stored as plain text.
+    """
+
+    def __init__(self, compression: Optional[str] = 'zlib', level: int = 6, min_size: int = 64,
+                 zstd_dictionary: bytes = None, use_msgpack: bool = True):
+        if compression not in (None, 'zlib', 'zstd'):
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+
+        self.compression = compression
+        self.level = level
+        self.min_size = min_size
+        self.use_msgpack = use_msgpack and msgpack is not None and compression is not None
+
+        self._zstd_dict = zstandard.ZstdCompressionDict(zstd_dictionary) if zstd_dictionary and zstandard else None
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+        if zstandard is not None:
+            # Decompression must work even when writes use zlib, as long as zstd is installed
+            self._zstd_decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dict)
+            if compression == 'zstd':
+                self._zstd_compressor = zstandard.ZstdCompressor(level=level, dict_data=self._zstd_dict)
+
+    @property
+    def enabled(self) -> bool:
+        return self.compression is not None
+
+    # ================================
+    # Encoding
+    # ================================
+
+    def _compress(self, fmt: bytes, raw: bytes) -> bytes:
+        if self.compression == 'zstd':
+            return MAGIC + fmt + COMPRESSION_ZSTD + self._zstd_compressor.compress(raw)
+        return MAGIC + fmt + COMPRESSION_ZLIB + zlib.compress(raw, self.level)
+
+    def encode_text(self, value: Optional[str]) -> Payload:
+        """Encode a text column value for storage."""
+        if value is None or not self.enabled:
+            return value
+        raw = value.encode('utf-8')
+        if len(raw) < self.min_size:
+            return value
+
+        encoded = self._compress(FORMAT_TEXT, raw)
+        return encoded if len(encoded) < len(raw) else value
+
+    def encode_json(self, obj: Any) -> Payload:
+        """Encode a JSON-serializable object (tool parameters)."""
+        if not self.use_msgpack:
+            return self.encode_text(json.dumps(obj))
+
+        raw = msgpack.packb(obj, use_bin_type=True, default=str)
+        if len(raw) < self.min_size:
+            return MAGIC + FORMAT_MSGPACK + COMPRESSION_NONE + raw
+        return self._compress(FORMAT_MSGPACK, raw)
+
+    # ================================
+    # Decoding
+    # ================================
+
+    def _decompress(self, compression: bytes, body: bytes) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return body
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(body)
+        if compression == COMPRESSION_ZSTD:
+            if self._zstd_decompressor is None:
+                raise RuntimeError("Row is zstd-compressed but 'zstandard' is not installed")
+            return self._zstd_decompressor.decompress(body)
+        raise ValueError(f"Unknown compression marker: {compression!r}")
+
+    def decode_text(self, value: Payload) -> Optional[str]:
+        """Decode a stored value back to text. Plain TEXT rows pass through."""
+        if not isinstance(value, (bytes, bytearray)) or not value.startswith(MAGIC) or len(value) < 3:
+            return value
+
+        fmt, compression = value[1:2], value[2:3]
+        raw = self._decompress(compression, bytes(value[3:]))
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("Row is msgpack-encoded but 'msgpack' is not installed")
+            # Callers expect the JSON text that used to be stored in the column
+            return json.dumps(msgpack.unpackb(raw, raw=False))
+        return raw.decode('utf-8')
+
+    def decode_row(self, row: Dict, columns: List[str]) -> Dict:
+        """Decode the given columns of a row dict in place."""
+        for column in columns:
+            if column in row:
+                row[column] = self.decode_text(row[column])
+        return row
+
+
+def train_zstd_dictionary(samples: List[str], dict_size: int = 16 * 1024) -> bytes:
+    """Train a shared zstd dictionary from representative payloads."""
+    if zstandard is None:
+        raise RuntimeError("Dictionary training requires the 'zstandard' package")
+    return zstandard.train_dictionary(dict_size, [s.encode('utf-8') for s in samples]).as_bytes()
+
+# ================================
+# Benchmark
+# ================================
+
+def _sample_payloads(count: int = 2000) -> List[Dict]:
+    """Synthetic transcript rows shaped like the call flow's messages and tool results."""
+    rng = random.Random(42)
+    phrases = [
+        "Merhaba, faturamla ilgili bir sorum var.",
+        "Bu ayki faturam neden yüksek geldi?",
+        "Paketimi değiştirmek istiyorum, hangi seçenekler var?",
+        "İnternet hızım çok düşük, yardımcı olabilir misiniz?",
+        "Müşteri numaranızı alabilir miyim?",
+        "Ödemeniz başarıyla alınmıştır, iyi günler dileriz.",
+    ]
+    payloads = []
+    for i in range(count):
+        customer_id = str(1001 + i % 5)
+        result = {
+            "success": True,
+            "data": {
+                "customer_id": customer_id,
+                "bills": [
+                    {"bill_month": f"2025-{m:02d}", "amount": round(rng.uniform(50, 400), 2),
+                     "is_paid": rng.random() > 0.3, "due_date": f"2025-{m:02d}-01"}
+                    for m in range(1, rng.randint(3, 12))
+                ],
+            },
+            "message": "Faturalar başarıyla getirildi",
+        }
+        payloads.append({
+            'content': " ".join(rng.choice(phrases) for _ in range(rng.randint(1, 6))),
+            'parameters': {"customer_id": customer_id, "month": "2025-07"},
+            'result': json.dumps(result, ensure_ascii=False),
+        })
+    return payloads
+
+
+def run_benchmark(count: int = 2000) -> List[Dict]:
+    """Compare stored size and encode/decode cost of the available codecs."""
+    payloads = _sample_payloads(count)
+    raw_size = sum(len(p['content'].encode('utf-8')) + len(json.dumps(p['parameters']))
+                   + len(p['result'].encode('utf-8')) for p in payloads)
+
+    codecs = {'plain': PayloadCodec(compression=None), 'zlib': PayloadCodec('zlib')}
+    if zstandard is not None:
+        codecs['zstd'] = PayloadCodec('zstd', level=3)
+        dictionary = train_zstd_dictionary([p['result'] for p in payloads[:500]]
+                                           + [p['content'] for p in payloads[:500]])
+        codecs['zstd+dict'] = PayloadCodec('zstd', level=3, zstd_dictionary=dictionary)
+
+    report = []
+    for name, codec in codecs.items():
+        start = time.perf_counter()
+        encoded = [(codec.encode_text(p['content']), codec.encode_json(p['parameters']),
+                    codec.encode_text(p['result'])) for p in payloads]
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for row in encoded:
+            for value in row:
+                codec.decode_text(value)
+        decode_ms = (time.perf_counter() - start) * 1000
+
+        stored = sum(len(v if isinstance(v, bytes) else v.encode('utf-8')) for row in encoded for v in row)
+        report.append({
+            'codec': name,
+            'stored_kb': round(stored / 1024, 1),
+            'ratio': round(raw_size / stored, 2),
+            'encode_us_per_row': round(encode_ms * 1000 / count, 1),
+            'decode_us_per_row': round(decode_ms * 1000 / count, 1),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    print(f"msgpack: {'yes' if msgpack else 'no'}, zstandard: {'yes' if zstandard else 'no'}")
+    for line in run_benchmark():
+        print(f"{line['codec']:10s} {line['stored_kb']:9.1f} KB  x{line['ratio']:<5}  "
+              f"encode {line['encode_us_per_row']:6.1f} us/row  decode {line['decode_us_per_row']:6.1f} us/row")
@@ -0,0 +1,1034 @@
+# postgres_database.py
+import json
+import uuid
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from contextlib import contextmanager
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.types.numeric import FloatLoader
+    from psycopg_pool import ConnectionPool
+except ImportError:  # PostgreSQL support is optional
+    psycopg = None
+
+from storage_backend import (
+    StorageBackend, RESULT_OK, RESULT_UNCHANGED, RESULT_CUSTOMER_NOT_FOUND, RESULT_BILL_NOT_FOUND,
+    RESULT_ALREADY_PAID, RESULT_AMOUNT_MISMATCH, RESULT_PACKAGE_NOT_FOUND
+)
+
+logger = logging.getLogger("postgres_database")
+
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+# metric -> (table, latency column, dimension column)
+LATENCY_SOURCES = {
+    'response': ('call_messages', 'processing_time_ms', 'specialist'),
+    'tool': ('tool_usage_logs', 'execution_time_ms', 'tool_name'),
+}
+
+# ================================
+# PostgreSQL Backend
+# ================================
+
+class PostgresCallCenterDatabase(StorageBackend):
+    """PostgreSQL implementation of the call center storage backend.
+
+    Connections come from a ``psycopg_pool.ConnectionPool``; hot queries are
+    executed with ``prepare=True`` so PostgreSQL keeps server-side prepared
+    statements per connection. SQL uses the PostgreSQL dialect throughout
+    (``now() - interval``, ``ON CONFLICT``, ``RETURNING``).
+    """
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 10, seed_data: bool = True):
+        if psycopg is None:
+            raise RuntimeError("psycopg paketleri kurulu değil: pip install 'psycopg[binary]' psycopg-pool")
+
+        self.dsn = dsn
+        self.pool = ConnectionPool(
+            dsn, min_size=min_size, max_size=max_size,
+            kwargs={'row_factory': dict_row}, configure=self._configure_connection
+        )
+        self.init_database(seed_data)
+        logger.info(f"PostgreSQL backend initialized (pool {min_size}-{max_size})")
+
+    @staticmethod
+    def _configure_connection(conn):
+        # Return NUMERIC columns as float so result shapes match the SQLite backend
+        conn.adapters.register_loader("numeric", FloatLoader)
+
+    @contextmanager
+    def get_connection(self):
+        """Context manager for pooled connections; commits on success."""
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+            except Exception as e:
+                logger.error(f"Database error: {e}")
+                raise
+
+    def _execute(self, conn, query: str, params: tuple = ()):
+        """Execute as a server-side prepared statement (cached per connection)."""
+        return conn.execute(query, params, prepare=True)
+
+    def init_database(self, seed_data: bool = True):
+        """Initialize database with schema."""
+        with self.get_connection() as conn:
+            conn.execute(self._get_schema_sql())
+            if seed_data:
+                self._insert_initial_data(conn)
+        logger.info("PostgreSQL schema created successfully")
+
+    def _get_schema_sql(self) -> str:
+        """Returns the PostgreSQL schema."""
+        return '''
+        CREATE TABLE IF NOT EXISTS customers (
+            customer_id VARCHAR(10) PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            phone VARCHAR(15),
+            email VARCHAR(100),
+            address TEXT,
+            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status VARCHAR(20) DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS packages (
+            package_id SERIAL PRIMARY KEY,
+            package_name VARCHAR(50) UNIQUE NOT NULL,
+            price NUMERIC(10,2) NOT NULL,
+            description TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS package_features (
+            feature_id SERIAL PRIMARY KEY,
+            package_id INTEGER NOT NULL REFERENCES packages(package_id) ON DELETE CASCADE,
+            feature_name VARCHAR(100) NOT NULL,
+            feature_value VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(package_id, feature_name)
+        );
+
+        CREATE TABLE IF NOT EXISTS customer_subscriptions (
+            subscription_id SERIAL PRIMARY KEY,
+            customer_id VARCHAR(10) NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+            package_id INTEGER NOT NULL REFERENCES packages(package_id),
+            start_date DATE NOT NULL,
+            end_date DATE,
+            status VARCHAR(20) DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS customer_balances (
+            balance_id SERIAL PRIMARY KEY,
+            customer_id VARCHAR(10) UNIQUE NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+            current_balance NUMERIC(10,2) DEFAULT 0.00,
+            credit_limit NUMERIC(10,2) DEFAULT 0.00,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS bills (
+            bill_id SERIAL PRIMARY KEY,
+            customer_id VARCHAR(10) NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+            bill_month VARCHAR(7) NOT NULL,
+            amount NUMERIC(10,2) NOT NULL,
+            due_date DATE NOT NULL,
+            is_paid BOOLEAN DEFAULT FALSE,
+            paid_date TIMESTAMP NULL,
+            payment_method VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(customer_id, bill_month)
+        );
+
+        CREATE TABLE IF NOT EXISTS usage_stats (
+            usage_id SERIAL PRIMARY KEY,
+            customer_id VARCHAR(10) NOT NULL REFERENCES customers(customer_id) ON DELETE CASCADE,
+            usage_month VARCHAR(7) NOT NULL,
+            calls_minutes INTEGER DEFAULT 0,
+            data_mb INTEGER DEFAULT 0,
+            sms_count INTEGER DEFAULT 0,
+            extra_charges NUMERIC(10,2) DEFAULT 0.00,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(customer_id, usage_month)
+        );
+
+        CREATE TABLE IF NOT EXISTS call_sessions (
+            session_id VARCHAR(50) PRIMARY KEY,
+            customer_id VARCHAR(10) REFERENCES customers(customer_id),
+            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_time TIMESTAMP,
+            duration_seconds INTEGER,
+            call_type VARCHAR(20) DEFAULT 'inbound',
+            status VARCHAR(20) DEFAULT 'active',
+            agent_mode VARCHAR(20) DEFAULT 'ai',
+            customer_satisfaction INTEGER,
+            resolution_status VARCHAR(30),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS call_messages (
+            message_id BIGSERIAL PRIMARY KEY,
+            session_id VARCHAR(50) NOT NULL REFERENCES call_sessions(session_id) ON DELETE CASCADE,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            message_type VARCHAR(20) DEFAULT 'text',
+            tool_call VARCHAR(50),
+            tool_result TEXT,
+            processing_time_ms INTEGER,
+            specialist VARCHAR(50)
+        );
+        ALTER TABLE call_messages ADD COLUMN IF NOT EXISTS specialist VARCHAR(50);
+
+        CREATE TABLE IF NOT EXISTS tool_usage_logs (
+            log_id BIGSERIAL PRIMARY KEY,
+            session_id VARCHAR(50) NOT NULL REFERENCES call_sessions(session_id) ON DELETE CASCADE,
+            tool_name VARCHAR(50) NOT NULL,
+            parameters JSONB,
+            result TEXT,
+            execution_time_ms INTEGER,
+            success BOOLEAN DEFAULT TRUE,
+            error_message TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS error_logs (
+            error_id BIGSERIAL PRIMARY KEY,
+            session_id VARCHAR(50) REFERENCES call_sessions(session_id),
+            error_type VARCHAR(50) NOT NULL,
+            error_message TEXT NOT NULL,
+            stack_trace TEXT,
+            severity VARCHAR(20) DEFAULT 'medium',
+            resolved BOOLEAN DEFAULT FALSE,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone);
+        CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status);
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_customer_active
+            ON customer_subscriptions(customer_id) WHERE status = 'active';
+        CREATE INDEX IF NOT EXISTS idx_bills_customer ON bills(customer_id);
+        CREATE INDEX IF NOT EXISTS idx_bills_month ON bills(bill_month);
+        CREATE INDEX IF NOT EXISTS idx_bills_unpaid_due ON bills(due_date) WHERE is_paid = FALSE;
+        CREATE INDEX IF NOT EXISTS idx_call_sessions_customer ON call_sessions(customer_id);
+        CREATE INDEX IF NOT EXISTS idx_call_sessions_start ON call_sessions(start_time);
+        CREATE INDEX IF NOT EXISTS idx_call_messages_session ON call_messages(session_id);
+        CREATE INDEX IF NOT EXISTS idx_call_messages_timestamp ON call_messages(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_tool_usage_session ON tool_usage_logs(session_id);
+        CREATE INDEX IF NOT EXISTS idx_tool_usage_timestamp ON tool_usage_logs(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_error_logs_timestamp ON error_logs(timestamp);
+        '''
+
+    def _insert_initial_data(self, conn):
+        """Insert initial test data (idempotent)."""
+        customers_data = [
+            ("1001", "Ali Veli", "5551234567", "ali.veli@email.com", "İstanbul"),
+            ("1002", "Ayşe Demir", "5552345678", "ayse.demir@email.com", "Ankara"),
+            ("1003", "Mehmet Can", "5553456789", "mehmet.can@email.com", "İzmir"),
+            ("1004", "Elif Yılmaz", "5554567890", "elif.yilmaz@email.com", "Bursa"),
+            ("1005", "Berke Kara", "5555678901", "berke.kara@email.com", "Antalya"),
+        ]
+        with conn.cursor() as cur:
+            cur.executemany('''
+                INSERT INTO customers (customer_id, name, phone, email, address)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (customer_id) DO NOTHING
+            ''', customers_data)
+
+            packages_data = [
+                ("Bronze", 25.00, "Başlangıç paketi"),
+                ("Silver", 50.00, "Orta seviye paket"),
+                ("Gold", 100.00, "Gelişmiş paket"),
+                ("Standart", 75.00, "Standart paket"),
+                ("Premium", 150.00, "Premium paket"),
+            ]
+            cur.executemany('''
+                INSERT INTO packages (package_name, price, description)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (package_name) DO NOTHING
+            ''', packages_data)
+
+            package_features = {
+                "Bronze": ["50 DK Arama", "10 GB İnternet"],
+                "Silver": ["200 DK Arama", "50 GB İnternet"],
+                "Gold": ["Limitsiz Arama", "100 GB İnternet"],
+                "Standart": ["100 DK Arama", "50 GB İnternet"],
+                "Premium": ["Limitsiz Arama", "Limitsiz İnternet"],
+            }
+            for package_name, features in package_features.items():
+                for feature in features:
+                    cur.execute('''
+                        INSERT INTO package_features (package_id, feature_name, feature_value)
+                        SELECT package_id, %s, %s FROM packages WHERE package_name = %s
+                        ON CONFLICT (package_id, feature_name) DO NOTHING
+                    ''', (feature.split()[1], feature.split()[0], package_name))
+
+            subscription_data = [
+                ("1001", "Premium", "2024-01-01"),
+                ("1002", "Standart", "2024-02-01"),
+                ("1003", "Gold", "2024-01-15"),
+                ("1004", "Silver", "2024-03-01"),
+                ("1005", "Bronze", "2024-02-15"),
+            ]
+            for customer_id, package_name, start_date in subscription_data:
+                cur.execute('''
+                    INSERT INTO customer_subscriptions (customer_id, package_id, start_date)
+                    SELECT %s, package_id, %s FROM packages WHERE package_name = %s
+                    AND NOT EXISTS (
+                        SELECT 1 FROM customer_subscriptions WHERE customer_id = %s
+                    )
+                ''', (customer_id, start_date, package_name, customer_id))
+
+            balance_data = [
+                ("1001", 243.45, 100.00),
+                ("1002", 0.00, 50.00),
+                ("1003", 1240.00, 200.00),
+                ("1004", 5455.75, 75.00),
+                ("1005", 5415.20, 25.00),
+            ]
+            cur.executemany('''
+                INSERT INTO customer_balances (customer_id, current_balance, credit_limit)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (customer_id) DO NOTHING
+            ''', balance_data)
+
+            bill_data = [
+                ("1001", "2025-06", 145.00, "2025-07-01", False),
+                ("1001", "2025-07", 150.00, "2025-08-01", False),
+                ("1002", "2025-07", 75.00, "2025-08-01", True),
+                ("1003", "2025-07", 100.00, "2025-08-01", False),
+            ]
+            cur.executemany('''
+                INSERT INTO bills (customer_id, bill_month, amount, due_date, is_paid)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (customer_id, bill_month) DO NOTHING
+            ''', bill_data)
+
+            usage_data = [
+                ("1001", "2025-07", 120, 20480, 30, 0.00),
+                ("1002", "2025-07", 80, 15360, 25, 0.00),
+                ("1003", "2025-07", 200, 30720, 50, 0.00),
+            ]
+            cur.executemany('''
+                INSERT INTO usage_stats
+                (customer_id, usage_month, calls_minutes, data_mb, sms_count, extra_charges)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (customer_id, usage_month) DO NOTHING
+            ''', usage_data)
+
+    # ================================
+    # Customer Operations
+    # ================================
+
+    def get_customer_info(self, customer_id: str) -> Optional[Dict]:
+        """Get customer information with current package and balance."""
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT
+                    c.customer_id, c.name, c.phone, c.email,
+                    p.package_name, cb.current_balance, cb.credit_limit,
+                    EXTRACT(EPOCH FROM (now() - c.registration_date)) / 86400.0 as days_as_customer,
+                    (SELECT SUM(b.amount) FROM bills b
+                     WHERE b.customer_id = c.customer_id AND b.is_paid) as total_paid
+                FROM customers c
+                LEFT JOIN customer_subscriptions cs ON c.customer_id = cs.customer_id
+                    AND cs.status = 'active'
+                LEFT JOIN packages p ON cs.package_id = p.package_id
+                LEFT JOIN customer_balances cb ON c.customer_id = cb.customer_id
+                WHERE c.customer_id = %s AND c.status = 'active'
+                LIMIT 1
+            ''', (customer_id,)).fetchone()
+
+            if result:
+                data = dict(result)
+                data['days_as_customer'] = float(data['days_as_customer'])
+                months_as_customer = max(1, data['days_as_customer'] / 30)
+                data['monthly_value'] = data['total_paid'] / months_as_customer if data['total_paid'] else 0
+                return data
+
+            return {}
+
+    def customer_exists(self, customer_id: str) -> bool:
+        """Primary-key check for an active customer (no joins)."""
+        with self.get_connection() as conn:
+            return self._execute(
+                conn, "SELECT 1 FROM customers WHERE customer_id = %s AND status = 'active'", (customer_id,)
+            ).fetchone() is not None
+
+    def get_active_customer_ids(self) -> List[str]:
+        with self.get_connection() as conn:
+            rows = self._execute(conn, "SELECT customer_id FROM customers WHERE status = 'active'").fetchall()
+            return [row['customer_id'] for row in rows]
+
+    def create_customer(self, customer_id: str, name: str, phone: str = None,
+                        email: str = None, address: str = None) -> bool:
+        """Create a new customer."""
+        try:
+            with self.get_connection() as conn:
+                self._execute(conn, '''
+                    INSERT INTO customers (customer_id, name, phone, email, address)
+                    VALUES (%s, %s, %s, %s, %s)
+                ''', (customer_id, name, phone, email, address))
+                self._execute(conn, '''
+                    INSERT INTO customer_balances (customer_id, current_balance, credit_limit)
+                    VALUES (%s, 0.00, 0.00)
+                ''', (customer_id,))
+            logger.info(f"New customer created: {customer_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating customer {customer_id}: {e}")
+            return False
+
+    def update_customer_info(self, customer_id: str, **kwargs) -> bool:
+        """Update customer information."""
+        valid_fields = ['name', 'phone', 'email', 'address', 'status']
+        updates = []
+        values = []
+
+        for field, value in kwargs.items():
+            if field in valid_fields and value is not None:
+                updates.append(f"{field} = %s")
+                values.append(value)
+
+        if not updates:
+            return False
+
+        updates.append("updated_at = CURRENT_TIMESTAMP")
+        values.append(customer_id)
+
+        try:
+            with self.get_connection() as conn:
+                result = conn.execute(
+                    f"UPDATE customers SET {', '.join(updates)} WHERE customer_id = %s", values
+                )
+                return result.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error updating customer {customer_id}: {e}")
+            return False
+
+    def get_customer_call_history(self, customer_id: str, limit: int = 10) -> List[Dict]:
+        """Get customer's recent call history."""
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT
+                    session_id, start_time, end_time, duration_seconds,
+                    status, resolution_status, customer_satisfaction
+                FROM call_sessions
+                WHERE customer_id = %s
+                ORDER BY start_time DESC
+                LIMIT %s
+            ''', (customer_id, limit)).fetchall()
+            return [dict(row) for row in result]
+
+    # ================================
+    # Batch Reads
+    # ================================
+
+    @staticmethod
+    def _group_by_customer(customer_ids: List[str], rows) -> Dict[str, List[Dict]]:
+        grouped = {cid: [] for cid in customer_ids}
+        for row in rows:
+            data = dict(row)
+            grouped[data.pop('customer_id')].append(data)
+        return grouped
+
+    def get_customer_info_many(self, customer_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """``get_customer_info`` for several customers; unknown or inactive ids map to None."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = self._execute(conn, '''
+                SELECT DISTINCT ON (c.customer_id)
+                    c.customer_id, c.name, c.phone, c.email,
+                    p.package_name, cb.current_balance, cb.credit_limit,
+                    EXTRACT(EPOCH FROM (now() - c.registration_date)) / 86400.0 as days_as_customer,
+                    (SELECT SUM(b.amount) FROM bills b
+                     WHERE b.customer_id = c.customer_id AND b.is_paid) as total_paid
+                FROM customers c
+                LEFT JOIN customer_subscriptions cs ON c.customer_id = cs.customer_id
+                    AND cs.status = 'active'
+                LEFT JOIN packages p ON cs.package_id = p.package_id
+                LEFT JOIN customer_balances cb ON c.customer_id = cb.customer_id
+                WHERE c.customer_id = ANY(%s) AND c.status = 'active'
+                ORDER BY c.customer_id
+            ''', (customer_ids,)).fetchall()
+
+        customers = dict.fromkeys(customer_ids)
+        for row in rows:
+            data = dict(row)
+            data['days_as_customer'] = float(data['days_as_customer'])
+            months_as_customer = max(1, data['days_as_customer'] / 30)
+            data['monthly_value'] = data['total_paid'] / months_as_customer if data['total_paid'] else 0
+            customers[data['customer_id']] = data
+        return customers
+
+    def get_customer_bills_many(self, customer_ids: List[str]) -> Dict[str, List[Dict]]:
+        """``get_customer_bills`` for several customers."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = self._execute(conn, '''
+                SELECT customer_id, bill_month, amount, due_date, is_paid, paid_date, payment_method
+                FROM bills
+                WHERE customer_id = ANY(%s)
+                ORDER BY customer_id, bill_month DESC
+            ''', (customer_ids,)).fetchall()
+        return self._group_by_customer(customer_ids, rows)
+
+    def get_customer_usage_stats_many(self, customer_ids: List[str],
+                                      month: str = None) -> Dict[str, Optional[Dict]]:
+        """``get_customer_usage_stats`` for several customers (latest month when none is given)."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = self._execute(conn, '''
+                SELECT DISTINCT ON (customer_id)
+                    customer_id, calls_minutes, data_mb, sms_count, extra_charges
+                FROM usage_stats
+                WHERE customer_id = ANY(%s) AND (%s::text IS NULL OR usage_month = %s)
+                ORDER BY customer_id, usage_month DESC
+            ''', (customer_ids, month, month)).fetchall()
+
+        stats = dict.fromkeys(customer_ids)
+        for row in rows:
+            data = dict(row)
+            stats[data.pop('customer_id')] = data
+        return stats
+
+    def get_customer_call_history_many(self, customer_ids: List[str],
+                                       limit: int = 10) -> Dict[str, List[Dict]]:
+        """``get_customer_call_history`` for several customers, ``limit`` calls each."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with self.get_connection() as conn:
+            rows = self._execute(conn, '''
+                SELECT customer_id, session_id, start_time, end_time, duration_seconds,
+                       status, resolution_status, customer_satisfaction
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY customer_id ORDER BY start_time DESC
+                    ) as rn
+                    FROM call_sessions
+                    WHERE customer_id = ANY(%s)
+                ) recent
+                WHERE rn <= %s
+                ORDER BY customer_id, start_time DESC
+            ''', (customer_ids, limit)).fetchall()
+        return self._group_by_customer(customer_ids, rows)
+
+    # ================================
+    # Packages
+    # ================================
+
+    def get_available_packages(self) -> List[Dict]:
+        """Get all available packages with features (single query)."""
+        with self.get_connection() as conn:
+            packages = self._execute(conn, '''
+                SELECT p.package_id, p.package_name, p.price, p.description,
+                       COALESCE(
+                           array_agg(f.feature_value || ' ' || f.feature_name ORDER BY f.feature_id)
+                           FILTER (WHERE f.feature_id IS NOT NULL),
+                           ARRAY[]::text[]
+                       ) as features
+                FROM packages p
+                LEFT JOIN package_features f ON f.package_id = p.package_id
+                WHERE p.is_active = TRUE
+                GROUP BY p.package_id
+                ORDER BY p.price
+            ''').fetchall()
+            return [dict(package) for package in packages]
+
+    def change_customer_package(self, customer_id: str, new_package_name: str) -> bool:
+        """Change customer's package."""
+        with self.get_connection() as conn:
+            package_result = self._execute(
+                conn, 'SELECT package_id FROM packages WHERE package_name = %s AND is_active = TRUE',
+                (new_package_name,)
+            ).fetchone()
+
+            if not package_result:
+                return False
+
+            self._execute(conn, '''
+                UPDATE customer_subscriptions
+                SET status = 'cancelled', end_date = CURRENT_DATE
+                WHERE customer_id = %s AND status = 'active'
+            ''', (customer_id,))
+            self._execute(conn, '''
+                INSERT INTO customer_subscriptions (customer_id, package_id, start_date)
+                VALUES (%s, %s, CURRENT_DATE)
+            ''', (customer_id, package_result['package_id']))
+            return True
+
+    def change_package_checked(self, customer_id: str, new_package_name: str) -> Dict:
+        """Validate and change the package in one transaction.
+
+        The customer row is locked with ``SELECT ... FOR UPDATE`` first, so
+        concurrent changes for the same customer run one after the other and
+        cannot leave two active subscriptions. Codes as in the SQLite backend.
+        """
+        result = {'customer_id': customer_id, 'package_name': new_package_name}
+        with self.get_connection() as conn:
+            customer = self._execute(conn, '''
+                SELECT customer_id FROM customers WHERE customer_id = %s AND status = 'active' FOR UPDATE
+            ''', (customer_id,)).fetchone()
+            # Read after the lock: the previous holder's subscription change is visible now
+            state = self._execute(conn, '''
+                SELECT p.package_id, cs.package_id as current_package_id, cp.package_name as previous_package
+                FROM (SELECT 1) one
+                LEFT JOIN packages p ON p.package_name = %s AND p.is_active = TRUE
+                LEFT JOIN customer_subscriptions cs ON cs.customer_id = %s AND cs.status = 'active'
+                LEFT JOIN packages cp ON cp.package_id = cs.package_id
+            ''', (new_package_name, customer_id)).fetchone()
+
+            result['previous_package'] = state['previous_package'] if customer else None
+            if not customer:
+                return {**result, 'ok': False, 'code': RESULT_CUSTOMER_NOT_FOUND}
+            if state['package_id'] is None:
+                return {**result, 'ok': False, 'code': RESULT_PACKAGE_NOT_FOUND}
+            if state['current_package_id'] == state['package_id']:
+                return {**result, 'ok': True, 'code': RESULT_UNCHANGED}
+
+            self._execute(conn, '''
+                UPDATE customer_subscriptions
+                SET status = 'cancelled', end_date = CURRENT_DATE
+                WHERE customer_id = %s AND status = 'active'
+            ''', (customer_id,))
+            subscription = self._execute(conn, '''
+                INSERT INTO customer_subscriptions (customer_id, package_id, start_date)
+                VALUES (%s, %s, CURRENT_DATE)
+                RETURNING subscription_id
+            ''', (customer_id, state['package_id'])).fetchone()
+            return {**result, 'ok': True, 'code': RESULT_OK, 'subscription_id': subscription['subscription_id']}
+
+    # ================================
+    # Billing
+    # ================================
+
+    def get_customer_bills(self, customer_id: str) -> List[Dict]:
+        """Get customer billing information."""
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT bill_month, amount, due_date, is_paid, paid_date, payment_method
+                FROM bills
+                WHERE customer_id = %s
+                ORDER BY bill_month DESC
+            ''', (customer_id,)).fetchall()
+            return [dict(bill) for bill in result]
+
+    def create_bill(self, customer_id: str, bill_month: str, amount: float, due_date: str) -> bool:
+        """Create a new bill for customer."""
+        try:
+            with self.get_connection() as conn:
+                self._execute(conn, '''
+                    INSERT INTO bills (customer_id, bill_month, amount, due_date)
+                    VALUES (%s, %s, %s, %s)
+                ''', (customer_id, bill_month, amount, due_date))
+            logger.info(f"New bill created for {customer_id}: {bill_month} - {amount}")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating bill for {customer_id}: {e}")
+            return False
+
+    def pay_bill(self, customer_id: str, bill_month: str, amount: float, payment_method: str = 'online') -> bool:
+        """Process bill payment atomically."""
+        with self.get_connection() as conn:
+            bill = self._execute(conn, '''
+                UPDATE bills
+                SET is_paid = TRUE, paid_date = CURRENT_TIMESTAMP, payment_method = %s
+                WHERE customer_id = %s AND bill_month = %s AND is_paid = FALSE
+                  AND abs(amount - %s) <= 0.01
+                RETURNING bill_id
+            ''', (payment_method, customer_id, bill_month, amount)).fetchone()
+
+            if not bill:
+                return False
+
+            self._execute(conn, '''
+                UPDATE customer_balances
+                SET current_balance = current_balance - %s, last_updated = CURRENT_TIMESTAMP
+                WHERE customer_id = %s
+            ''', (amount, customer_id))
+            return True
+
+    def pay_bill_checked(self, customer_id: str, bill_month: str, amount: float,
+                         payment_method: str = 'online') -> Dict:
+        """Validate and pay a bill in one transaction.
+
+        The bill is claimed by a single conditional ``UPDATE ... RETURNING``, so
+        two concurrent payments cannot both succeed; the state is only read back
+        to pick the failure code when it matches nothing.
+        """
+        result = {'customer_id': customer_id, 'bill_month': bill_month}
+        with self.get_connection() as conn:
+            bill = self._execute(conn, '''
+                UPDATE bills b
+                SET is_paid = TRUE, paid_date = CURRENT_TIMESTAMP, payment_method = %s
+                FROM customers c
+                WHERE c.customer_id = b.customer_id AND c.status = 'active'
+                  AND b.customer_id = %s AND b.bill_month = %s AND b.is_paid = FALSE
+                  AND abs(b.amount - %s) <= 0.01
+                RETURNING b.bill_id, b.amount
+            ''', (payment_method, customer_id, bill_month, amount)).fetchone()
+
+            if bill:
+                balance = self._execute(conn, '''
+                    UPDATE customer_balances
+                    SET current_balance = current_balance - %s, last_updated = CURRENT_TIMESTAMP
+                    WHERE customer_id = %s
+                    RETURNING current_balance
+                ''', (amount, customer_id)).fetchone()
+                return {**result, 'ok': True, 'code': RESULT_OK, 'bill_id': bill['bill_id'],
+                        'amount': bill['amount'], 'balance_after': balance['current_balance'] if balance else None}
+
+            state = self._execute(conn, '''
+                SELECT c.customer_id IS NOT NULL as customer_found, b.bill_id, b.is_paid, b.amount
+                FROM (SELECT 1) one
+                LEFT JOIN customers c ON c.customer_id = %s AND c.status = 'active'
+                LEFT JOIN bills b ON b.customer_id = c.customer_id AND b.bill_month = %s
+            ''', (customer_id, bill_month)).fetchone()
+
+        if not state['customer_found']:
+            code = RESULT_CUSTOMER_NOT_FOUND
+        elif state['bill_id'] is None:
+            code = RESULT_BILL_NOT_FOUND
+        elif state['is_paid']:
+            code = RESULT_ALREADY_PAID
+        else:
+            code = RESULT_AMOUNT_MISMATCH
+            result['bill_amount'] = state['amount']
+        return {**result, 'ok': False, 'code': code}
+
+    def get_customer_usage_stats(self, customer_id: str, month: str = None) -> Optional[Dict]:
+        """Get customer usage statistics."""
+        with self.get_connection() as conn:
+            if month:
+                result = self._execute(conn, '''
+                    SELECT calls_minutes, data_mb, sms_count, extra_charges
+                    FROM usage_stats
+                    WHERE customer_id = %s AND usage_month = %s
+                ''', (customer_id, month)).fetchone()
+            else:
+                result = self._execute(conn, '''
+                    SELECT calls_minutes, data_mb, sms_count, extra_charges
+                    FROM usage_stats
+                    WHERE customer_id = %s
+                    ORDER BY usage_month DESC
+                    LIMIT 1
+                ''', (customer_id,)).fetchone()
+            return dict(result) if result else None
+
+    # ================================
+    # Call Session Management
+    # ================================
+
+    def create_call_session(self, customer_id: str = None, agent_mode: str = 'ai') -> str:
+        """Create a new call session."""
+        session_id = str(uuid.uuid4())
+        with self.get_connection() as conn:
+            self._execute(conn, '''
+                INSERT INTO call_sessions (session_id, customer_id, agent_mode, start_time)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+            ''', (session_id, customer_id, agent_mode))
+        logger.info(f"New call session created: {session_id}")
+        return session_id
+
+    def end_call_session(self, session_id: str, resolution_status: str = None,
+                         customer_satisfaction: int = None, notes: str = None) -> bool:
+        """End a call session."""
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                UPDATE call_sessions
+                SET end_time = CURRENT_TIMESTAMP,
+                    duration_seconds = EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - start_time))::int,
+                    status = 'completed',
+                    resolution_status = %s,
+                    customer_satisfaction = %s,
+                    notes = %s
+                WHERE session_id = %s
+            ''', (resolution_status, customer_satisfaction, notes, session_id))
+            if result.rowcount == 0:
+                return False
+        logger.info(f"Call session ended: {session_id}")
+        return True
+
+    def add_call_message(self, session_id: str, role: str, content: str,
+                         message_type: str = 'text', tool_call: str = None,
+                         tool_result: str = None, processing_time_ms: int = None,
+                         specialist: str = None) -> int:
+        """Add a message to call session."""
+        with self.get_connection() as conn:
+            row = self._execute(conn, '''
+                INSERT INTO call_messages
+                (session_id, role, content, message_type, tool_call, tool_result, processing_time_ms, specialist)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING message_id
+            ''', (session_id, role, content, message_type, tool_call, tool_result, processing_time_ms,
+                  specialist)).fetchone()
+            return row['message_id']
+
+    def log_tool_usage(self, session_id: str, tool_name: str, parameters: Dict,
+                       result: str, execution_time_ms: int, success: bool = True,
+                       error_message: str = None) -> int:
+        """Log tool usage."""
+        with self.get_connection() as conn:
+            row = self._execute(conn, '''
+                INSERT INTO tool_usage_logs
+                (session_id, tool_name, parameters, result, execution_time_ms, success, error_message)
+                VALUES (%s, %s, %s::jsonb, %s, %s, %s, %s)
+                RETURNING log_id
+            ''', (session_id, tool_name, json.dumps(parameters), result,
+                  execution_time_ms, success, error_message)).fetchone()
+            return row['log_id']
+
+    def log_error(self, session_id: str, error_type: str, error_message: str,
+                  stack_trace: str = None, severity: str = 'medium') -> int:
+        """Log system errors."""
+        with self.get_connection() as conn:
+            row = self._execute(conn, '''
+                INSERT INTO error_logs (session_id, error_type, error_message, stack_trace, severity)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING error_id
+            ''', (session_id, error_type, error_message, stack_trace, severity)).fetchone()
+            return row['error_id']
+
+    def get_call_session_history(self, session_id: str) -> Dict:
+        """Get complete call session with messages."""
+        with self.get_connection() as conn:
+            session = self._execute(conn, '''
+                SELECT cs.*, c.name as customer_name
+                FROM call_sessions cs
+                LEFT JOIN customers c ON cs.customer_id = c.customer_id
+                WHERE cs.session_id = %s
+            ''', (session_id,)).fetchone()
+
+            if not session:
+                return None
+
+            messages = self._execute(conn, '''
+                SELECT role, content, timestamp, message_type, tool_call, tool_result
+                FROM call_messages
+                WHERE session_id = %s
+                ORDER BY timestamp, message_id
+            ''', (session_id,)).fetchall()
+
+            tools = self._execute(conn, '''
+                SELECT tool_name, parameters::text as parameters, result, execution_time_ms, success
+                FROM tool_usage_logs
+                WHERE session_id = %s
+                ORDER BY timestamp, log_id
+            ''', (session_id,)).fetchall()
+
+            return {
+                'session': dict(session),
+                'messages': [dict(msg) for msg in messages],
+                'tool_usage': [dict(tool) for tool in tools]
+            }
+
+    # ================================
+    # Analytics and Reporting
+    # ================================
+
+    def get_daily_metrics(self, date_str: str = None) -> Dict:
+        """Get daily performance metrics."""
+        if not date_str:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT
+                    COUNT(*) as total_calls,
+                    COUNT(*) FILTER (WHERE status = 'completed') as completed_calls,
+                    COUNT(*) FILTER (WHERE resolution_status = 'resolved') as resolved_calls,
+                    AVG(duration_seconds)::float8 as avg_duration,
+                    AVG(customer_satisfaction)::float8 as avg_satisfaction
+                FROM call_sessions
+                WHERE start_time >= %s::date AND start_time < %s::date + 1
+            ''', (date_str, date_str)).fetchone()
+            return dict(result) if result else {}
+
+    def get_tool_usage_stats(self, days: int = 30) -> List[Dict]:
+        """Get tool usage statistics."""
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT
+                    tool_name,
+                    COUNT(*) as usage_count,
+                    AVG(execution_time_ms)::float8 as avg_execution_time,
+                    (COUNT(*) FILTER (WHERE success) * 100.0 / COUNT(*)) as success_rate
+                FROM tool_usage_logs
+                WHERE timestamp >= now() - make_interval(days => %s)
+                GROUP BY tool_name
+                ORDER BY usage_count DESC
+            ''', (days,)).fetchall()
+            return [dict(row) for row in result]
+
+    def get_latency_percentiles(self, metric: str = 'response', dimension: str = None,
+                                minutes: int = 60) -> Dict:
+        """p50/p90/p99 of 'response' (per specialist) or 'tool' (per tool) latency over a window.
+
+        Computed exactly from the raw rows with ``percentile_cont``; without a
+        dimension all dimensions are merged.
+        """
+        if metric not in LATENCY_SOURCES:
+            raise ValueError(f"Unknown latency metric: {metric}")
+        table, value, dimension_column = LATENCY_SOURCES[metric]
+        window = f'''
+            FROM {table}
+            WHERE timestamp >= now() - make_interval(mins => %s) AND {value} IS NOT NULL
+        '''
+        dimension_filter = f" AND COALESCE({dimension_column}, '') = %s" if dimension is not None else ''
+        params = (minutes,) + ((dimension,) if dimension is not None else ())
+        percentiles = ', '.join(
+            f"percentile_cont({q}) WITHIN GROUP (ORDER BY {value})::float8 as latency_p{int(q * 100)}_ms"
+            for q in LATENCY_QUANTILES
+        )
+
+        with self.get_connection() as conn:
+            result = self._execute(conn, f'''
+                SELECT COUNT(*) as count, AVG({value})::float8 as avg_ms, {percentiles}
+                {window}{dimension_filter}
+            ''', params).fetchone()
+            dimensions = self._execute(conn, f'''
+                SELECT DISTINCT COALESCE({dimension_column}, '') as dimension {window}
+            ''', (minutes,)).fetchall()
+
+        return {
+            'metric': metric,
+            'dimension': dimension,
+            'window_minutes': minutes,
+            'count': result['count'],
+            'avg_ms': result['avg_ms'],
+            **{f'latency_p{int(q * 100)}_ms': result[f'latency_p{int(q * 100)}_ms'] or 0 for q in LATENCY_QUANTILES},
+            'dimensions': sorted(row['dimension'] for row in dimensions)
+        }
+
+    def get_monthly_revenue(self, year_month: str = None) -> Dict:
+        """Get monthly revenue statistics."""
+        if not year_month:
+            year_month = datetime.now().strftime('%Y-%m')
+
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT
+                    COUNT(*) as total_bills,
+                    SUM(amount) as total_amount,
+                    COUNT(*) FILTER (WHERE is_paid) as paid_bills,
+                    SUM(CASE WHEN is_paid THEN amount ELSE 0 END) as collected_amount,
+                    COUNT(*) FILTER (WHERE NOT is_paid) as unpaid_bills,
+                    SUM(CASE WHEN NOT is_paid THEN amount ELSE 0 END) as outstanding_amount
+                FROM bills
+                WHERE bill_month = %s
+            ''', (year_month,)).fetchone()
+            return dict(result) if result else {}
+
+    def get_package_statistics(self) -> List[Dict]:
+        """Get package subscription statistics."""
+        with self.get_connection() as conn:
+            results = self._execute(conn, '''
+                SELECT
+                    p.package_name,
+                    p.price,
+                    COUNT(cs.subscription_id) as active_subscriptions,
+                    SUM(p.price) as monthly_revenue
+                FROM packages p
+                LEFT JOIN customer_subscriptions cs ON p.package_id = cs.package_id
+                    AND cs.status = 'active'
+                WHERE p.is_active = TRUE
+                GROUP BY p.package_id, p.package_name, p.price
+                ORDER BY monthly_revenue DESC
+            ''').fetchall()
+            return [dict(stat) for stat in results]
+
+    def get_customer_lifetime_value(self, customer_id: str) -> Dict:
+        """Calculate customer lifetime value."""
+        with self.get_connection() as conn:
+            result = self._execute(conn, '''
+                SELECT
+                    c.registration_date,
+                    COUNT(b.bill_id) as total_bills,
+                    SUM(CASE WHEN b.is_paid THEN b.amount ELSE 0 END) as total_paid,
+                    AVG(CASE WHEN b.is_paid THEN b.amount ELSE NULL END) as avg_bill_amount,
+                    EXTRACT(EPOCH FROM (now() - c.registration_date))::float8 / 86400.0 as days_as_customer
+                FROM customers c
+                LEFT JOIN bills b ON c.customer_id = b.customer_id
+                WHERE c.customer_id = %s
+                GROUP BY c.customer_id
+            ''', (customer_id,)).fetchone()
+
+            if result:
+                data = dict(result)
+                months_as_customer = max(1, data['days_as_customer'] / 30)
+                data['monthly_value'] = data['total_paid'] / months_as_customer if data['total_paid'] else 0
+                return data
+
+            return {}
+
+    def get_overdue_bills(self, days_overdue: int = 0) -> List[Dict]:
+        """Get overdue bills."""
+        with self.get_connection() as conn:
+            results = self._execute(conn, '''
+                SELECT b.*, c.name as customer_name,
+                       (CURRENT_DATE - b.due_date) as days_overdue
+                FROM bills b
+                JOIN customers c ON b.customer_id = c.customer_id
+                WHERE b.is_paid = FALSE
+                AND b.due_date < CURRENT_DATE - %s
+                ORDER BY b.due_date
+            ''', (days_overdue,)).fetchall()
+            return [dict(bill) for bill in results]
+
+    def get_database_stats(self) -> Dict:
+        """Get database statistics."""
+        with self.get_connection() as conn:
+            stats = {}
+            tables = ['customers', 'packages', 'call_sessions', 'call_messages',
+                      'tool_usage_logs', 'bills', 'usage_stats', 'error_logs']
+
+            for table in tables:
+                count = conn.execute(f'SELECT COUNT(*) as count FROM {table}').fetchone()['count']
+                stats[f'{table}_count'] = count
+
+            size = conn.execute('SELECT pg_database_size(current_database()) as size').fetchone()['size']
+            stats['db_size_mb'] = size / (1024 * 1024)
+
+            stats['calls_last_24h'] = self._execute(conn, '''
+                SELECT COUNT(*) as count FROM call_sessions
+                WHERE start_time >= now() - interval '24 hours'
+            ''').fetchone()['count']
+
+            return stats
+
+    def get_system_health(self) -> Dict:
+        """Get system health metrics."""
+        with self.get_connection() as conn:
+            row = self._execute(conn, '''
+                SELECT
+                    (SELECT COUNT(*) FROM call_sessions
+                     WHERE start_time >= now() - interval '24 hours') as recent_calls,
+                    (SELECT COUNT(*) FROM error_logs
+                     WHERE timestamp >= now() - interval '24 hours'
+                     AND severity IN ('high', 'critical')) as recent_errors,
+                    (SELECT COUNT(*) FROM call_sessions WHERE status = 'active') as active_sessions,
+                    (SELECT AVG(processing_time_ms)::float8 FROM call_messages
+                     WHERE timestamp >= now() - interval '1 hour'
+                     AND processing_time_ms IS NOT NULL) as avg_response_time,
+                    (SELECT COUNT(*) FILTER (WHERE success) * 100.0 / NULLIF(COUNT(*), 0)
+                     FROM tool_usage_logs
+                     WHERE timestamp >= now() - interval '24 hours') as tool_success_rate
+            ''').fetchone()
+
+            return {
+                'recent_calls_24h': row['recent_calls'],
+                'recent_errors_24h': row['recent_errors'],
+                'active_sessions': row['active_sessions'],
+                'avg_response_time_ms': row['avg_response_time'] or 0,
+                'tool_success_rate': row['tool_success_rate'] or 0,
+                'status': 'healthy' if row['recent_errors'] < 10 else 'warning'
+            }
+
+    def close(self):
+        """Close the connection pool."""
+        self.pool.close()
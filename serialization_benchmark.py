@@ -0,0 +1,128 @@
+# serialization_benchmark.py
+"""Serialization cost of the large API payloads, before and after typed/orjson responses.
+
+For ``/session/{id}`` and the ``/analytics/*`` payloads it compares:
+
+- ``before``: StandardResponse (``data: Optional[Dict]``) validation, FastAPI's
+  jsonable_encoder and the stdlib JSONResponse encoder (the old path)
+- ``typed``: the endpoint's typed response model and FastJSONResponse (the path
+  of endpoints that return a model)
+- ``fast``: ``fast_response`` (no model pass, orjson directly), used by the
+  session, history and analytics endpoints
+
+and reports time per response, body size and gzip size at the configured level.
+
+Usage: python serialization_benchmark.py [messages] [iterations]
+"""
+import os
+import sys
+import gzip
+import time
+import logging
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+
+# The app opens call_center.db in the working directory at import time
+os.chdir(tempfile.mkdtemp(prefix="serialization_bench_"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+logging.disable(logging.CRITICAL)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import app_with_database as api
+
+TOOL_NAMES = ["get_user_info", "get_billing_info", "get_usage_stats", "pay_bill", "change_package"]
+
+
+def build_session(message_count: int) -> str:
+    """A long call session with messages and tool logs."""
+    services = api.services
+    session_id = services.session.create_call_session("1001", "ai")
+    for i in range(message_count):
+        role = "user" if i % 2 == 0 else "assistant"
+        tool = TOOL_NAMES[i % len(TOOL_NAMES)] if role == "assistant" else None
+        services.session.add_call_message(
+            session_id, role,
+            f"Mesaj {i}: faturamı ve kullanım detaylarımı öğrenmek istiyorum, paket değişikliği mümkün mü?",
+            tool_call=tool,
+            tool_result="Fatura bilgileri:\n2025-07: 150.0 TL - Ödenmedi\n2025-06: 150.0 TL - Ödendi" if tool else None,
+            processing_time_ms=100 + i % 400,
+        )
+        if tool:
+            services.session.log_tool_usage(
+                session_id, tool, {"customer_id": "1001"}, "ok", 50 + i % 300, success=i % 7 != 0
+            )
+    return session_id
+
+
+def encode_before(payload: Any, _model) -> bytes:
+    content = api.StandardResponse.model_validate({"status": "success", "data": payload}).model_dump(mode="json")
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def encode_typed(payload: Any, model) -> bytes:
+    content = model.model_validate({"status": "success", "data": payload}).model_dump(mode="json")
+    return api.FastJSONResponse(content).body
+
+
+def encode_fast(payload: Any, _model) -> bytes:
+    return api.fast_response(payload).body
+
+
+ENCODERS: Dict[str, Callable[[Any, Any], bytes]] = {
+    "before": encode_before,
+    "typed": encode_typed,
+    "fast": encode_fast,
+}
+
+
+def measure(payload: Any, model, iterations: int) -> Dict[str, Optional[Dict[str, float]]]:
+    results: Dict[str, Optional[Dict[str, float]]] = {}
+    for name, encode in ENCODERS.items():
+        try:
+            body = encode(payload, model)
+        except Exception:
+            # e.g. the old Dict-typed model rejects list payloads such as /analytics/tools
+            results[name] = None
+            continue
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encode(payload, model)
+        results[name] = {
+            "ms": (time.perf_counter() - start) * 1000 / iterations,
+            "bytes": len(body),
+            "gzip_bytes": len(gzip.compress(body, api.RESPONSE_GZIP_LEVEL)),
+        }
+    return results
+
+
+def run(message_count: int = 400, iterations: int = 200) -> List[Dict]:
+    services = api.services
+    session_id = build_session(message_count)
+    payloads = [
+        ("/session/{id}", services.session.get_call_session_history(session_id), api.SessionDetailsResponse),
+        ("/analytics/daily", services.analytics.get_daily_metrics(), api.DailyMetricsResponse),
+        ("/analytics/latency", services.analytics.get_latency_percentiles("response", None, 60), api.LatencyResponse),
+        ("/analytics/tools", services.analytics.get_tool_usage_stats(30), api.ToolUsageResponse),
+        ("/analytics/database", services.analytics.get_database_stats(), api.CountersResponse),
+    ]
+    return [
+        {"payload": path, **measure(payload, model, iterations)}
+        for path, payload, model in payloads
+    ]
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print(f"orjson: {'yes' if api.orjson is not None else 'no (stdlib fallback)'}, "
+          f"session messages: {messages}, iterations: {iterations}")
+    print(f"{'payload':22s} {'encoder':8s} {'ms/resp':>9s} {'bytes':>9s} {'gzip':>9s}")
+    for row in run(messages, iterations):
+        for name in ENCODERS:
+            stats = row[name]
+            if stats is None:
+                print(f"{row['payload']:22s} {name:8s} {'invalid':>9s}")
+            else:
+                print(f"{row['payload']:22s} {name:8s} {stats['ms']:9.3f} {stats['bytes']:9d} {stats['gzip_bytes']:9d}")
@@ -1,61 +1,603 @@
 # services.py
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Callable, Awaitable
+from collections import OrderedDict
 from datetime import datetime
+import copy
+import asyncio
+import time
+import inspect
 import logging
-from database import CallCenterDatabase
+import functools
+import threading
+from storage_backend import StorageBackend
 
 logger = logging.getLogger("services")
 
+# ================================
+# Read-through Cache
+# ================================
+
+# Varsayılan TTL (saniye) değerleri; 0 o metodun önbelleğini kapatır
+DEFAULT_CACHE_TTLS = {
+    'get_customer_info': 30,
+    'get_customer_bills': 30,
+    'get_customer_usage_stats': 60,
+    'get_available_packages': 300,
+}
+
+# data_versions kapsamı -> aynı veriyi tutan önbellek etiketi
+VERSION_SCOPE_TAGS = {
+    'packages': 'packages',
+    'bills': 'customer:{customer_id}:bills',
+    'usage': 'customer:{customer_id}:usage',
+}
+
+class TTLCache:
+    """Sınırlı boyutlu LRU önbellek; kayıt bazında süre ve etiketle geçersiz kılma."""
+    
+    def __init__(self, max_size: int = 1024, ttls: Dict[str, float] = None):
+        self.max_size = max_size
+        self.ttls = {**DEFAULT_CACHE_TTLS, **(ttls or {})}
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        # Her geçersiz kılmada artar; sürmekte olan okumalar eski sonucu yazmasın diye
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def ttl_for(self, method_name: str) -> float:
+        return self.ttls.get(method_name, 0)
+    
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+    
+    def get(self, key) -> tuple:
+        """(bulundu mu, değer) döner."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+    
+    def set(self, key, value, ttl: float, tags: Iterable[str] = (), if_version: int = None):
+        """Kaydı ekler; ``if_version`` verilmişse arada geçersiz kılma olduysa eklemez."""
+        tags = tuple(tags)
+        with self._lock:
+            if if_version is not None and if_version != self.version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def invalidate(self, *tags: str) -> int:
+        """Etiketlerden birini taşıyan tüm kayıtları siler."""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            self.version += 1
+            return len(keys)
+    
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'ttls': dict(self.ttls),
+            }
+
+# ================================
+# Request Coalescing (single-flight)
+# ================================
+
+class _FlightCounters:
+    """Metod bazında yürütme ve birleştirilen çağrı sayaçları."""
+    
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._by_name: Dict[str, List[int]] = {}
+    
+    def _count(self, key, leader: bool):
+        name = key[0] if isinstance(key, tuple) else str(key)
+        counters = self._by_name.setdefault(name, [0, 0])
+        if leader:
+            self.executions += 1
+            counters[0] += 1
+        else:
+            self.coalesced += 1
+            counters[1] += 1
+    
+    def stats(self) -> Dict:
+        return {
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls),
+            'by_method': {
+                name: {'executions': counts[0], 'coalesced': counts[1]}
+                for name, counts in sorted(self._by_name.items())
+            },
+        }
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight(_FlightCounters):
+    """Aynı anahtarla eşzamanlı gelen çağrılardan yalnızca birini yürütür;
+    diğer thread'ler bekleyip aynı sonucu (veya hatayı) paylaşır."""
+    
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[Any, _Flight] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Flight()
+            self._count(key, leader)
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return super().stats()
+
+class AsyncSingleFlight(_FlightCounters):
+    """``SingleFlight``in asyncio karşılığı: ortak çağrı kendi task'ında çalışır, herkes onu bekler.
+
+    Çağıranlar task'ı ``shield`` ile bekler; ilk çağıran dahil hiçbirinin
+    iptali ortak sonucu iptal etmez.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[Any, asyncio.Task] = {}
+    
+    async def do(self, key, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        flight_key = (key, id(loop))
+        task = self._calls.get(flight_key)
+        self._count(key, task is None)
+        if task is None:
+            task = self._calls[flight_key] = loop.create_task(coro_fn())
+            task.add_done_callback(lambda done: self._finish(flight_key, done))
+        return await asyncio.shield(task)
+    
+    def _finish(self, flight_key, task: asyncio.Task):
+        if self._calls.get(flight_key) is task:
+            del self._calls[flight_key]
+        if not task.cancelled():
+            task.exception()  # bekleyen kalmadıysa "never retrieved" uyarısını bastır
+
+# ================================
+# Customer Existence Index
+# ================================
+
+class CustomerExistenceIndex:
+    """Aktif müşteri id'lerinin bellekteki kümesi.
+
+    Uç noktaların "müşteri var mı" kontrolü ağır ``get_customer_info`` join'i
+    yerine buradan yapılır. Kümede olmayan id'ler için veritabanına birincil
+    anahtar sorgusuyla (``customer_exists``) danışılır; yani küme yalnızca
+    hızlandırır, yanlış 404 üretmez. Değişiklik akışı (change_outbox) olan
+    veritabanlarında ``customers`` değişiklikleri birkaç saniyede bir birincil
+    dosyadan artımlı uygulanır; okunmadan budanmış kayıt fark edilirse
+    (akışta boşluk) küme baştan yüklenir. Küme her modda ``reload_seconds``
+    aralıkla yeniden yüklenir. Akışı olmayan veritabanlarında ayrıca
+    servis katmanı dışından pasifleştirilen müşteriler
+    uzun süre "var" görünmesin diye pozitif sonuçlar ``positive_ttl_seconds``
+    dolunca veritabanından yeniden doğrulanır. Aktif id'leri listeleyemeyen
+    veritabanlarında küme devre dışıdır ve her kontrol veritabanına gider.
+    """
+    
+    def __init__(self, db: StorageBackend, refresh_seconds: float = 2.0, reload_seconds: float = 60.0,
+                 positive_ttl_seconds: float = 5.0):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self.positive_ttl_seconds = positive_ttl_seconds
+        self.incremental = hasattr(db, 'read_primary_changes')
+        self.enabled = True
+        self._ids: set = set()
+        # Yeniden yükleme modunda id -> son doğrulama zamanı (yoksa yükleme zamanı geçerli)
+        self._verified_at: Dict[str, float] = {}
+        self._seq = None
+        self._loaded_at = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.hits = 0
+        self.fallback_lookups = 0
+        self.fallback_found = 0
+        self.rechecks = 0
+        self.refreshes = 0
+    
+    def _load(self):
+        # Sıra numarası id'lerden önce alınır; aradaki değişiklikler sonraki yenilemede tekrar uygulanır
+        seq = (self.db.get_change_feed_status()['latest_seq'] or 0) if self.incremental else None
+        ids = self.db.get_active_customer_ids()
+        if ids is None:
+            self.enabled = False
+            logger.info("Customer existence index disabled: backend cannot list active customers")
+            return
+        with self._lock:
+            self._ids, self._seq = set(ids), seq
+            self._verified_at = {}
+            self._loaded_at = self._refreshed_at = time.monotonic()
+        logger.info(f"Customer existence index loaded: {len(ids)} active customers")
+    
+    def _apply_changes(self):
+        while True:
+            # Replika gecikmesi kümeye yansımasın diye akış birincil dosyadan okunur
+            batch = self.db.read_primary_changes('customer_existence_index', limit=1000,
+                                                 tables=['customers'], after_seq=self._seq)
+            # Kayıtlı tüketici değiliz: okumadığımız kayıtlar budanmış olabilir
+            if batch['first_available_seq'] > self._seq + 1:
+                logger.info(f"Customer existence index missed pruned changes after seq {self._seq}, reloading")
+                self._load()
+                return
+            with self._lock:
+                for change in batch['changes']:
+                    payload = change['payload'] or {}
+                    if change['operation'] != 'delete' and payload.get('status') == 'active':
+                        self._ids.add(str(change['row_key']))
+                    else:
+                        self._ids.discard(str(change['row_key']))
+                self._seq = batch['next_offset']
+            if not batch['has_more']:
+                break
+    
+    def refresh(self, force: bool = False):
+        # Tek yenileyici yeter; diğer thread'ler mevcut kümeyle (ve veritabanı yedeğiyle) devam eder
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at >= self.reload_seconds:
+                self._load()
+            elif self.incremental and (force or now - self._refreshed_at >= self.refresh_seconds):
+                self._refreshed_at = now
+                self._apply_changes()
+                self.refreshes += 1
+        finally:
+            self._refresh_lock.release()
+    
+    def exists(self, customer_id: str) -> bool:
+        customer_id = str(customer_id)
+        if not self.enabled:
+            return self.db.customer_exists(customer_id)
+        try:
+            self.refresh()
+        except Exception as e:
+            # Küme güncellenemezse her kontrol veritabanına düşer
+            logger.warning(f"Customer existence index refresh failed: {e}")
+            self._loaded_at = None
+            return self.db.customer_exists(customer_id)
+        if not self.enabled:
+            return self.db.customer_exists(customer_id)
+        
+        now = time.monotonic()
+        recheck = False
+        with self._lock:
+            if customer_id in self._ids:
+                verified_at = self._verified_at.get(customer_id, self._loaded_at)
+                if self.incremental or now - verified_at < self.positive_ttl_seconds:
+                    self.hits += 1
+                    return True
+                self.rechecks += 1
+                recheck = True
+            else:
+                self.fallback_lookups += 1
+        
+        found = self.db.customer_exists(customer_id)
+        with self._lock:
+            if found:
+                self.fallback_found += 0 if recheck else 1
+                self._ids.add(customer_id)
+                self._verified_at[customer_id] = now
+            else:
+                self._ids.discard(customer_id)
+                self._verified_at.pop(customer_id, None)
+        return found
+    
+    def mark(self, customer_id: str, active: bool):
+        """Servis katmanındaki yazmaları beklemeden kümeye yansıtır."""
+        with self._lock:
+            if active:
+                self._ids.add(str(customer_id))
+                self._verified_at[str(customer_id)] = time.monotonic()
+            else:
+                self._ids.discard(str(customer_id))
+                self._verified_at.pop(str(customer_id), None)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._ids),
+                'mode': ('change_feed' if self.incremental else 'reload') if self.enabled else 'disabled',
+                'hits': self.hits,
+                'fallback_lookups': self.fallback_lookups,
+                'fallback_found': self.fallback_found,
+                'rechecks': self.rechecks,
+                'refreshes': self.refreshes,
+                'change_seq': self._seq,
+            }
+
+def _call_arguments(signature: inspect.Signature, args: tuple, kwargs: dict) -> Dict:
+    bound = signature.bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.pop('self')
+    return arguments
+
+def cached(*tags: str):
+    """Servis metodunu önbellekten okur. Etiketler argüman adlarıyla biçimlenir,
+    örn. ``'customer:{customer_id}:bills'``. TTL ``TTLCache.ttls`` içinden metod adıyla alınır."""
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache, flight = self.cache, self.flight
+            ttl = cache.ttl_for(func.__name__) if cache is not None else 0
+            if not ttl and flight is None:
+                return func(self, *args, **kwargs)
+            
+            arguments = _call_arguments(signature, args, kwargs)
+            key = (func.__name__, repr(sorted(arguments.items())))
+            if ttl:
+                found, value = cache.get(key)
+                if found:
+                    # Çağıranlar sonucu değiştirebilir; önbellekteki kopya korunur
+                    return copy.deepcopy(value)
+            
+            # Geçersiz kılmadan sonra gelen çağrı, öncesinde başlamış yüklemeye katılmasın
+            version = cache.version if cache is not None else None
+            
+            def load():
+                value = func(self, *args, **kwargs)
+                if ttl:
+                    cache.set(key, value, ttl, [tag.format(**arguments) for tag in tags], if_version=version)
+                return value
+            
+            # Aynı anda ıskalayan çağrılar tek sorguyu paylaşır
+            value = flight.do((*key, version), load) if flight is not None else load()
+            return copy.deepcopy(value)
+        wrapper.cache_tags = tags
+        return wrapper
+    return decorator
+
+def cached_many(single_method: str):
+    """Çok anahtarlı okuma. Önbellekte olan id'ler tekli metodun kayıtlarından okunur;
+    kalanlar tek sorguyla getirilir ve tekli metodun anahtarlarıyla önbelleğe yazılır."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, customer_ids: List[str], *args, **kwargs):
+            customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+            cache = self.cache
+            ttl = cache.ttl_for(single_method) if cache is not None else 0
+            if not ttl:
+                return func(self, customer_ids, *args, **kwargs)
+            
+            single = getattr(type(self), single_method)
+            signature = inspect.signature(single.__wrapped__)
+            results, pending = {}, {}
+            for customer_id in customer_ids:
+                arguments = _call_arguments(signature, (customer_id, *args), kwargs)
+                key = (single_method, repr(sorted(arguments.items())))
+                found, value = cache.get(key)
+                if found:
+                    results[customer_id] = copy.deepcopy(value)
+                else:
+                    pending[customer_id] = (key, arguments)
+            
+            if pending:
+                version = cache.version
+                fetched = func(self, list(pending), *args, **kwargs)
+                for customer_id, (key, arguments) in pending.items():
+                    value = fetched.get(customer_id)
+                    cache.set(key, value, ttl, [tag.format(**arguments) for tag in single.cache_tags],
+                              if_version=version)
+                    results[customer_id] = copy.deepcopy(value)
+            return {customer_id: results[customer_id] for customer_id in customer_ids}
+        return wrapper
+    return decorator
+
+def invalidates(*tags: str):
+    """Yazma metodundan sonra (başarısız olsa bile) ilgili önbellek etiketlerini siler."""
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                if self.cache is not None:
+                    arguments = _call_arguments(signature, args, kwargs)
+                    self.cache.invalidate(*(tag.format(**arguments) for tag in tags))
+        return wrapper
+    return decorator
+
+# ================================
+# Services
+# ================================
+
 class CustomerService:
-    def __init__(self, db: CallCenterDatabase):
+    def __init__(self, db: StorageBackend, cache: TTLCache = None, flight: SingleFlight = None,
+                 index: CustomerExistenceIndex = None):
         self.db = db
+        self.cache = cache
+        self.flight = flight
+        self.index = index
     
+    def customer_exists(self, customer_id: str) -> bool:
+        """Aktif müşteri kontrolü (bellekteki indeks, yoksa birincil anahtar sorgusu)."""
+        if self.index is not None:
+            return self.index.exists(customer_id)
+        return self.db.customer_exists(customer_id)
+    
+    @cached('customer:{customer_id}:info', 'customer:{customer_id}:balance', 'customers')
     def get_customer_info(self, customer_id: str) -> Optional[Dict]:
         """Müşteri bilgilerini getirir."""
         return self.db.get_customer_info(customer_id)
     
+    @cached_many('get_customer_info')
+    def get_customer_info_many(self, customer_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """Birden çok müşterinin bilgileri tek sorguda (bulunamayanlar None)."""
+        return self.db.get_customer_info_many(customer_ids)
+    
+    @invalidates('customer:{customer_id}:info')
     def create_customer(self, customer_id: str, name: str, **kwargs) -> bool:
         """Yeni müşteri oluşturur."""
-        return self.db.create_customer(customer_id, name, **kwargs)
+        created = self.db.create_customer(customer_id, name, **kwargs)
+        if created and self.index is not None:
+            self.index.mark(customer_id, True)
+        return created
     
+    @invalidates('customer:{customer_id}:info')
     def update_customer_info(self, customer_id: str, **kwargs) -> bool:
         """Müşteri bilgilerini günceller."""
-        return self.db.update_customer_info(customer_id, **kwargs)
+        updated = self.db.update_customer_info(customer_id, **kwargs)
+        if updated and kwargs.get('status') and self.index is not None:
+            self.index.mark(customer_id, kwargs['status'] == 'active')
+        return updated
     
     def get_customer_call_history(self, customer_id: str, limit: int = 10) -> List[Dict]:
         """Müşteri görüşme geçmişi."""
         return self.db.get_customer_call_history(customer_id, limit)
+    
+    def get_customer_call_history_many(self, customer_ids: List[str], limit: int = 10) -> Dict[str, List[Dict]]:
+        """Birden çok müşterinin görüşme geçmişi tek sorguda."""
+        return self.db.get_customer_call_history_many(customer_ids, limit)
 
 class PackageService:
-    def __init__(self, db: CallCenterDatabase):
+    def __init__(self, db: StorageBackend, cache: TTLCache = None, flight: SingleFlight = None):
         self.db = db
+        self.cache = cache
+        self.flight = flight
     
+    @cached('packages')
     def get_available_packages(self) -> List[Dict]:
         """Mevcut paketleri getirir."""
         return self.db.get_available_packages()
     
+    @invalidates('customer:{customer_id}:info')
     def change_customer_package(self, customer_id: str, new_package_name: str) -> bool:
         """Müşteri paketini değiştirir."""
         return self.db.change_customer_package(customer_id, new_package_name)
+    
+    @invalidates('customer:{customer_id}:info')
+    def change_package_checked(self, customer_id: str, new_package_name: str) -> Dict:
+        """Doğrulama ve paket değişikliğini tek işlemde yapar; sonuç kodu döner."""
+        return self.db.change_package_checked(customer_id, new_package_name)
+    
+    @invalidates('customers')
+    def migrate_package_cohort(self, target_package_name: str, **cohort) -> Dict:
+        """Bir müşteri grubunu toplu olarak yeni pakete taşır (dry_run ile sadece sayar)."""
+        return self.db.migrate_package_cohort(target_package_name, **cohort)
 
 class BillingService:
-    def __init__(self, db: CallCenterDatabase):
+    def __init__(self, db: StorageBackend, cache: TTLCache = None, flight: SingleFlight = None):
         self.db = db
+        self.cache = cache
+        self.flight = flight
     
+    @cached('customer:{customer_id}:bills', 'customers')
     def get_customer_bills(self, customer_id: str) -> List[Dict]:
         """Müşteri faturalarını getirir."""
         return self.db.get_customer_bills(customer_id)
     
+    @cached_many('get_customer_bills')
+    def get_customer_bills_many(self, customer_ids: List[str]) -> Dict[str, List[Dict]]:
+        """Birden çok müşterinin faturaları tek sorguda."""
+        return self.db.get_customer_bills_many(customer_ids)
+    
+    @invalidates('customer:{customer_id}:bills', 'customer:{customer_id}:balance', 'customer:{customer_id}:info')
     def pay_bill(self, customer_id: str, bill_month: str, amount: float, payment_method: str = 'api') -> bool:
         """Fatura ödemesi yapar."""
         return self.db.pay_bill(customer_id, bill_month, amount, payment_method)
     
+    @invalidates('customer:{customer_id}:bills', 'customer:{customer_id}:balance', 'customer:{customer_id}:info')
+    def pay_bill_checked(self, customer_id: str, bill_month: str, amount: float, payment_method: str = 'api') -> Dict:
+        """Doğrulama ve ödemeyi tek işlemde yapar; sonuç kodu döner (ok, bill_not_found, already_paid, ...)."""
+        return self.db.pay_bill_checked(customer_id, bill_month, amount, payment_method)
+    
+    @cached('customer:{customer_id}:usage', 'customers')
     def get_customer_usage_stats(self, customer_id: str, month: str = None) -> Optional[Dict]:
         """Kullanım istatistiklerini getirir."""
         return self.db.get_customer_usage_stats(customer_id, month)
+    
+    @cached_many('get_customer_usage_stats')
+    def get_customer_usage_stats_many(self, customer_ids: List[str], month: str = None) -> Dict[str, Optional[Dict]]:
+        """Birden çok müşterinin kullanım istatistikleri tek sorguda."""
+        return self.db.get_customer_usage_stats_many(customer_ids, month)
 
 class SessionService:
-    def __init__(self, db: CallCenterDatabase):
+    def __init__(self, db: StorageBackend):
         self.db = db
     
     def create_call_session(self, customer_id: str = None, agent_mode: str = 'ai') -> str:
@@ -85,16 +627,39 @@ class SessionService:
         return self.db.get_call_session_history(session_id)
 
 class AnalyticsService:
-    def __init__(self, db: CallCenterDatabase):
+    def __init__(self, db: StorageBackend, engine=None):
         self.db = db
+        # Opsiyonel kolon bazlı rapor motoru (DuckDBAnalyticsEngine); yoksa SQLite kullanılır
+        self.engine = engine
+    
+    @property
+    def _reports(self):
+        return self.engine or self.db
     
     def get_daily_metrics(self, date_str: str = None) -> Dict:
         """Günlük metrikleri getirir."""
-        return self.db.get_daily_metrics(date_str)
+        return self._reports.get_daily_metrics(date_str)
     
     def get_tool_usage_stats(self, days: int = 30) -> List[Dict]:
         """Araç kullanım istatistiklerini getirir."""
-        return self.db.get_tool_usage_stats(days)
+        return self._reports.get_tool_usage_stats(days)
+    
+    def get_latency_percentiles(self, metric: str = 'response', dimension: str = None,
+                                minutes: int = 60) -> Dict:
+        """Yanıt (uzman bazında) veya araç gecikmesinin p50/p90/p99 değerleri."""
+        return self.db.get_latency_percentiles(metric, dimension, minutes)
+    
+    def get_monthly_revenue(self, year_month: str = None) -> Dict:
+        """Aylık gelir istatistiklerini getirir."""
+        return self._reports.get_monthly_revenue(year_month)
+    
+    def get_package_statistics(self) -> List[Dict]:
+        """Paket abonelik istatistiklerini getirir."""
+        return self._reports.get_package_statistics()
+    
+    def get_customer_lifetime_value(self, customer_id: str) -> Dict:
+        """Müşteri yaşam boyu değerini hesaplar."""
+        return self._reports.get_customer_lifetime_value(customer_id)
     
     def get_database_stats(self) -> Dict:
         """Veritabanı istatistiklerini getirir."""
@@ -104,32 +669,117 @@ class AnalyticsService:
         """Sistem sağlığını kontrol eder."""
         return self.db.get_system_health()
 
+class CollectionsService:
+    def __init__(self, db: StorageBackend):
+        self.db = db
+    
+    def claim_items(self, worker_id: str, batch_size: int = 20, lease_seconds: int = 900) -> List[Dict]:
+        """Tahsilat kuyruğundan en öncelikli işleri çalışana kiralar."""
+        return self.db.claim_collection_items(worker_id, batch_size, lease_seconds)
+    
+    def complete_item(self, customer_id: str, bill_month: str, worker_id: str,
+                      outcome: str, retry_after_hours: int = 24) -> bool:
+        """Tamamlanan tahsilat işini kaydeder."""
+        return self.db.complete_collection_item(customer_id, bill_month, worker_id, outcome, retry_after_hours)
+    
+    def get_page(self, limit: int = 50, cursor: str = None) -> Dict:
+        """Tahsilat kuyruğunu sayfa sayfa getirir."""
+        return self.db.get_collections_page(limit, cursor)
+    
+    def get_summary(self) -> List[Dict]:
+        """Öncelik bazında kuyruk özeti."""
+        return self.db.get_collections_summary()
+
+class ChangeFeedService:
+    def __init__(self, db: StorageBackend):
+        self.db = db
+    
+    def read_changes(self, consumer: str, limit: int = 500, tables: List[str] = None) -> Dict:
+        """Tüketicinin son onayladığı sıradan sonraki değişiklikleri getirir."""
+        return self.db.read_changes(consumer, limit, tables)
+    
+    def commit_offset(self, consumer: str, seq: int) -> bool:
+        """İşlenen değişikliklerin sıra numarasını kaydeder."""
+        return self.db.commit_change_offset(consumer, seq)
+    
+    def register_consumer(self, consumer: str, from_latest: bool = True) -> int:
+        """Yeni tüketici kaydeder."""
+        return self.db.register_change_consumer(consumer, from_latest)
+    
+    def get_status(self) -> Dict:
+        """Outbox sınırları ve tüketici gecikmeleri."""
+        return self.db.get_change_feed_status()
+
+class DataVersionService:
+    def __init__(self, db: StorageBackend, cache: TTLCache = None, max_scopes: int = 10000):
+        self.db = db
+        self.cache = cache
+        # Kapsam başına son görülen sürüm (LRU; düşen kapsam bir sonraki
+        # okumada yalnızca fazladan bir geçersiz kılmaya yol açar)
+        self.max_scopes = max_scopes
+        self._seen: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_stamp(self, scope: str) -> Optional[Dict]:
+        """Veri kapsamının sürüm damgası (ETag/Last-Modified için).
+        
+        Sürüm son görülenden farklıysa (ör. başka bir süreç yazdıysa) ilgili
+        önbellek kaydı düşürülür; böylece yeni ETag eski gövdeyle eşleşmez.
+        """
+        stamp = self.db.get_data_version(scope)
+        if stamp is None or self.cache is None:
+            return stamp
+        with self._lock:
+            previous = self._seen.pop(scope, None)
+            self._seen[scope] = stamp['version']
+            while len(self._seen) > self.max_scopes:
+                self._seen.popitem(last=False)
+        if previous != stamp['version']:
+            name, _, customer_id = scope.partition(':')
+            tag = VERSION_SCOPE_TAGS.get(name)
+            if tag:
+                self.cache.invalidate(tag.format(customer_id=customer_id))
+        return stamp
+
 # Service Factory
 class ServiceFactory:
-    def __init__(self, database: CallCenterDatabase):
+    def __init__(self, database: StorageBackend, analytics_engine=None,
+                 cache_size: int = 1024, cache_ttls: Dict[str, float] = None, coalesce: bool = True,
+                 customer_index: bool = True):
         self.db = database
+        self.analytics_engine = analytics_engine
+        # cache_size=0 önbelleği tamamen kapatır
+        self.cache = TTLCache(cache_size, cache_ttls) if cache_size > 0 else None
+        # Eşzamanlı aynı okumaları birleştirir (coalesce=False ile kapatılır)
+        self.flight = SingleFlight() if coalesce else None
+        self.async_flight = AsyncSingleFlight() if coalesce else None
+        # İlk kontrolde yüklenir
+        self.customer_index = CustomerExistenceIndex(database) if customer_index else None
         self._customer_service = None
         self._package_service = None
         self._billing_service = None
         self._session_service = None
         self._analytics_service = None
+        self._collections_service = None
+        self._changes_service = None
+        self._versions_service = None
     
     @property
     def customer(self) -> CustomerService:
         if not self._customer_service:
-            self._customer_service = CustomerService(self.db)
+            self._customer_service = CustomerService(self.db, self.cache, self.flight, self.customer_index)
         return self._customer_service
     
     @property
     def package(self) -> PackageService:
         if not self._package_service:
-            self._package_service = PackageService(self.db)
+            self._package_service = PackageService(self.db, self.cache, self.flight)
         return self._package_service
     
     @property
     def billing(self) -> BillingService:
         if not self._billing_service:
-            self._billing_service = BillingService(self.db)
+            self._billing_service = BillingService(self.db, self.cache, self.flight)
         return self._billing_service
     
     @property
@@ -141,5 +791,48 @@ class ServiceFactory:
     @property
     def analytics(self) -> AnalyticsService:
         if not self._analytics_service:
-            self._analytics_service = AnalyticsService(self.db)
-        return self._analytics_service
\ No newline at end of file
+            self._analytics_service = AnalyticsService(self.db, self.analytics_engine)
+        return self._analytics_service
+    
+    @property
+    def collections(self) -> CollectionsService:
+        if not self._collections_service:
+            self._collections_service = CollectionsService(self.db)
+        return self._collections_service
+    
+    @property
+    def changes(self) -> ChangeFeedService:
+        if not self._changes_service:
+            self._changes_service = ChangeFeedService(self.db)
+        return self._changes_service
+    
+    @property
+    def versions(self) -> DataVersionService:
+        if not self._versions_service:
+            self._versions_service = DataVersionService(self.db, self.cache)
+        return self._versions_service
+    
+    def cache_stats(self) -> Dict:
+        """Önbellek isabet/ıska/tahliye sayaçları."""
+        return self.cache.stats() if self.cache is not None else {'enabled': False}
+    
+    def clear_cache(self):
+        if self.cache is not None:
+            self.cache.clear()
+    
+    async def call_async(self, method: Callable, *args, **kwargs) -> Any:
+        """Bloklayan servis metodunu thread'de çalıştırır; aynı argümanlarla eşzamanlı
+        gelen coroutine'ler tek çağrıyı bekler."""
+        run = lambda: asyncio.to_thread(method, *args, **kwargs)
+        if self.async_flight is None:
+            return await run()
+        # Önbellek sürümü anahtarda: yazmadan sonra gelen çağrı yeni bir okuma başlatır
+        version = self.cache.version if self.cache is not None else None
+        key = (method.__qualname__, repr(args), repr(sorted(kwargs.items())), version)
+        return copy.deepcopy(await self.async_flight.do(key, run))
+    
+    def flight_stats(self) -> Dict:
+        """Birleştirilen (coalesced) çağrı sayaçları."""
+        if self.flight is None:
+            return {'enabled': False}
+        return {'threads': self.flight.stats(), 'asyncio': self.async_flight.stats()}
\ No newline at end of file
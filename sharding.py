@@ -0,0 +1,835 @@
+# sharding.py
+import zlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+from typing import Dict, List, Optional, Tuple, Callable, Any
+
+from database import CallCenterDatabase, DATA_VERSION_TABLES
+from storage_backend import StorageBackend
+
+logger = logging.getLogger("sharding")
+
+# Tables that belong to a customer, in copy order (parents first)
+CUSTOMER_TABLES = ['customers', 'customer_balances', 'customer_subscriptions', 'bills', 'usage_stats',
+                   'balance_ledger', 'balance_snapshots']
+# Tables that belong to a session of the customer
+SESSION_TABLES = ['call_sessions', 'call_messages', 'tool_usage_logs', 'error_logs', 'session_transcripts']
+# Reference data replicated to every shard
+REFERENCE_TABLES = ['packages', 'package_features']
+# Columns holding balance_ledger entry ids; entry ids are renumbered on the target shard
+LEDGER_ENTRY_ID_COLUMNS = {
+    'balance_ledger': 'entry_id',
+    'balance_snapshots': 'as_of_entry_id',
+    'customer_balances': 'ledger_entry_id',
+}
+# Session -> customer entries kept for routing session writes (LRU)
+SESSION_OWNER_CACHE_SIZE = 10000
+
+SAMPLE_CUSTOMERS = [
+    ("1001", "Ali Veli", "5551234567", "ali.veli@email.com", "İstanbul", "Premium", 243.45),
+    ("1002", "Ayşe Demir", "5552345678", "ayse.demir@email.com", "Ankara", "Standart", 0.00),
+    ("1003", "Mehmet Can", "5553456789", "mehmet.can@email.com", "İzmir", "Gold", 1240.00),
+    ("1004", "Elif Yılmaz", "5554567890", "elif.yilmaz@email.com", "Bursa", "Silver", 5455.75),
+    ("1005", "Berke Kara", "5555678901", "berke.kara@email.com", "Antalya", "Bronze", 5415.20),
+]
+
+
+def stable_shard_index(customer_id: str, num_shards: int) -> int:
+    """Stable hash of the customer id (independent of PYTHONHASHSEED)."""
+    return zlib.crc32(str(customer_id).encode('utf-8')) % num_shards
+
+
+class CustomerLocks:
+    """Per-customer shared/exclusive locks.
+
+    Routed operations hold a customer's shared lock from shard lookup until
+    they return; ``migrate_customer`` holds the exclusive lock for the whole
+    move. A pending exclusive request blocks new shared holders, so a busy
+    customer cannot starve its migration. Callers that need several customers
+    must acquire them in sorted order.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared: Dict[str, int] = {}
+        self._exclusive = set()
+
+    @contextmanager
+    def shared(self, customer_id: str):
+        with self._cond:
+            while customer_id in self._exclusive:
+                self._cond.wait()
+            self._shared[customer_id] = self._shared.get(customer_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                remaining = self._shared.pop(customer_id) - 1
+                if remaining:
+                    self._shared[customer_id] = remaining
+                else:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self, customer_id: str):
+        with self._cond:
+            while customer_id in self._exclusive:
+                self._cond.wait()
+            self._exclusive.add(customer_id)
+            while self._shared.get(customer_id):
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive.discard(customer_id)
+                self._cond.notify_all()
+
+
+class ShardedCallCenterDatabase(StorageBackend):
+    """Routes customer-scoped operations to one of N SQLite shard files.
+
+    A customer lives on ``crc32(customer_id) % N`` unless the shard directory
+    holds an override (customers that were moved by ``migrate_customer`` or are
+    waiting to be moved by ``reshard``). Sessions live on their customer's
+    shard; anonymous sessions live on shard 0. Packages and features are
+    replicated from shard 0 to every shard. Reports fan out to all shards in
+    parallel and are merged here.
+
+    Every customer-scoped call, including session writes (resolved to the
+    session's customer), runs under the customer's shared lock, and a
+    migration takes it exclusively, so no write can land on the old shard
+    after the customer has been copied away.
+    """
+
+    def __init__(self, shard_paths: List[str], directory_path: str = "shard_directory.db",
+                 seed_sample_data: bool = True, read_pool_size: int = 2):
+        if not shard_paths:
+            raise ValueError("En az bir shard yolu gerekli")
+
+        self.directory_path = directory_path
+        self.read_pool_size = read_pool_size
+        self.shards: List[CallCenterDatabase] = [
+            CallCenterDatabase(path, read_pool_size=read_pool_size, seed_sample_data=False)
+            for path in shard_paths
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        self._overrides: Dict[str, int] = {}
+        self._locks = CustomerLocks()
+        # session_id -> customer_id (None for anonymous sessions)
+        self._session_owners: OrderedDict = OrderedDict()
+        self._session_owners_lock = threading.Lock()
+
+        is_new = self._init_directory()
+        self.sync_reference_data()
+        if is_new and seed_sample_data:
+            self._seed_sample_customers()
+        logger.info(f"Sharded database initialized: {len(self.shards)} shards")
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shards)
+
+    # ================================
+    # Shard Directory
+    # ================================
+
+    @contextmanager
+    def _directory(self):
+        conn = sqlite3.connect(self.directory_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _init_directory(self) -> bool:
+        """Create the directory and load overrides. Returns True for a fresh directory."""
+        with self._directory() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS shard_config (
+                    key VARCHAR(50) PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS customer_shards (
+                    customer_id VARCHAR(10) PRIMARY KEY,
+                    shard_index INTEGER NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            ''')
+            row = conn.execute("SELECT value FROM shard_config WHERE key = 'num_shards'").fetchone()
+            if row and int(row['value']) != self.num_shards:
+                raise ValueError(
+                    f"Shard directory {row['value']} shard için oluşturulmuş; "
+                    f"shard sayısını değiştirmek için reshard() kullanın"
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO shard_config (key, value) VALUES ('num_shards', ?)",
+                (str(self.num_shards),)
+            )
+            self._overrides = {
+                r['customer_id']: r['shard_index']
+                for r in conn.execute('SELECT customer_id, shard_index FROM customer_shards')
+            }
+            return row is None
+
+    def shard_index_for_customer(self, customer_id: str) -> int:
+        """Shard index that currently owns the customer."""
+        override = self._overrides.get(str(customer_id))
+        if override is not None:
+            return override
+        return stable_shard_index(customer_id, self.num_shards)
+
+    def _on_customer_shard(self, customer_id: str, operation: Callable[[CallCenterDatabase], Any]) -> Any:
+        """Run an operation on the customer's shard under the customer's shared lock."""
+        customer_id = str(customer_id)
+        with self._locks.shared(customer_id):
+            return operation(self.shards[self.shard_index_for_customer(customer_id)])
+
+    def _remember_session(self, session_id: str, customer_id: Optional[str]):
+        with self._session_owners_lock:
+            self._session_owners[session_id] = customer_id
+            self._session_owners.move_to_end(session_id)
+            while len(self._session_owners) > SESSION_OWNER_CACHE_SIZE:
+                self._session_owners.popitem(last=False)
+
+    def _session_owner(self, session_id: str) -> Tuple[bool, Optional[str]]:
+        """(found, customer_id) of a session: cached owner first, then a parallel probe of all shards."""
+        with self._session_owners_lock:
+            if session_id in self._session_owners:
+                self._session_owners.move_to_end(session_id)
+                return True, self._session_owners[session_id]
+
+        def probe(shard: CallCenterDatabase) -> Optional[Tuple]:
+            with shard.get_connection() as conn:
+                row = conn.execute(
+                    'SELECT customer_id FROM call_sessions WHERE session_id = ?', (session_id,)
+                ).fetchone()
+                return tuple(row) if row else None
+
+        # A migration that finishes between two shard reads can hide the
+        # session from one probe; the second one sees it on its new shard
+        for _ in range(2):
+            for row in self._executor.map(probe, self.shards):
+                if row is not None:
+                    self._remember_session(session_id, row[0])
+                    return True, row[0]
+        return False, None
+
+    def _on_session_shard(self, session_id: Optional[str], operation: Callable[[CallCenterDatabase], Any],
+                          missing: Any = None, create_missing: bool = True) -> Any:
+        """Run an operation on the session's shard; customer sessions go through the customer lock.
+
+        Anonymous (and, with ``create_missing``, unknown) sessions use shard 0.
+        """
+        found, customer_id = self._session_owner(session_id) if session_id is not None else (True, None)
+        if not found and not create_missing:
+            return missing
+        if customer_id is None:
+            return operation(self.shards[0])
+        return self._on_customer_shard(customer_id, operation)
+
+    # ================================
+    # Reference Data
+    # ================================
+
+    def sync_reference_data(self):
+        """Replicate packages and features from shard 0 to every other shard."""
+        with self.shards[0].get_connection() as source:
+            snapshot = {
+                table: [tuple(row) for row in source.execute(f'SELECT * FROM {table}')]
+                for table in REFERENCE_TABLES
+            }
+            columns = {
+                table: [c[1] for c in source.execute(f'PRAGMA table_info({table})')]
+                for table in REFERENCE_TABLES
+            }
+
+        for shard in self.shards[1:]:
+            with shard.get_connection() as conn:
+                for table in reversed(REFERENCE_TABLES):
+                    conn.execute(f'DELETE FROM {table}')
+                for table in REFERENCE_TABLES:
+                    if snapshot[table]:
+                        placeholders = ', '.join('?' * len(columns[table]))
+                        conn.executemany(
+                            f"INSERT INTO {table} ({', '.join(columns[table])}) VALUES ({placeholders})",
+                            snapshot[table]
+                        )
+        logger.info("Reference data replicated to all shards")
+
+    def _seed_sample_customers(self):
+        for customer_id, name, phone, email, address, package, balance in SAMPLE_CUSTOMERS:
+            self.create_customer(customer_id, name, phone, email, address)
+            self.change_customer_package(customer_id, package)
+            self.update_customer_balance(customer_id, balance, 'set')
+
+        for customer_id, month, amount, due_date, is_paid in [
+            ("1001", "2025-06", 145.00, "2025-07-01", False),
+            ("1001", "2025-07", 150.00, "2025-08-01", False),
+            ("1002", "2025-07", 75.00, "2025-08-01", True),
+            ("1003", "2025-07", 100.00, "2025-08-01", False),
+        ]:
+            self.create_bill(customer_id, month, amount, due_date)
+            if is_paid:
+                self.pay_bill(customer_id, month, amount, 'seed')
+
+        for customer_id, month, calls, data_mb, sms in [
+            ("1001", "2025-07", 120, 20480, 30),
+            ("1002", "2025-07", 80, 15360, 25),
+            ("1003", "2025-07", 200, 30720, 50),
+        ]:
+            self.update_usage_stats(customer_id, month, calls, data_mb, sms, 0.0)
+
+    # ================================
+    # Customer-Scoped Operations
+    # ================================
+
+    def get_customer_info(self, customer_id: str) -> Optional[Dict]:
+        return self._on_customer_shard(customer_id, lambda shard: shard.get_customer_info(customer_id))
+
+    def customer_exists(self, customer_id: str) -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.customer_exists(customer_id))
+
+    def get_active_customer_ids(self) -> List[str]:
+        return [cid for ids in self._fan_out(lambda shard: shard.get_active_customer_ids()) for cid in ids]
+
+    def create_customer(self, customer_id: str, name: str, phone: str = None,
+                        email: str = None, address: str = None) -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.create_customer(customer_id, name, phone, email, address))
+
+    def update_customer_info(self, customer_id: str, **kwargs) -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.update_customer_info(customer_id, **kwargs))
+
+    def update_customer_balance(self, customer_id: str, amount: float, operation: str = 'add') -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.update_customer_balance(customer_id, amount, operation))
+
+    def get_customer_call_history(self, customer_id: str, limit: int = 10) -> List[Dict]:
+        return self._on_customer_shard(customer_id, lambda shard: shard.get_customer_call_history(customer_id, limit))
+
+    def get_available_packages(self) -> List[Dict]:
+        return self.shards[0].get_available_packages()
+
+    def get_data_version(self, scope: str) -> Optional[Dict]:
+        # Reference data is written on shard 0; customer scopes live with the customer
+        _, _, customer_id = scope.partition(':')
+        if not customer_id:
+            return self.shards[0].get_data_version(scope)
+        return self._on_customer_shard(customer_id, lambda shard: shard.get_data_version(scope))
+
+    def change_customer_package(self, customer_id: str, new_package_name: str) -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.change_customer_package(customer_id, new_package_name))
+
+    def change_package_checked(self, customer_id: str, new_package_name: str) -> Dict:
+        return self._on_customer_shard(customer_id, lambda shard: shard.change_package_checked(customer_id, new_package_name))
+
+    def get_customer_bills(self, customer_id: str) -> List[Dict]:
+        return self._on_customer_shard(customer_id, lambda shard: shard.get_customer_bills(customer_id))
+
+    def create_bill(self, customer_id: str, bill_month: str, amount: float, due_date: str) -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.create_bill(customer_id, bill_month, amount, due_date))
+
+    def pay_bill(self, customer_id: str, bill_month: str, amount: float, payment_method: str = 'online') -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.pay_bill(customer_id, bill_month, amount, payment_method))
+
+    def pay_bill_checked(self, customer_id: str, bill_month: str, amount: float,
+                         payment_method: str = 'online') -> Dict:
+        return self._on_customer_shard(customer_id, lambda shard: shard.pay_bill_checked(customer_id, bill_month, amount, payment_method))
+
+    def get_customer_usage_stats(self, customer_id: str, month: str = None) -> Optional[Dict]:
+        return self._on_customer_shard(customer_id, lambda shard: shard.get_customer_usage_stats(customer_id, month))
+
+    def update_usage_stats(self, customer_id: str, usage_month: str, calls_minutes: int = None,
+                           data_mb: int = None, sms_count: int = None, extra_charges: float = None) -> bool:
+        return self._on_customer_shard(customer_id, lambda shard: shard.update_usage_stats(
+            customer_id, usage_month, calls_minutes, data_mb, sms_count, extra_charges
+        ))
+
+    def get_customer_lifetime_value(self, customer_id: str) -> Dict:
+        return self._on_customer_shard(customer_id, lambda shard: shard.get_customer_lifetime_value(customer_id))
+
+    def _batch_by_shard(self, customer_ids: List[str],
+                        operation: Callable[[CallCenterDatabase, List[str]], Dict]) -> Dict:
+        """Split ids by owning shard, run one batch query per shard in parallel, keep input order."""
+        customer_ids = [str(cid) for cid in dict.fromkeys(customer_ids)]
+        with ExitStack() as stack:
+            # Sorted acquisition keeps concurrent batches from deadlocking each other
+            for customer_id in sorted(customer_ids):
+                stack.enter_context(self._locks.shared(customer_id))
+            groups: Dict[int, List[str]] = {}
+            for customer_id in customer_ids:
+                groups.setdefault(self.shard_index_for_customer(customer_id), []).append(customer_id)
+
+            futures = [
+                self._executor.submit(operation, self.shards[index], ids) for index, ids in groups.items()
+            ]
+            merged = {}
+            for future in futures:
+                merged.update(future.result())
+        return {customer_id: merged[customer_id] for customer_id in customer_ids}
+
+    def get_customer_info_many(self, customer_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        return self._batch_by_shard(customer_ids, lambda shard, ids: shard.get_customer_info_many(ids))
+
+    def get_customer_bills_many(self, customer_ids: List[str]) -> Dict[str, List[Dict]]:
+        return self._batch_by_shard(customer_ids, lambda shard, ids: shard.get_customer_bills_many(ids))
+
+    def get_customer_usage_stats_many(self, customer_ids: List[str],
+                                      month: str = None) -> Dict[str, Optional[Dict]]:
+        return self._batch_by_shard(customer_ids, lambda shard, ids: shard.get_customer_usage_stats_many(ids, month))
+
+    def get_customer_call_history_many(self, customer_ids: List[str],
+                                       limit: int = 10) -> Dict[str, List[Dict]]:
+        return self._batch_by_shard(customer_ids, lambda shard, ids: shard.get_customer_call_history_many(ids, limit))
+
+    # ================================
+    # Session-Scoped Operations
+    # ================================
+
+    def create_call_session(self, customer_id: str = None, agent_mode: str = 'ai') -> str:
+        if not customer_id:
+            session_id = self.shards[0].create_call_session(customer_id, agent_mode)
+        else:
+            session_id = self._on_customer_shard(
+                customer_id, lambda shard: shard.create_call_session(customer_id, agent_mode)
+            )
+        self._remember_session(session_id, str(customer_id) if customer_id else None)
+        return session_id
+
+    def end_call_session(self, session_id: str, resolution_status: str = None,
+                         customer_satisfaction: int = None, notes: str = None) -> bool:
+        return self._on_session_shard(session_id, lambda shard: shard.end_call_session(
+            session_id, resolution_status, customer_satisfaction, notes
+        ))
+
+    def add_call_message(self, session_id: str, role: str, content: str,
+                         message_type: str = 'text', tool_call: str = None,
+                         tool_result: str = None, processing_time_ms: int = None,
+                         specialist: str = None) -> int:
+        return self._on_session_shard(session_id, lambda shard: shard.add_call_message(
+            session_id, role, content, message_type, tool_call, tool_result, processing_time_ms, specialist
+        ))
+
+    def log_tool_usage(self, session_id: str, tool_name: str, parameters: Dict,
+                       result: str, execution_time_ms: int, success: bool = True,
+                       error_message: str = None) -> int:
+        return self._on_session_shard(session_id, lambda shard: shard.log_tool_usage(
+            session_id, tool_name, parameters, result, execution_time_ms, success, error_message
+        ))
+
+    def log_error(self, session_id: str, error_type: str, error_message: str,
+                  stack_trace: str = None, severity: str = 'medium') -> int:
+        return self._on_session_shard(session_id, lambda shard: shard.log_error(
+            session_id, error_type, error_message, stack_trace, severity
+        ))
+
+    def get_call_session_history(self, session_id: str) -> Dict:
+        return self._on_session_shard(
+            session_id, lambda shard: shard.get_call_session_history(session_id), create_missing=False
+        )
+
+    # ================================
+    # Cross-Shard Analytics
+    # ================================
+
+    def _fan_out(self, operation: Callable[[CallCenterDatabase], Any]) -> List[Any]:
+        """Run an operation on every shard in parallel, preserving shard order."""
+        return list(self._executor.map(operation, self.shards))
+
+    @staticmethod
+    def _weighted_avg(rows: List[Dict], value_key: str, weight_key: str) -> Optional[float]:
+        pairs = [(row[value_key], row[weight_key] or 0) for row in rows if row and row.get(value_key) is not None]
+        total_weight = sum(weight for _, weight in pairs)
+        if not pairs:
+            return None
+        if not total_weight:
+            return sum(value for value, _ in pairs) / len(pairs)
+        return sum(value * weight for value, weight in pairs) / total_weight
+
+    def get_daily_metrics(self, date_str: str = None) -> Dict:
+        """Daily metrics summed over shards; averages weighted by completed calls."""
+        rows = self._fan_out(lambda shard: shard.get_daily_metrics(date_str))
+        return {
+            'total_calls': sum(r.get('total_calls') or 0 for r in rows),
+            'completed_calls': sum(r.get('completed_calls') or 0 for r in rows),
+            'resolved_calls': sum(r.get('resolved_calls') or 0 for r in rows),
+            'avg_duration': self._weighted_avg(rows, 'avg_duration', 'completed_calls'),
+            'avg_satisfaction': self._weighted_avg(rows, 'avg_satisfaction', 'completed_calls'),
+        }
+
+    def get_tool_usage_stats(self, days: int = 30) -> List[Dict]:
+        """Tool statistics merged per tool, weighted by usage count."""
+        merged: Dict[str, List[Dict]] = {}
+        for shard_rows in self._fan_out(lambda shard: shard.get_tool_usage_stats(days)):
+            for row in shard_rows:
+                merged.setdefault(row['tool_name'], []).append(row)
+
+        result = []
+        for tool_name, rows in merged.items():
+            result.append({
+                'tool_name': tool_name,
+                'usage_count': sum(r['usage_count'] for r in rows),
+                'avg_execution_time': self._weighted_avg(rows, 'avg_execution_time', 'usage_count'),
+                'success_rate': self._weighted_avg(rows, 'success_rate', 'usage_count'),
+                # Histogram buckets are plain counts, so they add up exactly across shards
+                'latency_histogram': {
+                    bucket: sum(r['latency_histogram'][bucket] for r in rows)
+                    for bucket in rows[0]['latency_histogram']
+                },
+            })
+        return sorted(result, key=lambda r: r['usage_count'], reverse=True)
+
+    def get_latency_percentiles(self, metric: str = 'response', dimension: str = None,
+                                minutes: int = 60) -> Dict:
+        """Percentiles of the shards' latency sketches merged per dimension (sketches merge exactly)."""
+        merged: Dict[str, Any] = {}
+        for sketches in self._fan_out(lambda shard: shard.get_latency_sketches(metric, minutes)):
+            for name, sketch in sketches.items():
+                if name in merged:
+                    merged[name].merge(sketch)
+                else:
+                    merged[name] = sketch
+        return CallCenterDatabase.latency_percentiles_report(merged, metric, dimension, minutes)
+
+    def get_monthly_revenue(self, year_month: str = None) -> Dict:
+        rows = self._fan_out(lambda shard: shard.get_monthly_revenue(year_month))
+        merged = {}
+        for key in ['total_bills', 'total_amount', 'paid_bills', 'collected_amount',
+                    'unpaid_bills', 'outstanding_amount']:
+            values = [r.get(key) for r in rows if r.get(key) is not None]
+            merged[key] = sum(values) if values else None
+        return merged
+
+    def get_package_statistics(self) -> List[Dict]:
+        merged: Dict[str, Dict] = {}
+        for shard_rows in self._fan_out(lambda shard: shard.get_package_statistics()):
+            for row in shard_rows:
+                entry = merged.setdefault(row['package_name'], {
+                    'package_name': row['package_name'], 'price': row['price'], 'active_subscriptions': 0
+                })
+                entry['active_subscriptions'] += row['active_subscriptions']
+
+        for entry in merged.values():
+            # Same semantics as the single-file query (an unsubscribed package counts its price once)
+            entry['monthly_revenue'] = entry['price'] * max(entry['active_subscriptions'], 1)
+        return sorted(merged.values(), key=lambda r: r['monthly_revenue'], reverse=True)
+
+    def get_overdue_bills(self, days_overdue: int = 0) -> List[Dict]:
+        rows = [bill for shard_rows in self._fan_out(lambda shard: shard.get_overdue_bills(days_overdue))
+                for bill in shard_rows]
+        return sorted(rows, key=lambda r: r['days_overdue'], reverse=True)
+
+    def get_unpaid_bills(self, customer_id: str = None) -> List[Dict]:
+        if customer_id:
+            return self._on_customer_shard(customer_id, lambda shard: shard.get_unpaid_bills(customer_id))
+        rows = [bill for shard_rows in self._fan_out(lambda shard: shard.get_unpaid_bills())
+                for bill in shard_rows]
+        return sorted(rows, key=lambda r: r['due_date'])
+
+    def search_customers(self, query: str, limit: int = 10) -> List[Dict]:
+        rows = [c for shard_rows in self._fan_out(lambda shard: shard.search_customers(query, limit))
+                for c in shard_rows]
+        return sorted(rows, key=lambda r: r['name'])[:limit]
+
+    def get_database_stats(self) -> Dict:
+        merged: Dict[str, Any] = {}
+        for stats in self._fan_out(lambda shard: shard.get_database_stats()):
+            for key, value in stats.items():
+                merged[key] = merged.get(key, 0) + value
+        # Reference tables are replicated, not partitioned
+        merged['packages_count'] = merged.get('packages_count', 0) // self.num_shards
+        merged['shard_count'] = self.num_shards
+        return merged
+
+    def get_system_health(self) -> Dict:
+        rows = self._fan_out(lambda shard: shard.get_system_health())
+        recent_errors = sum(r['recent_errors_24h'] for r in rows)
+
+        # The same fingerprint can occur on several shards: add up its counts
+        top_errors: Dict[str, Dict] = {}
+        for error in (e for r in rows for e in r.get('top_errors_24h', [])):
+            merged = top_errors.get(error['fingerprint'])
+            if merged is None:
+                top_errors[error['fingerprint']] = dict(error)
+                continue
+            merged['count_24h'] += error['count_24h']
+            merged['first_seen'] = min(merged['first_seen'], error['first_seen'])
+            if error['last_seen'] > merged['last_seen']:
+                merged.update(last_seen=error['last_seen'], severity=error['severity'],
+                              sample_message=error['sample_message'])
+
+        return {
+            'recent_calls_24h': sum(r['recent_calls_24h'] for r in rows),
+            'recent_errors_24h': recent_errors,
+            'top_errors_24h': sorted(top_errors.values(), key=lambda e: e['count_24h'], reverse=True)[:5],
+            'active_sessions': sum(r['active_sessions'] for r in rows),
+            'avg_response_time_ms': self._weighted_avg(rows, 'avg_response_time_ms', 'recent_calls_24h') or 0,
+            'tool_success_rate': self._weighted_avg(rows, 'tool_success_rate', 'recent_calls_24h') or 0,
+            'status': 'healthy' if recent_errors < 10 else 'warning'
+        }
+
+    # ================================
+    # Resharding
+    # ================================
+
+    @staticmethod
+    def _copy_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+        """(column, select expression) pairs to copy.
+
+        A table's sole INTEGER PRIMARY KEY is a rowid alias and is left to the
+        target, except ledger entry ids, which are mapped through
+        temp.ledger_entry_map (see ``_map_ledger_entry_ids``).
+        """
+        info = conn.execute(f'PRAGMA main.table_info({table})').fetchall()
+        pk_columns = [(name, col_type) for _, name, col_type, _, _, pk in info if pk]
+        rowid_alias = pk_columns[0][0] if len(pk_columns) == 1 and pk_columns[0][1].upper() == 'INTEGER' else None
+
+        columns = []
+        for _, name, _, _, _, _ in info:
+            if name == LEDGER_ENTRY_ID_COLUMNS.get(table):
+                columns.append((name, f'(SELECT new_id FROM temp.ledger_entry_map WHERE old_id = {name})'))
+            elif name != rowid_alias:
+                columns.append((name, name))
+        return columns
+
+    @staticmethod
+    def _map_ledger_entry_ids(conn: sqlite3.Connection, customer_id: str) -> int:
+        """Give the customer's ledger entry ids fresh ids above the target's, in the same order.
+
+        Snapshot and base-balance references are mapped with the entries, so
+        they keep pointing at the same (possibly already pruned) position in
+        the customer's history. Returns the highest id handed out.
+        """
+        conn.execute('CREATE TEMP TABLE ledger_entry_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)')
+        old_ids = [row[0] for row in conn.execute('''
+            SELECT entry_id FROM src.balance_ledger WHERE customer_id = ?
+            UNION SELECT as_of_entry_id FROM src.balance_snapshots WHERE customer_id = ?
+            UNION SELECT ledger_entry_id FROM src.customer_balances
+                  WHERE customer_id = ? AND ledger_entry_id IS NOT NULL
+            ORDER BY 1
+        ''', (customer_id,) * 3)]
+        base = conn.execute('''
+            SELECT MAX(COALESCE((SELECT seq FROM main.sqlite_sequence WHERE name = 'balance_ledger'), 0),
+                       COALESCE((SELECT MAX(entry_id) FROM main.balance_ledger), 0))
+        ''').fetchone()[0]
+        conn.executemany('INSERT INTO temp.ledger_entry_map (old_id, new_id) VALUES (?, ?)',
+                         [(old_id, base + i) for i, old_id in enumerate(old_ids, start=1)])
+        return base + len(old_ids)
+
+    @staticmethod
+    def _map_transcript_watermarks(conn: sqlite3.Connection, customer_id: str):
+        """Point the copied transcripts' watermarks at the renumbered message/tool rows.
+
+        A watermark covering the first k remaining rows of a session on the
+        source covers the first k copied rows on the target; rows logged after
+        the transcript was written stay above it.
+        """
+        transcripts = conn.execute('''
+            SELECT st.session_id, st.last_message_id, st.last_tool_log_id
+            FROM src.session_transcripts st
+            JOIN src.call_sessions cs ON cs.session_id = st.session_id
+            WHERE cs.customer_id = ?
+        ''', (customer_id,)).fetchall()
+        for session_id, last_message_id, last_tool_log_id in transcripts:
+            for table, id_column, watermark_column, watermark in (
+                ('call_messages', 'message_id', 'last_message_id', last_message_id),
+                ('tool_usage_logs', 'log_id', 'last_tool_log_id', last_tool_log_id),
+            ):
+                covered = conn.execute(
+                    f'SELECT COUNT(*) FROM src.{table} WHERE session_id = ? AND {id_column} <= ?',
+                    (session_id, watermark or 0)
+                ).fetchone()[0]
+                new_watermark = 0
+                if covered:
+                    new_watermark = conn.execute(
+                        f'SELECT {id_column} FROM main.{table} WHERE session_id = ? '
+                        f'ORDER BY {id_column} LIMIT 1 OFFSET ?',
+                        (session_id, covered - 1)
+                    ).fetchone()[0]
+                conn.execute(
+                    f'UPDATE main.session_transcripts SET {watermark_column} = ? WHERE session_id = ?',
+                    (new_watermark, session_id)
+                )
+
+    def migrate_customer(self, customer_id: str, target_index: int) -> bool:
+        """Move one customer (records, sessions and transcripts) to another shard.
+
+        Only this customer's operations wait while it is copied (the move holds
+        the customer's exclusive lock); every other customer keeps being served.
+        The copy runs in one transaction on the target, then the directory is
+        switched and the source rows are deleted.
+        """
+        customer_id = str(customer_id)
+        with self._locks.exclusive(customer_id):
+            source_index = self.shard_index_for_customer(customer_id)
+            if source_index == target_index:
+                return False
+
+            source = self.shards[source_index]
+            target = self.shards[target_index]
+            with target.get_connection() as conn:
+                conn.execute('ATTACH DATABASE ? AS src', (source.db_path,))
+                try:
+                    # Lock the target before reading its highest ledger id
+                    conn.execute('BEGIN IMMEDIATE')
+                    last_entry_id = self._map_ledger_entry_ids(conn, customer_id)
+                    session_filter = 'session_id IN (SELECT session_id FROM src.call_sessions WHERE customer_id = ?)'
+                    for table in CUSTOMER_TABLES + SESSION_TABLES:
+                        columns = self._copy_columns(conn, table)
+                        where = 'customer_id = ?' if table in CUSTOMER_TABLES + ['call_sessions'] else session_filter
+                        # In source order, so renumbered rows keep their relative order
+                        conn.execute(
+                            f"INSERT OR REPLACE INTO main.{table} ({', '.join(name for name, _ in columns)}) "
+                            f"SELECT {', '.join(expr for _, expr in columns)} FROM src.{table} WHERE {where} "
+                            f"ORDER BY rowid",
+                            (customer_id,)
+                        )
+                    self._map_transcript_watermarks(conn, customer_id)
+                    # Mapped ids of already pruned entries must not be handed out again
+                    conn.execute('''
+                        UPDATE main.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'balance_ledger'
+                    ''', (last_entry_id,))
+                    conn.execute('''
+                        INSERT INTO main.sqlite_sequence (name, seq)
+                        SELECT 'balance_ledger', ? WHERE NOT EXISTS (
+                            SELECT 1 FROM main.sqlite_sequence WHERE name = 'balance_ledger'
+                        )
+                    ''', (last_entry_id,))
+                    self._advance_data_versions(conn, customer_id)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.execute('DETACH DATABASE src')
+
+            # The directory is the commit point of the move
+            self._set_override(customer_id, target_index)
+
+            with source.get_connection() as conn:
+                session_ids = [r[0] for r in conn.execute(
+                    'SELECT session_id FROM call_sessions WHERE customer_id = ?', (customer_id,)
+                )]
+                for table in reversed(SESSION_TABLES[1:]):
+                    conn.executemany(f'DELETE FROM {table} WHERE session_id = ?', [(s,) for s in session_ids])
+                for table in ['call_sessions'] + list(reversed(CUSTOMER_TABLES)):
+                    conn.execute(f'DELETE FROM {table} WHERE customer_id = ?', (customer_id,))
+
+            logger.info(f"Customer {customer_id} migrated: shard {source_index} -> {target_index}")
+            return True
+
+    @staticmethod
+    def _advance_data_versions(conn, customer_id: str):
+        """Move the customer's version stamps past both shards' values.
+
+        The copied rows bump the target's stamps from whatever the target had,
+        which can land on a version a client already holds an ETag for; the
+        stamp must end up newer than anything the source handed out.
+        """
+        scopes = sorted({f"{scope}:{customer_id}" for scope, per_customer in DATA_VERSION_TABLES.values()
+                         if per_customer})
+        for scope in scopes:
+            conn.execute('''
+                INSERT INTO main.data_versions (scope, version, updated_at)
+                SELECT ?, MAX(COALESCE((SELECT version FROM main.data_versions WHERE scope = ?), 0),
+                              COALESCE((SELECT version FROM src.data_versions WHERE scope = ?), 0)) + 1,
+                       CURRENT_TIMESTAMP
+                WHERE TRUE
+                ON CONFLICT(scope) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at
+            ''', (scope, scope, scope))
+
+    def _set_override(self, customer_id: str, shard_index: int):
+        with self._directory() as conn:
+            if shard_index == stable_shard_index(customer_id, self.num_shards):
+                conn.execute('DELETE FROM customer_shards WHERE customer_id = ?', (customer_id,))
+                self._overrides.pop(customer_id, None)
+            else:
+                conn.execute('''
+                    INSERT OR REPLACE INTO customer_shards (customer_id, shard_index, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                ''', (customer_id, shard_index))
+                self._overrides[customer_id] = shard_index
+
+    def _all_customer_ids(self) -> List[List[str]]:
+        def ids(shard: CallCenterDatabase) -> List[str]:
+            with shard.get_connection() as conn:
+                return [r[0] for r in conn.execute('SELECT customer_id FROM customers')]
+        return self._fan_out(ids)
+
+    def reshard(self, new_shard_paths: List[str]) -> Dict[str, int]:
+        """Grow the cluster with new shard files and move customers to their new home.
+
+        Customers whose hash home changes are pinned to their current shard in
+        the directory before the shard count changes, so routing stays correct
+        while they are migrated one by one.
+        """
+        current_owners = {
+            customer_id: index
+            for index, ids in enumerate(self._all_customer_ids())
+            for customer_id in ids
+        }
+
+        new_shards = [
+            CallCenterDatabase(path, read_pool_size=self.read_pool_size, seed_sample_data=False)
+            for path in new_shard_paths
+        ]
+        new_count = self.num_shards + len(new_shards)
+
+        moves = {}
+        with self._directory() as conn:
+            for customer_id, index in current_owners.items():
+                new_home = stable_shard_index(customer_id, new_count)
+                if new_home != index:
+                    moves[customer_id] = new_home
+                conn.execute('''
+                    INSERT OR REPLACE INTO customer_shards (customer_id, shard_index, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                ''', (customer_id, index))
+            conn.execute(
+                "INSERT OR REPLACE INTO shard_config (key, value) VALUES ('num_shards', ?)", (str(new_count),)
+            )
+            self._overrides.update(current_owners)
+
+        self.shards.extend(new_shards)
+        self._executor.shutdown(wait=True)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        self.sync_reference_data()
+
+        migrated = 0
+        for customer_id, target_index in moves.items():
+            if self.migrate_customer(customer_id, target_index):
+                migrated += 1
+
+        # Customers that did not move are back on their hash home: drop their pins
+        with self._directory() as conn:
+            for customer_id in current_owners:
+                if customer_id not in moves:
+                    conn.execute('DELETE FROM customer_shards WHERE customer_id = ?', (customer_id,))
+                    self._overrides.pop(customer_id, None)
+
+        logger.info(f"Reshard complete: {new_count} shards, {migrated} customers migrated")
+        return {'shard_count': new_count, 'customers': len(current_owners), 'migrated': migrated}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close()
+
+
+if __name__ == "__main__":
+    # Small demo: 2 shards, then grow to 3
+    logging.basicConfig(level=logging.INFO)
+    sharded = ShardedCallCenterDatabase(["shard_0.db", "shard_1.db"], "shard_directory.db")
+    print({cid: sharded.shard_index_for_customer(cid) for cid, *_ in SAMPLE_CUSTOMERS})
+    print(sharded.get_monthly_revenue("2025-07"))
+    print(sharded.reshard(["shard_2.db"]))
+    print({cid: sharded.shard_index_for_customer(cid) for cid, *_ in SAMPLE_CUSTOMERS})
+    sharded.close()
@@ -406,6 +406,11 @@ if 'web_api' not in st.session_state:
     st.session_state.auto_play_response = True
     st.session_state.pending_audio = None
 
+@st.cache_resource
+def get_status_database():
+    """Sistem durumu kontrolü için tek veritabanı örneği (her yeniden çalıştırmada yenisi açılmaz)."""
+    return CallCenterDatabase("call_center.db")
+
 def initialize_agent():
     """Agent'ı başlatır"""
     if not st.session_state.agent_initialized:
@@ -895,7 +900,7 @@ def main():
         
         # Database kontrolü
         try:
-            db = CallCenterDatabase("call_center.db")
+            get_status_database().get_database_stats()
             st.success("🟢 Veritabanı Aktif")
         except:
             st.error("🔴 Veritabanı Hatası")
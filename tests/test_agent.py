@@ -0,0 +1,128 @@
+# tests/test_agent.py
+"""Tool execution of the call center agent against the mock API."""
+import os
+import socket
+import importlib
+
+import pytest
+
+requests = pytest.importorskip("requests")
+urllib3 = pytest.importorskip("urllib3")
+pytest.importorskip("gtts")
+
+
+@pytest.fixture(scope="module")
+def agent(tmp_path_factory):
+    # The module creates its temp_audio directory relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("agent"))
+    try:
+        yield importlib.import_module("agentG2_local_lm_stduio")
+    finally:
+        os.chdir(cwd)
+
+
+class RecordingSession:
+    def __init__(self):
+        self.logged = []
+
+    def log_tool_usage(self, tool_name, parameters, result, execution_time_ms, success):
+        self.logged.append((tool_name, success))
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, results):
+        self._results = results
+
+    def json(self):
+        return {"data": {"results": self._results}}
+
+
+def refused_connection_error():
+    """The error requests raises when nothing listens on the port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    with pytest.raises(requests.exceptions.ConnectionError) as error:
+        requests.post(f"http://127.0.0.1:{port}/batch", json={}, timeout=2)
+    return error.value
+
+
+def make_executor(agent, monkeypatch, post):
+    executor = agent.APIToolExecutor("http://api.test", RecordingSession(), timeout=1)
+    executed = []
+
+    def execute_tool(tool_name, parameters):
+        executed.append(tool_name)
+        return "ok", True
+    monkeypatch.setattr(executor, "execute_tool", execute_tool)
+    monkeypatch.setattr(agent.requests, "post", post)
+    return executor, executed
+
+
+CALLS = [
+    {"tool": "get_user_info", "parameters": {"customer_id": "1001"}},
+    {"tool": "pay_bill", "parameters": {"customer_id": "1001", "month": "2025-07", "amount": 150.0}},
+    {"tool": "get_billing_info", "parameters": {"customer_id": "1001"}},
+]
+
+
+def test_request_never_sent(agent):
+    never_sent = agent.APIToolExecutor._request_never_sent
+    assert never_sent(refused_connection_error())
+    assert never_sent(requests.exceptions.ConnectTimeout("connect timed out"))
+    # The request may have reached the server in all of these
+    assert not never_sent(requests.exceptions.ReadTimeout("read timed out"))
+    assert not never_sent(requests.exceptions.ConnectionError(
+        urllib3.exceptions.ProtocolError("Connection aborted.", ConnectionResetError())
+    ))
+    assert not never_sent(ValueError("/batch status 502"))
+
+
+def test_batch_read_timeout_does_not_replay_writes(agent, monkeypatch):
+    def post(*args, **kwargs):
+        raise requests.exceptions.ReadTimeout("read timed out")
+    executor, executed = make_executor(agent, monkeypatch, post)
+
+    outputs = executor.execute_batch(CALLS)
+    assert executed == ["get_user_info", "get_billing_info"]
+    assert outputs[0] == ("ok", True) and outputs[2] == ("ok", True)
+    assert outputs[1][1] is False and "doğrulanamadı" in outputs[1][0]
+    assert ("pay_bill", False) in executor.session_service.logged
+
+
+def test_batch_refused_connection_runs_every_call(agent, monkeypatch):
+    error = refused_connection_error()
+
+    def post(*args, **kwargs):
+        raise error
+    executor, executed = make_executor(agent, monkeypatch, post)
+
+    assert executor.execute_batch(CALLS) == [("ok", True)] * 3
+    assert executed == ["get_user_info", "pay_bill", "get_billing_info"]
+
+
+def test_batch_rejects_missing_params_locally(agent, monkeypatch):
+    sent = []
+
+    def post(url, json=None, **kwargs):
+        sent.extend(json["operations"])
+        return FakeResponse([
+            {"status_code": 200, "data": {"name": "Ali Veli", "package": "Premium", "balance": 10.0},
+             "message": None, "duration_ms": 1.0}
+            for _ in json["operations"]
+        ])
+    executor = agent.APIToolExecutor("http://api.test", RecordingSession(), timeout=1)
+    monkeypatch.setattr(agent.requests, "post", post)
+
+    outputs = executor.execute_batch([
+        {"tool": "change_package", "parameters": {"customer_id": "1001"}},
+        {"tool": "get_user_info", "parameters": {"customer_id": "1001"}},
+        {"tool": "get_user_info", "parameters": {"customer_id": "1002"}},
+    ])
+    assert [op["id"] for op in sent] == ["1", "2"]
+    assert all("None" not in str(op["params"].values()) for op in sent)
+    assert outputs[0] == ("Yeni paket adı belirtilmedi", False)
+    assert outputs[1][1] and outputs[2][1]
@@ -0,0 +1,28 @@
+# tests/test_analytics_engine.py
+"""DuckDB reporting mirror."""
+import pytest
+
+from conftest import make_sqlite
+
+pytest.importorskip("duckdb")
+
+from analytics_engine import DuckDBAnalyticsEngine
+
+
+def test_mirror_reads_telemetry_from_log_db(tmp_path):
+    log_db_path = str(tmp_path / "call_center_logs.db")
+    db = make_sqlite(tmp_path, log_db_path=log_db_path)
+    engine = DuckDBAnalyticsEngine(db.db_path, str(tmp_path / "mirror.duckdb"),
+                                   sync_interval_seconds=None, log_db_path=log_db_path)
+    try:
+        session_id = db.create_call_session("1001")
+        db.add_call_message(session_id, "user", "Merhaba", processing_time_ms=40)
+        db.log_tool_usage(session_id, "get_user_info", {"customer_id": "1001"}, "ok", 12)
+
+        copied = engine.sync()
+        assert copied['call_messages'] >= 1
+        assert copied['tool_usage_minutely'] >= 1
+        assert any(t['tool_name'] == "get_user_info" for t in engine.get_tool_usage_stats())
+    finally:
+        engine.close()
+        db.close()
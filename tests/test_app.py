@@ -0,0 +1,119 @@
+# tests/test_app.py
+"""HTTP middleware stack of the mock API."""
+import os
+import importlib
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The app opens call_center.db relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        app_module = importlib.import_module("app_with_database")
+        # Without the context manager the startup/shutdown hooks (and the shutdown backup) do not run
+        yield TestClient(app_module.app)
+    finally:
+        os.chdir(cwd)
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert len(response.content) < 1024
+    assert "content-encoding" not in response.headers
+    assert response.num_bytes_downloaded == len(response.content)
+
+
+def test_large_bodies_are_compressed(client):
+    response = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.num_bytes_downloaded < len(response.content)
+
+
+def test_conditional_get_returns_not_modified(client):
+    first = client.get("/getBillingInfo/1001")
+    assert first.status_code == 200 and first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/getBillingInfo/1001", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.headers["etag"] == first.headers["etag"]
+
+
+def test_customer_context_returns_all_fields_by_default(client):
+    response = client.get("/customer/1001/context")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert set(data) == {"info", "bills", "usage", "package"}
+    assert set(data["info"]) == {"name", "package", "balance"}
+    assert data["package"]["name"] == data["info"]["package"]
+
+
+def test_customer_context_field_selection(client):
+    bills_only = client.get("/customer/1001/context", params={"fields": "bills"})
+    assert bills_only.status_code == 200
+    # Fields that were not requested are left out, not sent as null
+    assert list(bills_only.json()["data"]) == ["bills"]
+    assert all(set(b) == {"month", "amount", "paid"} for b in bills_only.json()["data"]["bills"])
+
+    info_and_package = client.get("/customer/1001/context", params={"fields": "info, package"})
+    assert set(info_and_package.json()["data"]) == {"info", "package"}
+
+
+def test_customer_context_errors(client):
+    unknown_field = client.get("/customer/1001/context", params={"fields": "bills,nope"})
+    assert unknown_field.status_code == 400 and "nope" in unknown_field.json()["detail"]
+
+    assert client.get("/customer/NOPE0000/context").status_code == 404
+    assert client.get("/customer/NOPE0000/context", params={"fields": "bills"}).status_code == 404
+
+
+def unpaid_bill(client, customer_id):
+    bills = client.get(f"/getBillingInfo/{customer_id}").json()["data"]["bills"]
+    return next(b for b in bills if not b["paid"])
+
+
+def test_batch_runs_writes_in_order_after_reads(client):
+    bill = unpaid_bill(client, "1003")
+    operations = [
+        {"id": "before", "op": "getBillingInfo", "params": {"customer_id": "1003"}},
+        {"id": "pay", "op": "payBill",
+         "params": {"customer_id": "1003", "month": bill["month"], "amount": bill["amount"]}},
+        {"id": "after", "op": "getBillingInfo", "params": {"customer_id": "1003"}},
+    ]
+    response = client.post("/batch", json={"operations": operations})
+    assert response.status_code == 200
+    body = response.json()
+    results = body["data"]["results"]
+    assert [r["id"] for r in results] == ["before", "pay", "after"]
+    assert body["status"] == "success" and body["data"]["failed"] == 0
+
+    def paid(result):
+        return next(b for b in result["data"]["bills"] if b["month"] == bill["month"])["paid"]
+    assert not paid(results[0]) and paid(results[2])
+
+
+def test_batch_reports_bad_params_per_operation(client):
+    operations = [
+        {"id": "ok", "op": "getUserInfo", "params": {"customer_id": "1001"}},
+        {"id": "missing", "op": "payBill", "params": {"customer_id": "1001", "month": "2025-07"}},
+        {"id": "extra", "op": "getUserInfo", "params": {"customer_id": "1001", "nope": 1}},
+        {"id": "unknown", "op": "getUserInfo", "params": {"customer_id": "NOPE0000"}},
+    ]
+    body = client.post("/batch", json={"operations": operations}).json()
+    assert body["status"] == "partial" and body["data"]["failed"] == 3
+    assert [(r["id"], r["status_code"]) for r in body["data"]["results"]] == \
+        [("ok", 200), ("missing", 422), ("extra", 422), ("unknown", 404)]
+
+
+def test_batch_rejects_too_many_or_unknown_operations(client):
+    read = {"op": "getUserInfo", "params": {"customer_id": "1001"}}
+    assert client.post("/batch", json={"operations": [read] * 20}).status_code == 200
+    assert client.post("/batch", json={"operations": [read] * 21}).status_code == 422
+    assert client.post("/batch", json={"operations": []}).status_code == 422
+    assert client.post("/batch", json={"operations": [{"op": "dropTables"}]}).status_code == 422
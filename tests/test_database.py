@@ -0,0 +1,176 @@
+# tests/test_database.py
+"""SQLite-specific behaviour of CallCenterDatabase."""
+import gc
+import time
+import logging
+import threading
+import weakref
+
+import pytest
+
+from conftest import make_sqlite
+
+
+def test_archive_old_sessions_takes_error_logs(tmp_path):
+    db = make_sqlite(tmp_path, archive_dir=str(tmp_path / "archive"))
+    try:
+        session_id = db.create_call_session("1001")
+        db.add_call_message(session_id, "user", "Merhaba")
+        db.log_error(session_id, "test_error", "Test", severity="high")
+        db.end_call_session(session_id, "resolved")
+        with db.get_connection() as conn:
+            conn.execute("UPDATE call_sessions SET start_time = datetime('now', '-400 days') WHERE session_id = ?",
+                         (session_id,))
+
+        assert db.archive_old_sessions(older_than_days=180)['archived_sessions'] == 1
+        with db.get_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM error_logs WHERE session_id = ?',
+                                (session_id,)).fetchone()[0] == 0
+        archived = db.get_call_session_history(session_id)
+        assert [e['error_type'] for e in archived['errors']] == ["test_error"]
+    finally:
+        db.close()
+
+
+def test_recent_errors_count_each_occurrence_severity(tmp_path):
+    db = make_sqlite(tmp_path)
+    try:
+        session_id = db.create_call_session("1001")
+        db.log_error(session_id, "timeout", "Zaman aşımı", severity="critical")
+        db.log_error(session_id, "timeout", "Zaman aşımı", severity="low")
+        health = db.get_system_health()
+        assert health['recent_errors_24h'] == 1
+        assert health['top_errors_24h'][0]['count_24h'] == 2
+    finally:
+        db.close()
+
+
+def test_tool_usage_minutely_backfilled_from_logs(tmp_path):
+    db = make_sqlite(tmp_path)
+    session_id = db.create_call_session("1001")
+    db.log_tool_usage(session_id, "get_user_info", {"customer_id": "1001"}, "ok", 12)
+    db.log_tool_usage(session_id, "get_user_info", {"customer_id": "1001"}, "hata", 700, success=False)
+    with db.get_connection() as conn:
+        conn.execute('DROP TABLE tool_usage_minutely')
+    db.close()
+
+    db = make_sqlite(tmp_path)
+    try:
+        with db.get_connection() as conn:
+            row = conn.execute('''
+                SELECT SUM(call_count), SUM(success_count), SUM(total_execution_time_ms),
+                       SUM(bucket_le_25), SUM(bucket_le_1000)
+                FROM tool_usage_minutely WHERE tool_name = 'get_user_info'
+            ''').fetchone()
+        assert tuple(row) == (2, 1, 712, 1, 1)
+    finally:
+        db.close()
+
+
+def test_collections_page_rejects_malformed_cursor(tmp_path, caplog):
+    db = make_sqlite(tmp_path)
+    try:
+        page = db.get_collections_page(limit=1)
+        if page['next_cursor']:
+            assert db.get_collections_page(limit=1, cursor=page['next_cursor'])['items'] != page['items']
+        for cursor in ("1|2025-07-01", "x|2025-07-01|1001|2025-07", "1|2|3|4|5"):
+            with pytest.raises(ValueError):
+                db.get_collections_page(limit=10, cursor=cursor)
+        assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
+    finally:
+        db.close()
+
+
+def test_unregistered_consumer_starts_at_latest(tmp_path):
+    db = make_sqlite(tmp_path)
+    try:
+        assert db.get_change_feed_status()['latest_seq']
+        first = db.read_changes("yeni_tuketici")
+        assert first['changes'] == [] and first['offset'] == db.get_change_feed_status()['latest_seq']
+
+        db.update_customer_info("1001", email="yeni@example.com")
+        changes = db.read_changes("yeni_tuketici")['changes']
+        assert [(c['table_name'], c['row_key']) for c in changes] == [("customers", "1001")]
+    finally:
+        db.close()
+
+
+def test_cleanup_old_logs_keeps_change_outbox(tmp_path):
+    db = make_sqlite(tmp_path)
+    try:
+        with db.get_connection() as conn:
+            conn.execute("UPDATE change_outbox SET changed_at = datetime('now', '-400 days')")
+            entries = conn.execute('SELECT COUNT(*) FROM change_outbox').fetchone()[0]
+        db.cleanup_old_logs(days_to_keep=90)
+        with db.get_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM change_outbox').fetchone()[0] == entries
+        assert db.prune_change_outbox(max_age_days=90) == entries
+    finally:
+        db.close()
+
+def test_repeated_end_keeps_transcript(tmp_path):
+    db = make_sqlite(tmp_path, transcript_grace_seconds=3600)
+    try:
+        session_id = db.create_call_session("1001")
+        db.add_call_message(session_id, "user", "ilk mesaj")
+        db.add_call_message(session_id, "assistant", "ikinci mesaj")
+        db.log_tool_usage(session_id, "get_user_info", {"customer_id": "1001"}, "ok", 12)
+        assert db.end_call_session(session_id, "resolved")
+        with db.get_connection() as conn:
+            conn.execute("UPDATE session_transcripts SET purge_after = datetime('now', '-1 minute')")
+        assert db.purge_compacted_transcripts() == 1
+
+        assert db.end_call_session(session_id, "resolved")
+        history = db.get_call_session_history(session_id)
+        assert [m['content'] for m in history['messages']] == ["ilk mesaj", "ikinci mesaj"]
+        assert len(history['tool_usage']) == 1
+    finally:
+        db.close()
+
+
+def test_message_logged_after_end_is_kept(tmp_path):
+    db = make_sqlite(tmp_path, transcript_grace_seconds=0)
+    try:
+        session_id = db.create_call_session("1001")
+        db.add_call_message(session_id, "user", "ilk mesaj")
+        db.add_call_message(session_id, "assistant", "ikinci mesaj")
+        assert db.end_call_session(session_id, "resolved")
+
+        db.add_call_message(session_id, "assistant", "geç mesaj")
+        expected = ["ilk mesaj", "ikinci mesaj", "geç mesaj"]
+        # Visible before the session is ended again ...
+        assert [m['content'] for m in db.get_call_session_history(session_id)['messages']] == expected
+
+        # ... and folded into the transcript, not replacing it, when it is
+        assert db.end_call_session(session_id, "resolved")
+        assert [m['content'] for m in db.get_call_session_history(session_id)['messages']] == expected
+        with db.get_connection() as conn:
+            transcript = conn.execute('SELECT message_count FROM session_transcripts WHERE session_id = ?',
+                                      (session_id,)).fetchone()
+            remaining = conn.execute('SELECT COUNT(*) FROM call_messages WHERE session_id = ?',
+                                     (session_id,)).fetchone()[0]
+        assert transcript['message_count'] == 3 and remaining == 0
+    finally:
+        db.close()
+
+def flush_threads():
+    return [t for t in threading.enumerate() if t.name == "latency-sketch-flush"]
+
+
+def test_latency_flush_thread_starts_lazily_and_does_not_pin_instance(tmp_path):
+    before = len(flush_threads())
+    db = make_sqlite(tmp_path, latency_flush_seconds=0.05)
+    assert len(flush_threads()) == before
+
+    session_id = db.create_call_session("1001")
+    db.add_call_message(session_id, "assistant", "Yanıt", processing_time_ms=120)
+    assert len(flush_threads()) == before + 1
+
+    ref = weakref.ref(db)
+    del db
+    gc.collect()
+    assert ref() is None
+    deadline = time.monotonic() + 2
+    while len(flush_threads()) > before and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(flush_threads()) == before
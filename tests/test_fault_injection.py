@@ -0,0 +1,36 @@
+# tests/test_fault_injection.py
+"""Latency and failure injection of the mock API."""
+import asyncio
+
+import pytest
+
+from fault_injection import FaultInjector, InjectedFault, RouteFaultProfile
+
+
+def test_is_noop_follows_distribution():
+    assert RouteFaultProfile().is_noop
+    assert RouteFaultProfile(distribution='fixed', min_ms=0).is_noop
+    assert not RouteFaultProfile(distribution='fixed', min_ms=5).is_noop
+    assert not RouteFaultProfile(distribution='uniform', max_ms=5).is_noop
+    # No max_ms only means "no upper clamp" for lognormal, the delay is still drawn
+    assert not RouteFaultProfile(distribution='lognormal', median_ms=1).is_noop
+
+
+def test_stats_are_keyed_by_matched_prefix():
+    injector = FaultInjector.from_dict({
+        'default': {'distribution': 'fixed', 'min_ms': 0.01},
+        'routes': {'/payBill': {'distribution': 'fixed', 'min_ms': 0.01, 'failure_rate': 1.0}},
+    }, seed=1)
+
+    async def scenario():
+        for customer_id in range(5):
+            await injector.apply(f"/getUserInfo/{customer_id}")
+        with pytest.raises(InjectedFault):
+            await injector.apply("/payBill/extra")
+        await injector.apply("/health")
+
+    asyncio.run(scenario())
+    stats = injector.stats()
+    assert set(stats) == {'default', '/payBill'}
+    assert stats['default']['requests'] == 5
+    assert stats['/payBill']['failures'] == 1
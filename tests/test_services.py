@@ -0,0 +1,294 @@
+# tests/test_services.py
+"""Service layer helpers."""
+import time
+import threading
+import asyncio
+import logging
+
+import pytest
+
+from conftest import make_sqlite, make_sharded
+from database import CallCenterDatabase
+from services import AsyncSingleFlight, CustomerExistenceIndex, DataVersionService, ServiceFactory, TTLCache
+
+
+def test_async_single_flight_survives_leader_cancellation():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "sonuç"
+
+        leader = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await follower == "sonuç"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert calls == [1]
+        assert await flight.do("k", load) == "sonuç" and calls == [1, 1]
+
+    asyncio.run(scenario())
+
+
+def test_async_single_flight_shares_errors():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("hata")
+
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(scenario())
+
+
+def test_existence_index_reads_change_feed_from_primary(tmp_path):
+    db = make_sqlite(tmp_path, replica_path=str(tmp_path / "replica.db"), replica_refresh_seconds=3600)
+    try:
+        index = CustomerExistenceIndex(db)
+        assert index.exists("1001")
+        db.create_customer("T0000001", "Yeni Müşteri")
+        index.refresh(force=True)
+        assert "T0000001" in index._ids
+        assert index.stats()['mode'] == 'change_feed'
+    finally:
+        db.close()
+
+
+def test_existence_index_rechecks_positive_hits_without_change_feed(tmp_path):
+    db = make_sharded(tmp_path)
+    try:
+        index = CustomerExistenceIndex(db, positive_ttl_seconds=0.05)
+        assert index.exists("1001") and index.stats()['mode'] == 'reload'
+        # Deactivated behind the service layer's back
+        db.update_customer_info("1001", status="inactive")
+        time.sleep(0.1)
+        assert not index.exists("1001")
+        assert index.stats()['rechecks'] == 1
+    finally:
+        db.close()
+
+
+def test_existence_index_disabled_when_backend_cannot_list_ids(tmp_path, caplog):
+    class UnlistedDatabase(CallCenterDatabase):
+        def get_active_customer_ids(self):
+            return None
+
+    db = UnlistedDatabase(str(tmp_path / "call_center.db"), latency_flush_seconds=None)
+    try:
+        index = CustomerExistenceIndex(db)
+        assert index.exists("1001") and not index.exists("NOPE0000")
+        assert index.stats()['mode'] == 'disabled'
+        assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
+    finally:
+        db.close()
+
+
+def test_existence_index_reloads_after_pruned_changes(tmp_path):
+    db = make_sqlite(tmp_path)
+    try:
+        index = CustomerExistenceIndex(db)
+        assert index.exists("1001")
+
+        # Another consumer reads past the deactivation and the outbox is pruned before the index sees it
+        db.update_customer_info("1001", status="inactive")
+        db.register_change_consumer("other", from_latest=True)
+        assert db.prune_change_outbox() > 0
+
+        index.refresh(force=True)
+        assert not index.exists("1001") and not db.customer_exists("1001")
+    finally:
+        db.close()
+
+
+def test_existence_index_does_not_reload_on_empty_outbox(tmp_path):
+    db = make_sqlite(tmp_path)
+    try:
+        db.update_customer_info("1002", email="x@example.com")
+        db.register_change_consumer("other", from_latest=True)
+        db.prune_change_outbox()
+        index = CustomerExistenceIndex(db)
+        assert index.exists("1001")
+        loaded_at = index._loaded_at
+
+        index.refresh(force=True)
+        assert index._loaded_at == loaded_at and index.stats()['refreshes'] == 1
+    finally:
+        db.close()
+
+
+def test_data_version_service_bounds_seen_scopes(tmp_path):
+    db = make_sqlite(tmp_path)
+    try:
+        versions = DataVersionService(db, TTLCache(16), max_scopes=3)
+        for customer_id in ("1001", "1002", "1003", "1004", "1005"):
+            assert versions.get_stamp(f"bills:{customer_id}") is not None
+        assert list(versions._seen) == ["bills:1003", "bills:1004", "bills:1005"]
+    finally:
+        db.close()
+
+
+def count_calls(monkeypatch, db, *names):
+    calls = {name: 0 for name in names}
+    for name in names:
+        original = getattr(db, name)
+
+        def counted(*args, _name=name, _original=original, **kwargs):
+            calls[_name] += 1
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(db, name, counted)
+    return calls
+
+
+def test_ttl_cache_lru_eviction_expiry_and_counters():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1, 60, tags=["t:a"])
+    cache.set("b", 2, 60, tags=["t:b"])
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3, 60)
+
+    # "b" was the least recently used entry
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, 3)
+
+    cache.set("short", 4, 0.01)
+    time.sleep(0.02)
+    assert cache.get("short") == (False, None)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['expirations']) == (2, 2, 2, 1)
+    assert stats['size'] == 1 and stats['max_size'] == 2
+
+
+def test_ttl_cache_invalidation_and_stale_writes():
+    cache = TTLCache()
+    cache.set("a", 1, 60, tags=["customer:1:bills"])
+    cache.set("b", 2, 60, tags=["customer:1:bills", "customers"])
+    version = cache.version
+
+    assert cache.invalidate("customer:1:bills") == 2
+    assert cache.get("a") == (False, None) and cache.get("b") == (False, None)
+    assert cache.stats()['invalidations'] == 2
+
+    # A load that started before the invalidation must not be stored
+    cache.set("a", "stale", 60, tags=["customer:1:bills"], if_version=version)
+    assert cache.get("a") == (False, None)
+    cache.set("a", "fresh", 60, tags=["customer:1:bills"], if_version=cache.version)
+    assert cache.get("a") == (True, "fresh")
+
+
+@pytest.mark.parametrize("method", ["pay_bill", "pay_bill_checked"])
+def test_bill_payment_drops_customer_entries(tmp_path, monkeypatch, method):
+    db = make_sqlite(tmp_path)
+    try:
+        services = ServiceFactory(db, customer_index=False)
+        db.create_bill("1001", "2099-01", 75.0, "2099-02-01")
+        calls = count_calls(monkeypatch, db, 'get_customer_bills', 'get_customer_info')
+
+        def read():
+            return services.billing.get_customer_bills("1001"), services.customer.get_customer_info("1001")
+
+        read()
+        read()
+        assert calls == {'get_customer_bills': 1, 'get_customer_info': 1}
+
+        getattr(services.billing, method)("1001", "2099-01", 75.0)
+        bills, info = read()
+        assert calls == {'get_customer_bills': 2, 'get_customer_info': 2}
+        assert next(b for b in bills if b['bill_month'] == "2099-01")['is_paid']
+        assert info['current_balance'] == db.get_customer_info("1001")['current_balance']
+    finally:
+        db.close()
+
+
+def test_cached_many_fills_and_reuses_single_entries(tmp_path, monkeypatch):
+    db = make_sqlite(tmp_path)
+    try:
+        services = ServiceFactory(db, customer_index=False)
+        calls = count_calls(monkeypatch, db, 'get_customer_bills', 'get_customer_bills_many')
+
+        services.billing.get_customer_bills("1001")
+        bills = services.billing.get_customer_bills_many(["1001", "1002", "1001"])
+        assert list(bills) == ["1001", "1002"]
+        # Only the missing id is fetched in bulk
+        assert calls == {'get_customer_bills': 1, 'get_customer_bills_many': 1}
+
+        # The bulk read filled the single-key entry of 1002
+        assert services.billing.get_customer_bills("1002") == bills["1002"]
+        services.billing.get_customer_bills_many(["1001", "1002"])
+        assert calls == {'get_customer_bills': 1, 'get_customer_bills_many': 1}
+    finally:
+        db.close()
+
+def slow_first_bills_read(monkeypatch, db):
+    """Make the first get_customer_bills call block (after reading) until released."""
+    started, release = threading.Event(), threading.Event()
+    original = db.get_customer_bills
+
+    def get_customer_bills(customer_id):
+        result = original(customer_id)
+        if not started.is_set():
+            started.set()
+            release.wait(5)
+        return result
+    monkeypatch.setattr(db, 'get_customer_bills', get_customer_bills)
+    return started, release
+
+
+def is_paid(bills, month="2099-01"):
+    return next(b for b in bills if b['bill_month'] == month)['is_paid']
+
+
+def test_read_after_write_does_not_join_older_flight(tmp_path, monkeypatch):
+    db = make_sqlite(tmp_path)
+    try:
+        services = ServiceFactory(db, customer_index=False)
+        db.create_bill("1001", "2099-01", 75.0, "2099-02-01")
+        started, release = slow_first_bills_read(monkeypatch, db)
+
+        old_read = threading.Thread(target=services.billing.get_customer_bills, args=("1001",))
+        old_read.start()
+        assert started.wait(5)
+        assert services.billing.pay_bill("1001", "2099-01", 75.0)
+
+        results = []
+        new_read = threading.Thread(target=lambda: results.append(services.billing.get_customer_bills("1001")))
+        new_read.start()
+        new_read.join(2)
+        release.set()
+        old_read.join()
+        new_read.join()
+        assert is_paid(results[0])
+    finally:
+        db.close()
+
+
+def test_async_read_after_write_does_not_join_older_flight(tmp_path, monkeypatch):
+    db = make_sqlite(tmp_path)
+    try:
+        services = ServiceFactory(db, customer_index=False)
+        db.create_bill("1001", "2099-01", 75.0, "2099-02-01")
+        started, release = slow_first_bills_read(monkeypatch, db)
+
+        async def scenario():
+            old_read = asyncio.ensure_future(services.call_async(db.get_customer_bills, "1001"))
+            assert await asyncio.to_thread(started.wait, 5)
+            db.pay_bill("1001", "2099-01", 75.0)
+            services.cache.invalidate("customer:1001:bills")
+            new_read = await asyncio.wait_for(services.call_async(db.get_customer_bills, "1001"), 2)
+            release.set()
+            assert not is_paid(await old_read)
+            return new_read
+
+        assert is_paid(asyncio.run(scenario()))
+    finally:
+        db.close()
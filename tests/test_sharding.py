@@ -0,0 +1,149 @@
+# tests/test_sharding.py
+"""Routing and migration behaviour of the sharded backend."""
+import threading
+
+import sharding
+from conftest import make_sharded
+
+
+def test_session_writes_follow_migrating_customer(tmp_path):
+    db = make_sharded(tmp_path)
+    try:
+        session_id = db.create_call_session("1001")
+        home = db.shard_index_for_customer("1001")
+        stop = threading.Event()
+        written = []
+
+        def writer():
+            while not stop.is_set():
+                written.append(db.add_call_message(session_id, "user", "Merhaba"))
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for i in range(6):
+                assert db.migrate_customer("1001", (home + i + 1) % db.num_shards)
+        finally:
+            stop.set()
+            thread.join()
+
+        assert all(message_id > 0 for message_id in written)
+        history = db.get_call_session_history(session_id)
+        assert len(history['messages']) == len(written)
+        assert db.get_customer_info("1001")['name']
+    finally:
+        db.close()
+
+
+def test_session_owner_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, 'SESSION_OWNER_CACHE_SIZE', 3)
+    db = make_sharded(tmp_path)
+    try:
+        session_ids = [db.create_call_session("1001") for _ in range(5)]
+        assert len(db._session_owners) == 3
+        # Evicted sessions are found again by probing the shards
+        assert db.add_call_message(session_ids[0], "user", "Merhaba") > 0
+        assert len(db.get_call_session_history(session_ids[0])['messages']) == 1
+    finally:
+        db.close()
+
+
+def test_system_health_merges_top_errors(tmp_path):
+    db = make_sharded(tmp_path)
+    try:
+        customers = {}
+        for customer_id in ["1001", "1002", "1003", "1004", "1005"]:
+            customers.setdefault(db.shard_index_for_customer(customer_id), customer_id)
+        assert len(customers) == 2
+        for customer_id in customers.values():
+            db.log_error(db.create_call_session(customer_id), "timeout", "Zaman aşımı", severity="high")
+
+        health = db.get_system_health()
+        assert health['recent_errors_24h'] == 2
+        assert [(e['error_type'], e['count_24h']) for e in health['top_errors_24h']] == [("timeout", 2)]
+    finally:
+        db.close()
+
+
+def test_migration_keeps_ledger_history(tmp_path):
+    db = make_sharded(tmp_path)
+    try:
+        source_index = db.shard_index_for_customer("1001")
+        target_index = (source_index + 1) % db.num_shards
+        source, target = db.shards[source_index], db.shards[target_index]
+
+        # Compacted history on the source: a snapshot plus newer entries
+        for amount in (10, 20):
+            db.update_customer_balance("1001", amount, 'add')
+        with source.get_connection() as conn:
+            conn.execute("UPDATE balance_ledger SET created_at = datetime('now', '-200 days') "
+                         "WHERE customer_id = '1001'")
+        db.update_customer_balance("1001", 30, 'add')
+        assert source.compact_balance_ledger(retain_days=90)['snapshots'] == 1
+        db.update_customer_balance("1001", 5, 'subtract')
+        balance = source.get_current_balance("1001")
+
+        # Target ledger ids overlap the source ones
+        other = next(cid for cid in ["1002", "1003", "1004", "1005"]
+                     if db.shard_index_for_customer(cid) == target_index)
+        for amount in (1, 2, 3, 4):
+            db.update_customer_balance(other, amount, 'add')
+
+        assert db.migrate_customer("1001", target_index)
+
+        assert target.get_current_balance("1001") == balance
+        history = target.get_balance_history("1001")
+        assert [h['amount'] for h in history] == [-5, 30]
+        with target.get_connection() as conn:
+            snapshot = conn.execute("SELECT as_of_entry_id FROM balance_snapshots WHERE customer_id = '1001'").fetchone()
+            base = conn.execute("SELECT ledger_entry_id FROM customer_balances WHERE customer_id = '1001'").fetchone()
+            other_ids = {r[0] for r in conn.execute('SELECT entry_id FROM balance_ledger WHERE customer_id = ?',
+                                                    (other,))}
+        assert snapshot[0] == base[0] < min(h['entry_id'] for h in history)
+        assert snapshot[0] not in other_ids and len(other_ids) >= 4
+
+        # New entries continue after the mapped ids
+        db.update_customer_balance("1001", 1, 'add')
+        assert target.get_current_balance("1001") == round(balance + 1, 2)
+        assert target.get_balance_history("1001", limit=1)[0]['entry_id'] > max(h['entry_id'] for h in history)
+    finally:
+        db.close()
+
+
+def test_migration_advances_data_versions(tmp_path):
+    db = make_sharded(tmp_path)
+    try:
+        assert db.create_customer("M1", "Taşınan Müşteri")
+        db.create_bill("M1", "2025-07", 40.0, "2025-08-01")
+        assert db.pay_bill("M1", "2025-07", 40.0)
+        before = db.get_data_version("bills:M1")['version']
+        assert before >= 2
+
+        # The single copied bill alone would leave the target's stamp at 1
+        target_index = (db.shard_index_for_customer("M1") + 1) % db.num_shards
+        assert db.migrate_customer("M1", target_index)
+        assert db.get_data_version("bills:M1")['version'] > before
+    finally:
+        db.close()
+
+def test_migration_keeps_late_transcript_rows(tmp_path):
+    db = make_sharded(tmp_path)
+    try:
+        # Messages of a neighbour push the source's ids above the ones the target hands out
+        source_index = db.shard_index_for_customer("1001")
+        neighbour = next(cid for cid in ["1002", "1003", "1004", "1005"]
+                         if db.shard_index_for_customer(cid) == source_index)
+        other_session = db.create_call_session(neighbour)
+        for _ in range(5):
+            db.add_call_message(other_session, "user", "komşu")
+
+        session_id = db.create_call_session("1001")
+        db.add_call_message(session_id, "user", "ilk mesaj")
+        db.end_call_session(session_id, "resolved")
+        db.add_call_message(session_id, "assistant", "geç mesaj")
+
+        assert db.migrate_customer("1001", (source_index + 1) % db.num_shards)
+        assert [m['content'] for m in db.get_call_session_history(session_id)['messages']] == \
+            ["ilk mesaj", "geç mesaj"]
+    finally:
+        db.close()
@@ -0,0 +1,171 @@
+# tests/test_storage_backend.py
+"""Conformance suite of the StorageBackend interface, run against every backend."""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from storage_backend import (
+    RESULT_OK, RESULT_UNCHANGED, RESULT_CUSTOMER_NOT_FOUND, RESULT_BILL_NOT_FOUND, RESULT_ALREADY_PAID,
+    RESULT_AMOUNT_MISMATCH, RESULT_PACKAGE_NOT_FOUND
+)
+
+from conftest import make_postgres
+
+MISSING_CUSTOMER = "NOPE0000"
+
+
+def new_customer(backend, name: str = "Test Müşteri") -> str:
+    customer_id = f"T{uuid.uuid4().hex[:8]}"
+    assert backend.create_customer(customer_id, name, phone="5550000000")
+    return customer_id
+
+
+def test_customer_operations(backend):
+    customer_id = new_customer(backend)
+    assert not backend.create_customer(customer_id, "Test Müşteri")
+
+    info = backend.get_customer_info(customer_id)
+    assert info and info['name'] == "Test Müşteri"
+    assert not backend.get_customer_info(MISSING_CUSTOMER)
+    assert backend.update_customer_info(customer_id, email="t@example.com")
+
+    assert backend.customer_exists(customer_id)
+    assert not backend.customer_exists(MISSING_CUSTOMER)
+    assert customer_id in backend.get_active_customer_ids()
+
+    assert backend.update_customer_info(customer_id, status="inactive")
+    assert not backend.customer_exists(customer_id)
+    assert customer_id not in backend.get_active_customer_ids()
+
+
+def test_packages(backend):
+    customer_id = new_customer(backend)
+    packages = backend.get_available_packages()
+    assert len(packages) >= 5 and all('features' in p for p in packages)
+
+    assert backend.change_customer_package(customer_id, "Gold")
+    assert not backend.change_customer_package(customer_id, "Yok")
+    assert backend.get_customer_info(customer_id)['package_name'] == "Gold"
+
+
+def test_billing_and_usage(backend):
+    customer_id = new_customer(backend)
+    assert backend.create_bill(customer_id, "2025-07", 120.0, "2025-08-01")
+    assert not backend.create_bill(customer_id, "2025-07", 120.0, "2025-08-01")
+
+    bills = backend.get_customer_bills(customer_id)
+    assert [b['bill_month'] for b in bills] == ["2025-07"]
+    assert not backend.pay_bill(customer_id, "2025-07", 1.0)
+    assert backend.pay_bill(customer_id, "2025-07", 120.0)
+    assert not backend.pay_bill(customer_id, "2025-07", 120.0)
+    assert backend.get_customer_bills(customer_id)[0]['is_paid']
+
+    assert backend.get_customer_usage_stats("1001", "2025-07") is not None
+    assert backend.get_customer_usage_stats(customer_id) is None
+
+
+def test_pay_bill_checked(backend):
+    customer_id = new_customer(backend)
+    backend.create_bill(customer_id, "2025-07", 80.0, "2025-08-01")
+
+    mismatch = backend.pay_bill_checked(customer_id, "2025-07", 1.0)
+    assert mismatch['code'] == RESULT_AMOUNT_MISMATCH and not mismatch['ok']
+    assert backend.pay_bill_checked(customer_id, "2099-01", 80.0)['code'] == RESULT_BILL_NOT_FOUND
+    assert backend.pay_bill_checked(MISSING_CUSTOMER, "2025-07", 80.0)['code'] == RESULT_CUSTOMER_NOT_FOUND
+
+    paid = backend.pay_bill_checked(customer_id, "2025-07", 80.0)
+    assert paid['ok'] and paid['code'] == RESULT_OK and paid['amount'] == 80.0
+    assert backend.pay_bill_checked(customer_id, "2025-07", 80.0)['code'] == RESULT_ALREADY_PAID
+
+
+def test_change_package_checked(backend):
+    customer_id = new_customer(backend)
+    changed = backend.change_package_checked(customer_id, "Silver")
+    assert changed['ok'] and changed['code'] == RESULT_OK
+    assert backend.change_package_checked(customer_id, "Yok")['code'] == RESULT_PACKAGE_NOT_FOUND
+    assert backend.change_package_checked(MISSING_CUSTOMER, "Silver")['code'] == RESULT_CUSTOMER_NOT_FOUND
+    assert backend.get_customer_info(customer_id)['package_name'] == "Silver"
+    unchanged = backend.change_package_checked(customer_id, "Silver")
+    assert unchanged['ok'] and unchanged['code'] == RESULT_UNCHANGED
+
+
+def test_postgres_concurrent_package_changes_leave_one_subscription(tmp_path):
+    backend = make_postgres(tmp_path)
+    try:
+        customer_id = new_customer(backend)
+        packages = ["Bronze", "Silver", "Gold", "Premium"] * 4
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda name: backend.change_package_checked(customer_id, name), packages))
+        assert all(r['ok'] for r in results)
+
+        with backend.get_connection() as conn:
+            active = backend._execute(conn, '''
+                SELECT COUNT(*) as n FROM customer_subscriptions WHERE customer_id = %s AND status = 'active'
+            ''', (customer_id,)).fetchone()
+        assert active['n'] == 1
+    finally:
+        backend.close()
+
+
+def test_batch_reads(backend):
+    customer_id = new_customer(backend)
+    backend.create_bill(customer_id, "2025-07", 50.0, "2025-08-01")
+    ids = [customer_id, "1001", MISSING_CUSTOMER, customer_id]
+
+    info = backend.get_customer_info_many(ids)
+    assert list(info) == [customer_id, "1001", MISSING_CUSTOMER]
+    assert info[customer_id]['name'] == "Test Müşteri" and info[MISSING_CUSTOMER] is None
+
+    bills = backend.get_customer_bills_many(ids)
+    assert [b['bill_month'] for b in bills[customer_id]] == ["2025-07"] and bills[MISSING_CUSTOMER] == []
+
+    usage = backend.get_customer_usage_stats_many(ids, "2025-07")
+    assert usage["1001"] is not None and usage[customer_id] is None
+
+    history = backend.get_customer_call_history_many(ids)
+    assert history[customer_id] == [] and history[MISSING_CUSTOMER] == []
+
+
+def test_call_session_lifecycle(backend):
+    customer_id = new_customer(backend)
+    session_id = backend.create_call_session(customer_id)
+    assert backend.add_call_message(session_id, "user", "Merhaba") > 0
+    assert backend.log_tool_usage(session_id, "get_user_info", {"customer_id": customer_id}, "ok", 12) > 0
+    assert backend.log_error(session_id, "test_error", "Test") > 0
+    assert backend.end_call_session(session_id, "resolved", 5)
+
+    history = backend.get_call_session_history(session_id)
+    assert len(history['messages']) == 1 and len(history['tool_usage']) == 1
+    assert len(backend.get_customer_call_history(customer_id)) == 1
+    assert len(backend.get_customer_call_history_many([customer_id])[customer_id]) == 1
+
+
+def test_reports(backend):
+    session_id = backend.create_call_session("1001")
+    backend.log_tool_usage(session_id, "get_user_info", {"customer_id": "1001"}, "ok", 12)
+
+    assert 'total_calls' in backend.get_daily_metrics()
+    assert any(t['tool_name'] == "get_user_info" for t in backend.get_tool_usage_stats())
+    assert 'total_bills' in backend.get_monthly_revenue("2025-07")
+    assert len(backend.get_package_statistics()) >= 5
+    assert 'monthly_value' in backend.get_customer_lifetime_value("1001")
+    assert isinstance(backend.get_overdue_bills(), list)
+    assert 'customers_count' in backend.get_database_stats()
+    assert 'status' in backend.get_system_health()
+
+
+def test_latency_percentiles(backend):
+    customer_id = new_customer(backend)
+    specialist = f"uzman_{uuid.uuid4().hex[:6]}"
+    session_id = backend.create_call_session(customer_id)
+    for elapsed in (100, 200, 300, 400):
+        backend.add_call_message(session_id, "assistant", "Yanıt", processing_time_ms=elapsed, specialist=specialist)
+    backend.log_tool_usage(session_id, "get_user_info", {"customer_id": customer_id}, "ok", 12)
+
+    response = backend.get_latency_percentiles("response", specialist, 60)
+    assert response['count'] == 4 and specialist in response['dimensions']
+    assert 150 <= response['latency_p50_ms'] <= 300
+    assert 300 <= response['latency_p99_ms'] <= 404
+    assert backend.get_latency_percentiles("response", None, 60)['count'] >= 4
+
+    tool = backend.get_latency_percentiles("tool", "get_user_info", 60)
+    assert tool['count'] >= 1 and "get_user_info" in tool['dimensions']
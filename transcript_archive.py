@@ -0,0 +1,96 @@
+# transcript_archive.py
+import os
+import json
+import stat
+import zlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("transcript_archive")
+
+
+class TranscriptArchive:
+    """Per-month SQLite archive files for completed call transcripts.
+
+    Each month ``YYYY-MM`` has one file ``call_archive_YYYY-MM.db`` holding one
+    row per session: the session record, its messages and tool usage as a
+    zlib-compressed JSON document. Files are left read-only (0444) between
+    archive runs and are opened with ``mode=ro`` for reads.
+    """
+
+    def __init__(self, archive_dir: str = "archives", compression_level: int = 9):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.compression_level = compression_level
+        self._write_lock = threading.Lock()
+
+    def path_for_month(self, archive_month: str) -> Path:
+        return self.archive_dir / f"call_archive_{archive_month}.db"
+
+    def list_months(self) -> List[str]:
+        return sorted(p.stem.replace("call_archive_", "") for p in self.archive_dir.glob("call_archive_*.db"))
+
+    @staticmethod
+    def _set_writable(path: Path, writable: bool):
+        mode = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+        if writable:
+            mode |= stat.S_IWUSR
+        os.chmod(path, mode)
+
+    def encode(self, transcript: Dict) -> bytes:
+        payload = json.dumps(transcript, ensure_ascii=False, default=str).encode('utf-8')
+        return zlib.compress(payload, self.compression_level)
+
+    @staticmethod
+    def decode(blob: bytes) -> Dict:
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def write_sessions(self, archive_month: str, transcripts: List[Dict]) -> int:
+        """Append transcripts (``get_call_session_history`` shape) to a month file."""
+        path = self.path_for_month(archive_month)
+        with self._write_lock:
+            if path.exists():
+                self._set_writable(path, True)
+            conn = sqlite3.connect(path)
+            try:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS archived_sessions (
+                        session_id VARCHAR(50) PRIMARY KEY,
+                        customer_id VARCHAR(10),
+                        start_time TIMESTAMP,
+                        payload BLOB NOT NULL
+                    )
+                ''')
+                conn.executemany('''
+                    INSERT OR REPLACE INTO archived_sessions (session_id, customer_id, start_time, payload)
+                    VALUES (?, ?, ?, ?)
+                ''', [
+                    (t['session']['session_id'], t['session'].get('customer_id'),
+                     t['session'].get('start_time'), self.encode(t))
+                    for t in transcripts
+                ])
+                conn.commit()
+            finally:
+                conn.close()
+                self._set_writable(path, False)
+
+        logger.info(f"Archived {len(transcripts)} sessions to {path}")
+        return len(transcripts)
+
+    def read_session(self, archive_month: str, session_id: str) -> Optional[Dict]:
+        """Read one archived transcript, or None if it is not in the month file."""
+        path = self.path_for_month(archive_month)
+        if not path.exists():
+            return None
+
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            row = conn.execute(
+                'SELECT payload FROM archived_sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self.decode(row[0]) if row else None